@@ -0,0 +1,184 @@
+"""
+Synthesises scales as audio for the ear training mode.  Every note of a scale
+    is made in one vectorised pass with NumPy, and the results are cached, so
+    that a scale is ready to be played in well under a frame.
+
+Usage: python audio.py SCALE_KEY START OUT.wav
+    e.g. python audio.py q Eb4 eb_major.wav
+"""
+import wave
+from functools import lru_cache
+import numpy as np
+from theory import SCALE_TYPE_INFO, HALF_STEPS_PER_OCTAVE, Exercise, \
+    scale_midi_numbers
+
+SAMPLE_RATE = 22050
+NOTE_SECONDS = .35
+ATTACK_SECONDS = .01
+RELEASE_SECONDS = .08
+VOLUME = .3
+# The strength of each harmonic, so that it doesn't sound like a pure sine
+HARMONICS = np.array([1., .4, .2, .1])
+AUDIO_CACHE_SIZE = 64  # Scales; each one is about 120 kB
+A4_MIDI_NUMBER = 69
+A4_FREQUENCY = 440.
+
+
+def frequency(midi_number: int) -> float:
+    """
+    Args:
+        midi_number (int): The MIDI note number, as from Note.midi_number
+    
+    Returns:
+        float: The frequency of the note in Hz, in equal temperament
+    """
+    return A4_FREQUENCY * 2 ** (
+        (midi_number - A4_MIDI_NUMBER) / HALF_STEPS_PER_OCTAVE
+    )
+
+
+def note_envelope(samples_per_note: int) -> np.ndarray:
+    """
+    Makes the shape of the volume of a single note: a quick fade in, holding,
+        then fading out, so that the notes don't click.
+    
+    Args:
+        samples_per_note (int): How many samples each note lasts for
+    
+    Returns:
+        np.ndarray: The volume of each sample of the note, from 0 to 1
+    """
+    envelope = np.ones(samples_per_note)
+    attack = int(ATTACK_SECONDS * SAMPLE_RATE)
+    release = int(RELEASE_SECONDS * SAMPLE_RATE)
+    envelope[:attack] = np.linspace(0., 1., attack)
+    envelope[-release:] = np.linspace(1., 0., release)
+    return envelope
+
+
+def synthesize(midi_numbers: [int]) -> np.ndarray:
+    """
+    Makes the audio for a sequence of notes, all at once: the phase of every
+        sample comes from one cumulative sum over the frequencies, so there are
+        no jumps between notes, and there's no Python loop over the samples.
+    
+    Args:
+        midi_numbers (list[int]): The notes to play, in order
+    
+    Returns:
+        np.ndarray: Mono 16 bit PCM audio at SAMPLE_RATE
+    """
+    samples_per_note = int(NOTE_SECONDS * SAMPLE_RATE)
+    frequencies = np.array([frequency(number) for number in midi_numbers])
+    # Keep the phase in whole cycles, as the sum would lose precision in
+    # float32, and only then go down to float32 for the (expensive) sines
+    cycles = np.cumsum(np.repeat(frequencies / SAMPLE_RATE, samples_per_note))
+    cycles -= np.floor(cycles)
+    phase = (2 * np.pi * cycles).astype(np.float32)
+    harmonic_numbers = np.arange(1, len(HARMONICS) + 1, dtype=np.float32)
+    wave_ = HARMONICS.astype(np.float32) @ np.sin(
+        np.outer(harmonic_numbers, phase)
+    )
+    wave_ *= np.tile(note_envelope(samples_per_note), len(midi_numbers))
+    wave_ *= VOLUME * 0x7FFF / HARMONICS.sum()
+    return wave_.astype(np.int16)
+
+
+@lru_cache(maxsize=AUDIO_CACHE_SIZE)
+def scale_audio(scale_key: str, starts_on: str) -> np.ndarray:
+    """
+    Gets the audio for a scale, remembering the most recently used ones.  The
+        clef doesn't change how it sounds, so it isn't part of the key.
+    
+    Args:
+        scale_key (str): The key for the type of scale
+        starts_on (str): The name of the note to start on, e.g. Eb4
+    
+    Returns:
+        np.ndarray: Mono 16 bit PCM audio at SAMPLE_RATE.  Don't change it; it's
+            shared with everything else that asked for the same scale.
+    """
+    audio = synthesize(scale_midi_numbers(scale_key, starts_on))
+    audio.flags.writeable = False
+    return audio
+
+
+def write_wav(path: str, audio: np.ndarray):
+    """
+    Saves audio as a WAV file, e.g. to check it without a sound card.
+    
+    Args:
+        path (str): Where to save it
+        audio (np.ndarray): Mono 16 bit PCM audio at SAMPLE_RATE
+    """
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(audio.astype("<i2").tobytes())
+
+
+class ScalePlayer:
+    enabled: bool
+    sound: object = None  # The pygame Sound that's playing, if any
+    
+    def __init__(self):
+        """
+        Constructor for ScalePlayer.  Sets up pygame's mixer to play the audio
+            as it's made, and turns itself off if there's no sound card.
+        """
+        import pygame
+        try:
+            pygame.mixer.quit()
+            pygame.mixer.init(SAMPLE_RATE, -16, 1)
+            self.enabled = True
+        except pygame.error:
+            self.enabled = False
+    
+    def prepare(self, exercise: Exercise):
+        """
+        Makes the audio for an exercise ahead of time, e.g. when its boulder is
+            made, so that playing it later doesn't have to.
+        
+        Args:
+            exercise (Exercise): The exercise that might be played
+        """
+        if self.enabled:
+            scale_audio(exercise[0], exercise[2])
+    
+    def play(self, exercise: Exercise):
+        """
+        Plays the scale of an exercise, cutting off whichever one was playing
+            before.
+        
+        Args:
+            exercise (Exercise): The exercise to play
+        """
+        if not self.enabled:
+            return
+        import pygame
+        self.stop()
+        audio = scale_audio(exercise[0], exercise[2])
+        self.sound = pygame.mixer.Sound(buffer=audio)
+        self.sound.play()
+    
+    def stop(self):
+        """ Stops whatever scale is playing. """
+        if self.sound is not None:
+            self.sound.stop()
+            self.sound = None
+
+
+def main():
+    """ Saves the scale given on the command line as a WAV file. """
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("scale_key", choices=SCALE_TYPE_INFO)
+    parser.add_argument("start")
+    parser.add_argument("path")
+    args = parser.parse_args()
+    write_wav(args.path, scale_audio(args.scale_key, args.start))
+
+
+if __name__ == "__main__":
+    main()
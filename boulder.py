@@ -4,84 +4,196 @@ from typing import TYPE_CHECKING
 
 # Normal imports
 from designer import *
+from functools import cache
 from random import randint
-from scale import Scale
-from useful import boulder_speed
+from scale import Scale, TEXT_REACH
+from theory import SCALE_TYPE_INFO
+from rules import EMOJI_WIDTH, BOULDER_BASE_POINTS
 
 if TYPE_CHECKING:
     from world import World
+    from boulder_store import BoulderStore
+    from snapshot import BoulderState
 
 
-BOULDER_SCALE = 5
-BOULDER_WIDTH = BOULDER_SCALE * 34
-BOULDER_BASE_SPEED = 1
-BOULDER_SPEED = 2
-BOULDER_BASE_POINTS = 1
+@cache
+def boulder_size(scale: float) -> tuple[int, int]:
+    """
+    Args:
+        scale (float): How much bigger than the emoji a boulder is
+    
+    Returns:
+        tuple[int, int]: The width and height of a boulder's emoji, measured
+            once, so that boulders can be placed without one
+    """
+    rock = emoji("🪨", 0, 0)
+    rock.scale = scale
+    size = rock.width, rock.height
+    destroy(rock)
+    return size
 
 
 class Boulder:
+    id: int = 0  # The boulder's id in the world's BoulderStore, 0 if dropped
+    store: BoulderStore
     scale: Scale
-    boulder: DesignerObject
-    value: float = BOULDER_BASE_POINTS
+    width: int
+    height: int
+    # Only made once the boulder is in the window, by appear(); until then,
+    # the boulder is just its place in the store and its exercise
+    boulder: DesignerObject = None
     
-    def __init__(self, world: World):
+    def __init__(self, world: World, state: BoulderState = None):
         """
         Constructor for Boulder.  Creates a boulder randomly across the top of
             the screen, ensuring that it does not hang off of the left-right
             edge.  If the boulder overlaps with another boulder, move it up
             until it doesn't.  If it's too far above of the window, remove it
-            and don't add it to the world.
+            and don't add it to the world.  If it's above the window, its
+            DesignerObjects aren't made until it falls into it.
         
         Args:
             world (World): The world in which the boulder is created.  Is used
                 to ensure that boulders don't overlap, and for the boulders to
                 be added to.
+            state (BoulderState): If given, the boulder is put back exactly as
+                it was in a snapshot, rather than made anew
         """
-        from world import GUTTER
-        x = randint(BOULDER_WIDTH//2, get_width() - BOULDER_WIDTH//2 - GUTTER)
+        self.store = world.store
+        self.width, self.height = boulder_size(world.boulder_scale)
+        if state is not None:
+            self.restore(world, state)
+            return
+        width = round(world.boulder_scale * EMOJI_WIDTH)
+        x = randint(width//2, get_width() - width//2 - world.layout.gutter)
         y = 0
         
+        # Stop once it's too high, as a boulder with the same x as another
+        # would never stop colliding with it.
+        while (self.is_colliding_somewhere(world, x, y)
+               and y >= -2 * self.height):
+            y = self.shift_up(y)
+        if y < -2 * self.height:
+            # Dropped: nothing has been made for it yet, so there's nothing
+            # to destroy
+            return
+        
+        self.scale = Scale(world)
+        self.id = world.store.add(x, y, self.scale.exercise_id,
+                                  BOULDER_BASE_POINTS)
+        world.boulders[self.id] = self
+        if self.in_view(world, y):
+            self.appear(world)
+        if len(world.boulders) == 1:
+            world.set_selected(self.id)
+        if world.metrics is not None:
+            world.metrics.spawn()
+        if world.player is not None:
+            world.player.prepare(self.scale.exercise)
+    
+    def restore(self, world: World, state: BoulderState):
+        """
+        Puts a boulder back as it was in a snapshot, without using any random
+            numbers, so that the game carries on as it would have.
+        
+        Args:
+            world (World): The world to add the boulder to
+            state (BoulderState): The boulder in the snapshot
+        """
+        scale_key, clef, starts_on = state.exercise
+        self.scale = Scale(world, SCALE_TYPE_INFO[scale_key], starts_on, clef)
+        # -1 as the exercise might not be in the sampler any more
+        self.id = world.store.add(state.x, state.y, -1, state.value)
+        world.store.frames_visible[world.store.slot(self.id)] = \
+            state.frames_visible
+        world.boulders[self.id] = self
+        if self.in_view(world, state.y):
+            self.appear(world)
+        if world.player is not None:
+            world.player.prepare(self.scale.exercise)
+    
+    def in_view(self, world: World, y: float) -> bool:
+        """
+        Args:
+            world (World): The world the boulder is in
+            y (float): Where the boulder is
+        
+        Returns:
+            bool: Whether any of the boulder or its scale would be in the
+                window there
+        """
+        return y + max(self.height / 2, world.layout.px(TEXT_REACH)) > 0
+    
+    def appear(self, world: World):
+        """
+        Makes the boulder's DesignerObjects, where the store has it, now that
+            it's in the window, drawn as selected or paused if it is.
+        
+        Args:
+            world (World): The world the boulder is in
+        """
+        slot = self.store.slot(self.id)
+        x, y = int(self.store.x[slot]), float(self.store.y[slot])
         self.boulder = emoji("🪨", x, y)
-        self.boulder.scale = BOULDER_SCALE
-        while self.is_colliding_somewhere(world):
-            self.shift_up()
-        if self.boulder.y < -2 * self.boulder.height:
-            self.boulder.destroy()
-        else:
-            self.boulder.alpha = .5
-            world.boulders[self.boulder.x] = self
-            if len(world.boulders) == 1:
-                world.selected = self.boulder.x
-                self.boulder.alpha = 1
+        self.boulder.scale = world.boulder_scale
+        self.boulder.alpha = 1 if self.id == world.highlighted else .5
+        self.scale.make_text(x, y)
+        if world.paused:
+            hide(self.scale.display)
+            show(self.scale.blur)
     
-        self.scale = Scale(world)
-        self.scale.make_text(self.boulder.x, self.boulder.y)
+    @property
+    def value(self) -> float:
+        """
+        Returns:
+            float: How many points the boulder is worth
+        """
+        return float(self.store.value[self.store.slot(self.id)])
+    
+    @value.setter
+    def value(self, value: float):
+        """
+        Args:
+            value (float): How many points the boulder is now worth
+        """
+        self.store.value[self.store.slot(self.id)] = value
+    
+    @property
+    def frames_visible(self) -> int:
+        """
+        Returns:
+            int: How long the player has been able to see the boulder
+        """
+        return int(self.store.frames_visible[self.store.slot(self.id)])
     
-    def is_colliding_somewhere(self, world: World) -> bool:
+    def is_colliding_somewhere(self, world: World, x: int, y: float) -> bool:
         """
         Checks if this boulder is colliding with any other boulders in the world.
         Or if the boulder has the same x-coordinate as another boulder.
         
         Args:
             world (World): The world in which to check the boulders.
-
+            x (int): Where the boulder would be across the window
+            y (float): Where the boulder would be down the window
+        
         Returns:
             bool: Whether this boulder is colliding or otherwise interfering
                 with an existing boulder.
         """
-        for boulder in world.boulders.values():
-            if colliding(self.boulder, boulder.boulder):
-                return True
-            if self.boulder.x == boulder.boulder.x:
-                return True
-        return False
+        return world.store.is_colliding(x, y, self.width, self.height)
     
-    def shift_up(self):
+    def shift_up(self, y: float) -> float:
         """
         Moves the boulder up by half of the height of the boulder, ideally so
             it is no longer overlapping any other boulders.
+        
+        Args:
+            y (float): Where the boulder is
+        
+        Returns:
+            float: Where it is now
         """
-        self.boulder.y -= self.boulder.height//2
+        return y - self.height//2
     
     def remove(self, world: World):
         """
@@ -89,16 +201,21 @@ class Boulder:
         If this boulder was selected, select the next one.
         """
         self.scale.remove()
-        x = self.boulder.x
-        del world.boulders[self.boulder.x]
-        destroy(self.boulder)
-        if x == world.selected:
+        del world.boulders[self.id]
+        world.store.remove(self.id)
+        if self.boulder is not None:
+            destroy(self.boulder)
+        if self.id == world.selected:
             world.select_lowest()
-
-    def move_down(self, world: World):
+    
+    def follow(self, y: float, speed: float):
         """
-        Moves the boulder down by BOULDER_SPEED.  This happens every frame.
+        Moves the boulder's DesignerObjects to where the store has moved it.
+            This happens every frame, once the boulder is in the window.
+        
+        Args:
+            y (float): The boulder's new y-coordinate
+            speed (float): How far it moved down
         """
-        speed = boulder_speed(world.score, BOULDER_BASE_SPEED)
-        self.boulder.y += speed
+        self.boulder.y = y
         self.scale.move_down(speed)
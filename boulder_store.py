@@ -0,0 +1,227 @@
+"""
+Keeps the state of every boulder in NumPy arrays, one per attribute, so that
+    moving the boulders and checking which have landed or are on screen is one
+    vectorised pass each frame rather than a Python loop over the boulders.
+
+Boulders are referred to by generational ids: the slot in the arrays, plus how
+    many times that slot has been used, so that an id from a removed boulder
+    never refers to the boulder that took its slot.  0 is never an id, so it
+    can be used for "no boulder".
+"""
+import numpy as np
+
+STORE_CAPACITY = 64  # Boulders; the store doubles in size if it runs out
+SLOT_BITS = 16  # The low bits of an id are its slot, the rest its generation
+SLOT_MASK = (1 << SLOT_BITS) - 1
+
+
+class BoulderStore:
+    generation: np.ndarray  # How many times each slot has been used
+    alive: np.ndarray
+    x: np.ndarray
+    y: np.ndarray
+    value: np.ndarray  # How many points the boulder is worth
+    exercise_id: np.ndarray  # The boulder's exercise in ExerciseSampler.ids
+    frames_visible: np.ndarray  # How long the player has been able to see it
+    selected: np.ndarray
+    free: [int]  # The slots that aren't in use, the next one to use last
+    
+    def __init__(self, capacity: int = STORE_CAPACITY):
+        """
+        Constructor for BoulderStore.  Allocates the arrays up front, so that
+            adding a boulder doesn't allocate anything.
+        
+        Args:
+            capacity (int): How many boulders to make room for at first
+        """
+        self.generation = np.zeros(capacity, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.x = np.zeros(capacity, dtype=np.int64)
+        self.y = np.zeros(capacity, dtype=np.float64)
+        self.value = np.zeros(capacity, dtype=np.float64)
+        self.exercise_id = np.zeros(capacity, dtype=np.int64)
+        self.frames_visible = np.zeros(capacity, dtype=np.int64)
+        self.selected = np.zeros(capacity, dtype=bool)
+        self.free = list(reversed(range(capacity)))
+    
+    def __len__(self) -> int:
+        """
+        Returns:
+            int: How many boulders there are
+        """
+        return len(self.alive) - len(self.free)
+    
+    def __contains__(self, boulder_id: int) -> bool:
+        """
+        Args:
+            boulder_id (int): The id of a boulder, possibly a removed one
+        
+        Returns:
+            bool: Whether the boulder is still in the store
+        """
+        slot = boulder_id & SLOT_MASK
+        return (0 < boulder_id and slot < len(self.alive)
+                and bool(self.alive[slot])
+                and self.generation[slot] == boulder_id >> SLOT_BITS)
+    
+    def slot(self, boulder_id: int) -> int:
+        """
+        Args:
+            boulder_id (int): The id of a boulder in the store
+        
+        Returns:
+            int: The index of the boulder in the arrays
+        """
+        if boulder_id not in self:
+            raise KeyError(f"StaleBoulderIdError: {boulder_id}")
+        return boulder_id & SLOT_MASK
+    
+    def id_of(self, slot: int) -> int:
+        """
+        Args:
+            slot (int): The index of a boulder in the arrays
+        
+        Returns:
+            int: The id of the boulder in that slot
+        """
+        return int(self.generation[slot]) << SLOT_BITS | slot
+    
+    def grow(self):
+        """ Doubles the size of the arrays, keeping the boulders in them. """
+        old_capacity = len(self.alive)
+        if 2 * old_capacity > SLOT_MASK + 1:
+            raise Exception(f"TooManyBouldersError: {old_capacity}")
+        for name in ("generation", "alive", "x", "y", "value", "exercise_id",
+                     "frames_visible", "selected"):
+            old = getattr(self, name)
+            new = np.zeros(2 * old_capacity, dtype=old.dtype)
+            new[:old_capacity] = old
+            setattr(self, name, new)
+        self.free = list(reversed(range(old_capacity, 2 * old_capacity))) \
+            + self.free
+    
+    def add(self, x: int, y: float, exercise_id: int, value: float) -> int:
+        """
+        Adds a boulder, reusing the slot of a removed one if there is one.
+        
+        Args:
+            x (int): The x-coordinate of the boulder
+            y (float): The y-coordinate of the boulder
+            exercise_id (int): The id of the boulder's exercise
+            value (float): How many points the boulder is worth
+        
+        Returns:
+            int: The id of the new boulder
+        """
+        if not self.free:
+            self.grow()
+        slot = self.free.pop()
+        self.generation[slot] += 1
+        self.alive[slot] = True
+        self.x[slot] = x
+        self.y[slot] = y
+        self.value[slot] = value
+        self.exercise_id[slot] = exercise_id
+        self.frames_visible[slot] = 0
+        self.selected[slot] = False
+        return self.id_of(slot)
+    
+    def remove(self, boulder_id: int):
+        """
+        Removes a boulder, freeing its slot for the next one.
+        
+        Args:
+            boulder_id (int): The id of the boulder to remove
+        """
+        slot = self.slot(boulder_id)
+        self.alive[slot] = False
+        self.selected[slot] = False
+        self.free.append(slot)
+    
+    def select(self, boulder_id: int):
+        """
+        Marks a boulder as the selected one, and no others.
+        
+        Args:
+            boulder_id (int): The id of the boulder to select, or 0 for none
+        """
+        self.selected[:] = False
+        if boulder_id:
+            self.selected[self.slot(boulder_id)] = True
+    
+    def ids(self, mask: np.ndarray) -> [int]:
+        """
+        Args:
+            mask (np.ndarray): Which slots to get the ids of
+        
+        Returns:
+            list[int]: The ids of the boulders in those slots
+        """
+        slots = np.flatnonzero(mask)
+        return ((self.generation[slots] << SLOT_BITS) | slots).tolist()
+    
+    def move_down(self, speed: float):
+        """
+        Moves every boulder down by speed, counting the frame towards
+            frames_visible for those that are on screen afterwards.
+        
+        Args:
+            speed (float): How far to move the boulders down
+        """
+        self.y[self.alive] += speed
+        self.frames_visible[self.alive & (self.y > 0)] += 1
+    
+    def fallen(self, height: float) -> [int]:
+        """
+        Args:
+            height (float): The height of the window
+        
+        Returns:
+            list[int]: The ids of the boulders that have fallen below it
+        """
+        return self.ids(self.alive & (self.y > height))
+    
+    def onscreen_count(self) -> int:
+        """
+        Returns:
+            int: How many boulders are below the top of the window
+        """
+        return int(np.count_nonzero(self.alive & (self.y > 0)))
+    
+    def onscreen_sorted_by_x(self) -> [int]:
+        """
+        Returns:
+            list[int]: The ids of the boulders below the top of the window,
+                from left to right
+        """
+        slots = np.flatnonzero(self.alive & (self.y > 0))
+        slots = slots[np.argsort(self.x[slots], kind="stable")]
+        return ((self.generation[slots] << SLOT_BITS) | slots).tolist()
+    
+    def lowest(self) -> int:
+        """
+        Returns:
+            int: The id of the boulder lowest down in the window, or 0 if there
+                are no boulders
+        """
+        if not len(self):
+            return 0
+        return self.id_of(int(np.argmax(np.where(self.alive, self.y, -np.inf))))
+    
+    def is_colliding(self, x: int, y: float, width: int, height: int) -> bool:
+        """
+        Checks a place for a new boulder against every boulder at once.
+        
+        Args:
+            x (int): The x-coordinate of the new boulder
+            y (float): The y-coordinate of the new boulder
+            width (int): The width of a boulder
+            height (int): The height of a boulder
+        
+        Returns:
+            bool: Whether a boulder there would overlap an existing boulder, or
+                have the same x-coordinate as one
+        """
+        overlapping = ((np.abs(self.x - x) < width)
+                       & (np.abs(self.y - y) < height))
+        return bool(np.any(self.alive & (overlapping | (self.x == x))))
@@ -0,0 +1,153 @@
+"""
+When the garbage collector runs.  Every spawn and removal makes lots of
+    short-lived Notes, strings and DesignerObjects, and left to itself, the
+    collector will stop the game for a full collection whenever it likes,
+    which is often in the middle of a frame.  So:
+        everything made before the game starts (the theory tables, the
+        fonts, designer itself) is frozen, so that no collection ever looks
+        at it again,
+        during a game, the young generations are collected less often, and
+        the oldest hardly ever,
+        and full collections are made at safe points instead, when the game
+        is paused or its scene is left.
+    How long each collection stopped the game for is recorded, and printed at
+    the end of each game.
+"""
+# Imports for type checking
+from __future__ import annotations
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from metrics import Metrics
+
+# Normal imports
+import gc
+from dataclasses import dataclass, field
+from time import perf_counter
+
+# (young, middle, old): the young generation is collected after this many more
+# allocations than deallocations, and each older one after this many
+# collections of the one younger than it.  The old one is still collected now
+# and then, in case a long game without a pause makes lots of cycles.
+PLAY_THRESHOLDS = (2000, 20, 100)
+DEFAULT_THRESHOLDS = gc.get_threshold()
+GENERATIONS = 3
+
+
+@dataclass
+class CollectionStats:
+    counts: [int] = field(default_factory=lambda: [0] * GENERATIONS)
+    seconds: [float] = field(default_factory=lambda: [0.] * GENERATIONS)
+    longest: [float] = field(default_factory=lambda: [0.] * GENERATIONS)
+    safe_seconds: float = 0.  # Spent in collections made at safe points
+    safe: bool = False  # Whether the collection running was made at one
+    started: float = None  # When the collection running started
+    metrics: Metrics = None  # To record the pauses in, if turned on
+    
+    def callback(self, phase: str, info: dict):
+        """
+        Times each collection, as one of gc.callbacks.
+        
+        Args:
+            phase (str): "start" or "stop"
+            info (dict): Which generation is being collected, and more
+        """
+        if phase == "start":
+            self.started = perf_counter()
+            return
+        if self.started is None:  # It started before the callback was added
+            return
+        seconds = perf_counter() - self.started
+        self.started = None
+        if self.safe:
+            self.safe_seconds += seconds
+            return
+        generation = info["generation"]
+        self.counts[generation] += 1
+        self.seconds[generation] += seconds
+        self.longest[generation] = max(self.longest[generation], seconds)
+        if self.metrics is not None:
+            self.metrics.collection(seconds)
+    
+    def reset(self):
+        """ Starts recording for another game. """
+        self.counts = [0] * GENERATIONS
+        self.seconds = [0.] * GENERATIONS
+        self.longest = [0.] * GENERATIONS
+        self.safe_seconds = 0.
+    
+    def summary(self) -> str:
+        """
+        Returns:
+            str: How many collections there were of each generation during the
+                game, and how long they took, e.g. "Garbage collections during
+                the game: 40 young (12.1ms, longest 0.9ms), ..."
+        """
+        parts = [
+            f"{count} {name} ({seconds * 1000:.1f}ms, "
+            f"longest {longest * 1000:.1f}ms)"
+            for name, count, seconds, longest in zip(
+                ["young", "middle", "old"], self.counts, self.seconds,
+                self.longest
+            )
+        ]
+        return (f"Garbage collections during the game: {', '.join(parts)}; "
+                f"{self.safe_seconds * 1000:.1f}ms at safe points")
+
+
+STATS = CollectionStats()
+
+
+def record():
+    """ Starts timing every collection, unless it already is. """
+    if STATS.callback not in gc.callbacks:
+        gc.callbacks.append(STATS.callback)
+
+
+def freeze():
+    """
+    Collects everything made so far that's garbage, and moves the rest into
+        the permanent generation, which is never collected, so that
+        collections only ever look at what was made after the game started.
+        Only for once everything that lasts for the whole program is made.
+    """
+    gc.collect()
+    gc.freeze()
+
+
+def play(metrics: Metrics = None):
+    """
+    Starts a game: from now on, collections are made less often, and timed.
+    
+    Args:
+        metrics (Metrics): The metrics to record the pauses in, if turned on
+    """
+    record()
+    STATS.reset()
+    STATS.metrics = metrics
+    gc.set_threshold(*PLAY_THRESHOLDS)
+
+
+def safe_point():
+    """
+    Makes a full collection, now that the game can wait for one, e.g. because
+        it's paused.
+    """
+    STATS.safe = True
+    try:
+        gc.collect()
+    finally:
+        STATS.safe = False
+
+
+def stop() -> str:
+    """
+    Ends a game, making a full collection, and collecting as usual again.
+    
+    Returns:
+        str: How long the collections during the game took, as from
+            CollectionStats.summary
+    """
+    safe_point()
+    gc.set_threshold(*DEFAULT_THRESHOLDS)
+    return STATS.summary()
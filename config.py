@@ -0,0 +1,142 @@
+"""
+The settings, and loading and saving them in .config.json.  The settings menu
+    is in settings.py; this doesn't need designer.
+"""
+import json
+from copy import deepcopy
+from dataclasses import dataclass, asdict
+from theory import LEDGER_LINES, LETTERS_PER_OCTAVE
+
+DEFAULT_CONFIG = {
+    "scale_types": ["Major",
+                    "Natural Minor", "Harmonic Minor", "Melodic Minor"],
+    "clefs": ["Treble", "Bass"],
+    "max_sharps_key_signature": 4,
+    "max_flats_key_signature": 4,
+    "max_high_ledger_positions": 4,
+    "max_low_ledger_positions": 4,
+    "ear_training": False,
+    "key_signatures": False,
+    "player": "",
+    "exercise_pack": "",
+    "midi_input": "",
+    "audio_input": "",
+    "metrics": "",
+    "window_width": 0,
+    "window_height": 0,
+}
+
+
+@dataclass(kw_only=True)
+class Settings(object):
+    scale_types: [str]
+    clefs: [str]
+    max_sharps_key_signature: int
+    max_flats_key_signature: int
+    max_high_ledger_positions: int
+    max_low_ledger_positions: int
+    # Old config files won't have these, so they need defaults
+    ear_training: bool = False
+    key_signatures: bool = False  # Write scales with their key signatures
+    player: str = ""  # The name of the player's profile, or the login name
+    exercise_pack: str = ""  # A pack to play instead of these settings
+    # Answer on a MIDI keyboard: "default", a device id, or a .mid file
+    midi_input: str = ""
+    # Answer by singing or playing: "default", a microphone, or a .wav file
+    audio_input: str = ""
+    # Telemetry for a lab: a port to serve it from, or a file to write it to
+    metrics: str = ""
+    # The size of the window, e.g. 1920 by 1080 for a projector; everything
+    # is scaled to fit it.  0 by 0 is designer's usual 800 by 600.
+    window_width: int = 0
+    window_height: int = 0
+    
+    def __post_init__(self):
+        """ Causes self.validate() to be called after initialisation """
+        self.validate()
+    
+    @classmethod
+    def load(cls):
+        """
+        Returns a Settings object from the settings stored in .config.json, or
+            if the config isn't found, uses the default settings.
+        """
+        try:
+            with open(".config.json") as f:
+                config_string = f.read()
+                config = json.loads(config_string)
+        except FileNotFoundError:
+            # A copy, as the settings menu changes the lists in place
+            config = deepcopy(DEFAULT_CONFIG)
+        
+        self = Settings(**config)
+        return self
+    
+    def save(self):
+        """ Saves this Settings object as JSON data to .config.json """
+        config = asdict(self)
+        config_string = json.dumps(config, indent=2)
+        with open(".config.json", "w") as f:
+            f.write(config_string)
+    
+    def validate(self):
+        """
+        Handles checking of incoming data from .config.json to ensure that it's
+            viable.  Additionally, handles fixing this data.
+        """
+        self.validate_scale_types()
+        self.validate_clefs()
+        self.validate_key_signatures()
+        self.validate_ledger_lines()
+    
+    def validate_scale_types(self):
+        """
+        Handles the validation of the scale types: uses the default if none are
+            listed in .config.json
+        """
+        if not self.scale_types:
+            self.scale_types = list(DEFAULT_CONFIG["scale_types"])
+    
+    def validate_clefs(self):
+        """
+        Handles the validation of the clefs: uses the default if none are listed
+            in .config.json
+        """
+        if not self.clefs:
+            self.clefs = list(DEFAULT_CONFIG["clefs"])
+    
+    def validate_key_signatures(self):
+        """
+        Handles the validation of the key signatures, which limit the scales
+            that come up when they're written with key signatures.
+        """
+        self.max_sharps_key_signature = min(
+            self.max_sharps_key_signature, LETTERS_PER_OCTAVE
+        )
+        self.max_flats_key_signature = min(
+            self.max_flats_key_signature, LETTERS_PER_OCTAVE
+        )
+        self.max_sharps_key_signature = max(
+            self.max_sharps_key_signature, 0
+        )
+        self.max_flats_key_signature = max(
+            self.max_flats_key_signature, 0
+        )
+    
+    def validate_ledger_lines(self):
+        """
+        Handles the validation of the ledger lines: uses the closest viable
+            count if the values stored in .config.json are out of range.
+        """
+        self.max_low_ledger_positions = min(
+            self.max_low_ledger_positions, LEDGER_LINES
+        )
+        self.max_high_ledger_positions = min(
+            self.max_high_ledger_positions, LEDGER_LINES
+        )
+        self.max_low_ledger_positions = max(
+            self.max_low_ledger_positions, 0
+        )
+        self.max_high_ledger_positions = max(
+            self.max_high_ledger_positions, 0
+        )
@@ -0,0 +1,123 @@
+"""
+Keeping frames on time on slow machines.  The governor times each frame's
+    update, and when most updates have been taking more than their share of
+    the frame, it puts off work that can wait, a level at a time:
+        first, refreshing the score,
+        then, making new boulders,
+        then, fading boulders in and out as they're selected,
+    each of which then only happens every few frames.  Once nearly every
+    update has time to spare again, it brings them back a level at a time.  A
+    single slow frame, e.g. while a font or an image is loaded, isn't enough
+    to change anything, as it's how often updates are late that counts, rather
+    than how late they are.  Each change is printed, and counted in the
+    metrics if they're turned on, to see how often machines fall back.
+"""
+# Imports for type checking
+from __future__ import annotations
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from metrics import Metrics
+
+# Normal imports
+from contextlib import contextmanager
+from dataclasses import dataclass
+from time import perf_counter
+from rules import FPS
+
+# How much of each frame the update can take; drawing needs the rest
+UPDATE_BUDGET = .5 / FPS
+HEADROOM = .5  # Updates taking under this much of the budget have time spare
+LATE_SHARE = .5  # Work is put off once more updates than this are late
+BUSY_SHARE = .1  # It comes back once fewer than this don't have time spare
+DECAY = .1  # How much each frame counts towards those shares
+SETTLE_FRAMES = 30  # How long to wait after a change before making another
+SHED_EVERY = 6  # Work that's put off happens once in this many frames
+
+FULL = 0
+SCORE = 1  # The score is refreshed less often
+SPAWNS = 2  # And boulders are made less often
+FADES = 3  # And boulders are faded in and out less often
+LEVEL_NAMES = {  # What gets put off at each level
+    SCORE: "refreshing the score",
+    SPAWNS: "making boulders",
+    FADES: "fading selected boulders",
+}
+
+
+@dataclass
+class Governor:
+    budget: float = UPDATE_BUDGET
+    level: int = FULL  # How much work is being put off
+    late: float = 0.  # The share of recent updates that went over budget
+    busy: float = 0.  # The share of recent updates without time spare
+    frame: int = 0
+    changed: int = 0  # The frame when the level last changed
+    started: float = None  # When the update being timed started
+    metrics: Metrics = None  # To count the changes in, if turned on
+    
+    def allows(self, level: int) -> bool:
+        """
+        Args:
+            level (int): The level at which some work gets put off
+        
+        Returns:
+            bool: Whether to do that work this frame
+        """
+        return self.level < level or self.frame % SHED_EVERY == 0
+    
+    def start(self):
+        """ Starts timing a frame's update. """
+        self.frame += 1
+        self.started = perf_counter()
+    
+    def finish(self):
+        """
+        Stops timing a frame's update, putting off more work or bringing some
+            back if the updates have been taking too long or have had plenty of
+            time to spare since the last change.
+        """
+        seconds = perf_counter() - self.started
+        self.late += DECAY * ((seconds > self.budget) - self.late)
+        self.busy += DECAY * ((seconds > HEADROOM * self.budget) - self.busy)
+        if self.frame - self.changed < SETTLE_FRAMES:
+            return
+        if self.late > LATE_SHARE and self.level < FADES:
+            self.change(self.level + 1)
+        elif self.busy < BUSY_SHARE and self.level > FULL:
+            self.change(self.level - 1)
+    
+    def change(self, level: int):
+        """
+        Changes how much work is put off, and logs it.
+        
+        Args:
+            level (int): The new level
+        """
+        if level > self.level:
+            print(f"{self.late:.0%} of updates took over "
+                  f"{self.budget * 1000:.1f}ms: putting off "
+                  f"{LEVEL_NAMES[level]}")
+        else:
+            print(f"{1 - self.busy:.0%} of updates took under "
+                  f"{HEADROOM * self.budget * 1000:.1f}ms: bringing back "
+                  f"{LEVEL_NAMES[self.level]}")
+        if self.metrics is not None:
+            self.metrics.quality(level, level > self.level)
+        self.level = level
+        self.changed = self.frame
+
+
+@contextmanager
+def governed(governor: Governor):
+    """
+    Times what happens inside the with block as a frame's update.
+    
+    Args:
+        governor (Governor): The governor to time it for
+    """
+    governor.start()
+    try:
+        yield
+    finally:
+        governor.finish()
@@ -0,0 +1,384 @@
+"""
+Keeps every game's score, and how the player did on each type of scale, in a
+    local SQLite database, for leaderboards and tracking progress.  The game
+    only hands finished sessions to a background thread, so it never waits on
+    the database.
+
+Usage: python history.py --leaderboard
+       python history.py --progress NAME [--days 30]
+"""
+import atexit
+import getpass
+import json
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field, asdict
+from config import Settings
+
+HISTORY_PATH = ".history.sqlite3"
+LEADERBOARD_SIZE = 10
+PROGRESS_DAYS = 30
+BUSY_TIMEOUT_MS = 5000  # A whole class might finish at once
+SECONDS_PER_DAY = 24 * 60 * 60
+DEFAULT_PLAYER = "Player"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS settings (
+    id INTEGER PRIMARY KEY,
+    config TEXT NOT NULL UNIQUE  -- settings_key() of the settings
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    player_id INTEGER NOT NULL REFERENCES players(id),
+    settings_id INTEGER NOT NULL REFERENCES settings(id),
+    started_at REAL NOT NULL,  -- Unix time
+    ended_at REAL NOT NULL,
+    score REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scale_type_stats (
+    session_id INTEGER NOT NULL REFERENCES sessions(id),
+    scale_type TEXT NOT NULL,  -- The key for the type of scale
+    correct INTEGER NOT NULL,
+    wrong INTEGER NOT NULL,
+    landed INTEGER NOT NULL,
+    reaction_frames INTEGER NOT NULL,  -- Summed over the correct guesses
+    PRIMARY KEY (session_id, scale_type)
+) WITHOUT ROWID;
+-- The best score of each player for some settings, without touching the table
+CREATE INDEX IF NOT EXISTS sessions_by_settings
+    ON sessions (settings_id, player_id, score);
+-- A player's sessions in order of time
+CREATE INDEX IF NOT EXISTS sessions_by_player
+    ON sessions (player_id, ended_at, score);
+"""
+
+
+def settings_key(settings: Settings) -> str:
+    """
+    Args:
+        settings (Settings): The settings a game was played with
+    
+    Returns:
+        str: The settings that change how hard the game is, as canonical JSON,
+            so that scores are only compared with those from the same settings
+    """
+    config = asdict(settings)
+    del config["player"]
+    del config["metrics"]  # Watching the game doesn't change it
+    config["scale_types"] = sorted(config["scale_types"])
+    config["clefs"] = sorted(config["clefs"])
+    return json.dumps(config, sort_keys=True, separators=(",", ":"))
+
+
+def player_name(settings: Settings) -> str:
+    """
+    Args:
+        settings (Settings): The settings, which might name the player
+    
+    Returns:
+        str: The name of the player's profile, by default the name that they
+            logged in with
+    """
+    if settings.player:
+        return settings.player
+    try:
+        return getpass.getuser()
+    except (OSError, KeyError):
+        return DEFAULT_PLAYER
+
+
+@dataclass
+class ScaleTypeRecord:
+    correct: int = 0
+    wrong: int = 0
+    landed: int = 0
+    reaction_frames: int = 0  # Summed over the correct guesses
+
+
+@dataclass
+class SessionRecord:
+    player: str
+    settings: str  # From settings_key()
+    started_at: float = field(default_factory=time.time)
+    ended_at: float = None
+    score: float = 0.
+    scale_types: dict[str, ScaleTypeRecord] = field(default_factory=dict)
+    
+    def record(self, scale_key: str, outcome: str, frames_visible: int):
+        """
+        Counts a guess or a boulder landing.  This is just a dictionary update,
+            so it's fine to do in the game loop.
+        
+        Args:
+            scale_key (str): The key for the type of scale on the boulder
+            outcome (str): "correct", "wrong" or "landed"
+            frames_visible (int): How long the boulder had been on screen
+        """
+        stats = self.scale_types.setdefault(scale_key, ScaleTypeRecord())
+        match outcome:
+            case "correct":
+                stats.correct += 1
+                stats.reaction_frames += frames_visible
+            case "wrong":
+                stats.wrong += 1
+            case "landed":
+                stats.landed += 1
+            case _:
+                raise ValueError(f"UnknownOutcomeError: {outcome}")
+    
+    def finish(self, score: float):
+        """
+        Args:
+            score (float): The final score
+        """
+        self.score = score
+        self.ended_at = time.time()
+
+
+def connect(path: str = HISTORY_PATH) -> sqlite3.Connection:
+    """
+    Opens the database, creating it if needed.  WAL mode lets the leaderboard
+        be read while a game is being saved.
+    
+    Args:
+        path (str): Where the database is
+    
+    Returns:
+        sqlite3.Connection: The connection to the database
+    """
+    connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000)
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def row_id(connection: sqlite3.Connection, table: str, column: str,
+           value: str) -> int:
+    """
+    Gets the id of the row of a lookup table with value, adding it if needed.
+    
+    Args:
+        connection (Connection): The database
+        table (str): "players" or "settings"
+        column (str): The unique column of the table
+        value (str): The value to look up
+    
+    Returns:
+        int: The id of the row
+    """
+    connection.execute(
+        f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)", (value,)
+    )
+    return connection.execute(
+        f"SELECT id FROM {table} WHERE {column} = ?", (value,)
+    ).fetchone()[0]
+
+
+def save_sessions(connection: sqlite3.Connection,
+                  sessions: [SessionRecord]):
+    """
+    Saves some finished sessions, all in one transaction.
+    
+    Args:
+        connection (Connection): The database
+        sessions (list[SessionRecord]): The sessions to save
+    """
+    with connection:
+        for session in sessions:
+            player_id = row_id(connection, "players", "name", session.player)
+            settings_id = row_id(connection, "settings", "config",
+                                 session.settings)
+            session_id = connection.execute(
+                "INSERT INTO sessions (player_id, settings_id, started_at,"
+                " ended_at, score) VALUES (?, ?, ?, ?, ?)",
+                (player_id, settings_id, session.started_at, session.ended_at,
+                 session.score)
+            ).lastrowid
+            connection.executemany(
+                "INSERT INTO scale_type_stats VALUES (?, ?, ?, ?, ?, ?)",
+                [(session_id, scale_key, stats.correct, stats.wrong,
+                  stats.landed, stats.reaction_frames)
+                 for scale_key, stats in session.scale_types.items()]
+            )
+
+
+class HistoryWriter:
+    path: str
+    sessions: queue.Queue
+    thread: threading.Thread
+    
+    def __init__(self, path: str = HISTORY_PATH):
+        """
+        Constructor for HistoryWriter.  Starts the thread that saves sessions,
+            which saves whatever is left when the program exits.
+        
+        Args:
+            path (str): Where the database is
+        """
+        self.path = path
+        self.sessions = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name="history",
+                                       daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+    
+    def submit(self, session: SessionRecord):
+        """
+        Hands a finished session to the thread to save, without waiting.
+        
+        Args:
+            session (SessionRecord): The finished session
+        """
+        self.sessions.put(session)
+    
+    def run(self):
+        """
+        Saves sessions as they come in, batching together any that arrive while
+            it's busy, until it's handed None.
+        """
+        connection = connect(self.path)
+        running = True
+        while running:
+            batch = [self.sessions.get()]
+            while not self.sessions.empty():
+                batch.append(self.sessions.get())
+            if None in batch:
+                running = False
+                batch = [session for session in batch if session is not None]
+            try:
+                save_sessions(connection, batch)
+            except sqlite3.Error as e:
+                print(f"HistoryError: {e}")
+        connection.close()
+    
+    def close(self):
+        """ Saves any sessions that are waiting, then stops the thread. """
+        if self.thread.is_alive():
+            self.sessions.put(None)
+            self.thread.join()
+
+
+WRITER: HistoryWriter = None
+
+
+def submit(session: SessionRecord):
+    """
+    Saves a finished session in the background, starting the writer the first
+        time it's needed.
+    
+    Args:
+        session (SessionRecord): The finished session
+    """
+    global WRITER
+    if WRITER is None:
+        WRITER = HistoryWriter()
+    WRITER.submit(session)
+
+
+def leaderboard(connection: sqlite3.Connection, settings: Settings,
+                limit: int = LEADERBOARD_SIZE) -> [tuple[str, float, int]]:
+    """
+    Args:
+        connection (Connection): The database
+        settings (Settings): Only compare games played with these settings
+        limit (int): How many players to list
+    
+    Returns:
+        list[tuple[str, float, int]]: The name, best score and number of games
+            of each of the best players, best first
+    """
+    return connection.execute(
+        "SELECT players.name, best, games FROM ("
+        "  SELECT player_id, MAX(score) AS best, COUNT(*) AS games"
+        "  FROM sessions WHERE settings_id ="
+        "    (SELECT id FROM settings WHERE config = ?)"
+        "  GROUP BY player_id"
+        ") JOIN players ON players.id = player_id"
+        " ORDER BY best DESC LIMIT ?",
+        (settings_key(settings), limit)
+    ).fetchall()
+
+
+def progress(connection: sqlite3.Connection, player: str,
+             days: int = PROGRESS_DAYS) -> [tuple[str, int, float, float]]:
+    """
+    Args:
+        connection (Connection): The database
+        player (str): The name of the player's profile
+        days (int): How many days to go back
+    
+    Returns:
+        list[tuple[str, int, float, float]]: The date, number of games, best
+            score and mean score for each day that the player played
+    """
+    return connection.execute(
+        "SELECT date(ended_at, 'unixepoch', 'localtime') AS day, COUNT(*),"
+        " MAX(score), AVG(score) FROM sessions"
+        " WHERE player_id = (SELECT id FROM players WHERE name = ?)"
+        " AND ended_at >= ? GROUP BY day ORDER BY day",
+        (player, time.time() - days * SECONDS_PER_DAY)
+    ).fetchall()
+
+
+def scale_type_progress(connection: sqlite3.Connection, player: str,
+                        days: int = PROGRESS_DAYS
+                        ) -> [tuple[str, int, int, int, float]]:
+    """
+    Args:
+        connection (Connection): The database
+        player (str): The name of the player's profile
+        days (int): How many days to go back
+    
+    Returns:
+        list[tuple[str, int, int, int, float]]: The key for each type of scale,
+            with how many were correct, wrong and landed, and the mean frames
+            to a correct guess
+    """
+    return connection.execute(
+        "SELECT scale_type, SUM(correct), SUM(wrong), SUM(landed),"
+        " 1.0 * SUM(reaction_frames) / MAX(1, SUM(correct))"
+        " FROM sessions JOIN scale_type_stats ON session_id = sessions.id"
+        " WHERE player_id = (SELECT id FROM players WHERE name = ?)"
+        " AND ended_at >= ? GROUP BY scale_type ORDER BY scale_type",
+        (player, time.time() - days * SECONDS_PER_DAY)
+    ).fetchall()
+
+
+def main():
+    """ Prints the leaderboard or a player's progress. """
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--leaderboard", action="store_true",
+                        help="the best players with the current settings")
+    parser.add_argument("--progress", metavar="NAME",
+                        help="how a player has done each day")
+    parser.add_argument("--days", type=int, default=PROGRESS_DAYS)
+    parser.add_argument("--path", default=HISTORY_PATH)
+    args = parser.parse_args()
+    connection = connect(args.path)
+    if args.leaderboard:
+        for rank, (name, best, games) in enumerate(
+                leaderboard(connection, Settings.load()), 1):
+            print(f"{rank:>3}. {name:<24}{best:>10.4}  ({games} games)")
+    if args.progress:
+        for day, games, best, average in progress(connection, args.progress,
+                                                  args.days):
+            print(f"{day}  {games:>4} games  best {best:>8.4}  "
+                  f"mean {average:>8.4}")
+        for scale_key, correct, wrong, landed, reaction in \
+                scale_type_progress(connection, args.progress, args.days):
+            print(f"{scale_key}: {correct} correct, {wrong} wrong, "
+                  f"{landed} landed, {reaction:.0f} frames to answer")
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
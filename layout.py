@@ -0,0 +1,99 @@
+"""
+Sizes for whatever size the window is.  Everything is laid out for an 800 by
+    600 window, the size the rules and simulations assume, and scaled by how
+    much bigger or smaller the real window is, so that the game looks the same
+    on a classroom projector as on a netbook.  Fonts are loaded once for each
+    size that gets used, before the game starts, rather than when the first
+    label of that size is made.
+"""
+from dataclasses import dataclass
+from rules import WINDOW_WIDTH, WINDOW_HEIGHT, GUTTER
+
+MIN_FONT_SIZE = 8
+FONT_SIZE_STEP = 2  # Font sizes are rounded to this, so fewer get loaded
+
+
+@dataclass(frozen=True)
+class Layout:
+    width: int
+    height: int
+    
+    @property
+    def factor(self) -> float:
+        """
+        Returns:
+            float: How much bigger everything is than in an 800 by 600 window.
+                The smaller of the two ratios, so that nothing goes off the
+                screen of a window with another shape.
+        """
+        return min(self.width / WINDOW_WIDTH, self.height / WINDOW_HEIGHT)
+    
+    def px(self, value: float) -> int:
+        """
+        Args:
+            value (float): A size or position in an 800 by 600 window
+        
+        Returns:
+            int: The size or position in this window
+        """
+        return round(value * self.factor)
+    
+    def font_size(self, size: int) -> int:
+        """
+        Args:
+            size (int): A font size in an 800 by 600 window
+        
+        Returns:
+            int: The font size in this window, rounded so that nearby sizes
+                share a font
+        """
+        scaled = FONT_SIZE_STEP * round(size * self.factor / FONT_SIZE_STEP)
+        return max(MIN_FONT_SIZE, scaled)
+    
+    @property
+    def gutter(self) -> int:
+        """
+        Returns:
+            int: How far from the right the score and other info go
+        """
+        return self.px(GUTTER)
+
+
+LAYOUTS: dict[tuple[int, int], Layout] = {}
+
+
+def current_layout() -> Layout:
+    """
+    Returns:
+        Layout: The layout for the size that designer's window is now
+    """
+    from designer import get_width, get_height
+    size = (get_width(), get_height())
+    if size not in LAYOUTS:
+        LAYOUTS[size] = Layout(*size)
+    return LAYOUTS[size]
+
+
+def load_fonts(fonts: dict[tuple[str, str | None], [float]]):
+    """
+    Loads fonts into designer's cache of fonts, which designer keys by name
+        and size, so that making a label in one of them never has to read the
+        font file.  Sizes are scaled to the window first.
+    
+    Args:
+        fonts (dict[tuple[str, str | None], list[float]]): The font sizes to
+            load, in an 800 by 600 window, by the name of the font and the
+            path to it (or None for a system font)
+    """
+    import pygame
+    from designer.objects.text import Text
+    layout = current_layout()
+    for (name, path), sizes in fonts.items():
+        for size in sizes:
+            key = (name, layout.font_size(size))
+            if key in Text.FONTS:
+                continue
+            if path is None:
+                Text.FONTS[key] = pygame.font.SysFont(*key)
+            else:
+                Text.FONTS[key] = pygame.font.Font(path, key[1])
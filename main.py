@@ -1,13 +1,18 @@
 from designer import *
 from designer import __version__ as DESIGNER_VERSION
-from useful import ensure_version, Menu, MenuEntry
+from helpers import ensure_version
+from config import Settings
+from useful import Menu, MenuEntry, FONT_SIZES, push_warm_scene
+from layout import load_fonts
+from collector import freeze
 
 MIN_DESIGNER_VERSION = "0.6.3"
 
 HEADER = "Main Menu: Press a number key to continue"
 ENTRIES = [
-    MenuEntry("Play", push_scene, "world"),
-    MenuEntry("Settings", push_scene, "settings_menu")
+    MenuEntry("Play", push_warm_scene, "world"),
+    MenuEntry("Settings", push_warm_scene, "settings_menu"),
+    MenuEntry("Sight-Reading Stream", push_warm_scene, "sight_reading")
 ]
 
 
@@ -34,12 +39,21 @@ def main():
             f"Version {MIN_DESIGNER_VERSION} or higher is required."
         )
     
+    config = Settings.load()
+    if config.window_width and config.window_height:
+        set_window_size(config.window_width, config.window_height)
+    load_fonts(FONT_SIZES)
+    
     when('starting: main_menu', void_setup)
     when('typing: main_menu', void_keyPressed)
     import world
     world.whens()
     import settings
     settings.whens()
+    import sight_reading
+    sight_reading.whens()
+    # Everything made so far lasts until the game is closed
+    freeze()
     start()
 
 
@@ -0,0 +1,321 @@
+"""
+Telemetry for watching a lab full of games: how long frames take, how many
+    boulders are spawned, land and are on screen, and how fast the player
+    guesses.  It's off unless "metrics" is set in .config.json, to a port to
+    serve them from on this machine (e.g. "9464", then scrape
+    http://127.0.0.1:9464/metrics) or to a file to write them to every few
+    seconds (e.g. "/var/lib/node_exporter/scale_drop.prom").  Either way
+    they're in Prometheus' text format, and are sent from a background thread.
+Only the game's thread ever changes the numbers, and each change is a single
+    store, so the game never waits on a lock; the background thread only reads
+    them, so at worst a scrape is one frame behind on some of them.
+"""
+import atexit
+import os
+import threading
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from time import perf_counter
+
+HOST = "127.0.0.1"  # Only this machine can see the metrics
+WRITE_SECONDS = 5.  # How often to write them, when writing them to a file
+# In seconds; 1/60 and 1/30 are a frame at 60 and 30 fps
+FRAME_BUCKETS = (.005, .01, 1 / 60, .025, 1 / 30, .05, .1, .25, .5, 1.)
+GC_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1)  # In seconds
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PREFIX = "scale_drop_"
+
+
+class Histogram:
+    bounds: tuple[float]
+    counts: [int]  # How many values fell in each bucket (not cumulative)
+    total: float = 0.
+    
+    def __init__(self, bounds: tuple[float]):
+        """
+        Constructor for Histogram.
+        
+        Args:
+            bounds (tuple[float]): The upper bound of each bucket, in order;
+                there's another for anything bigger
+        """
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+    
+    def observe(self, value: float):
+        """
+        Args:
+            value (float): A value to count in its bucket
+        """
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+    
+    def lines(self, name: str) -> [str]:
+        """
+        Args:
+            name (str): The name of the metric
+        
+        Returns:
+            list[str]: The histogram's buckets, total and count, in Prometheus'
+                text format, where each bucket counts everything up to its
+                bound
+        """
+        counts = list(self.counts)  # So that every line agrees
+        lines = []
+        running = 0
+        for bound, count in zip(self.bounds + (float("inf"),), counts):
+            running += count
+            le = "+Inf" if bound == float("inf") else f"{bound:.4g}"
+            lines.append(f'{name}_bucket{{le="{le}"}} {running}')
+        lines.append(f"{name}_sum {self.total}")
+        lines.append(f"{name}_count {running}")
+        return lines
+
+
+@dataclass
+class Metrics:
+    frame_seconds: Histogram = field(
+        default_factory=lambda: Histogram(FRAME_BUCKETS)
+    )
+    gc_seconds: Histogram = field(
+        default_factory=lambda: Histogram(GC_BUCKETS)
+    )
+    spawned: int = 0
+    landed: int = 0
+    correct: int = 0
+    wrong: int = 0
+    boulders: int = 0  # How many are on screen now
+    quality_level: int = 0  # How much work the governor is putting off
+    quality_drops: int = 0  # How many times the governor put more off
+    # Only for the game being played now
+    game_started: float = field(default_factory=perf_counter)
+    game_guesses: int = 0
+    last_frame: float = None  # When the last frame was drawn, if there was one
+    
+    def new_game(self):
+        """
+        Starts counting for another game.  The time between the last frame of
+            one game and the first of the next (spent in the menus) isn't a
+            frame, so it isn't counted as one.
+        """
+        self.last_frame = None
+        self.game_started = perf_counter()
+        self.game_guesses = 0
+    
+    def frame(self, boulders: int):
+        """
+        Counts a frame, timing it from the one before.
+        
+        Args:
+            boulders (int): How many boulders are on screen
+        """
+        now = perf_counter()
+        if self.last_frame is not None:
+            self.frame_seconds.observe(now - self.last_frame)
+        self.last_frame = now
+        self.boulders = boulders
+    
+    def spawn(self):
+        """ Counts a boulder being made. """
+        self.spawned += 1
+    
+    def land(self):
+        """ Counts a boulder that reached the ground before being named. """
+        self.landed += 1
+    
+    def guess(self, correct: bool):
+        """
+        Args:
+            correct (bool): Whether the guess was right
+        """
+        if correct:
+            self.correct += 1
+        else:
+            self.wrong += 1
+        self.game_guesses += 1
+    
+    def collection(self, seconds: float):
+        """
+        Args:
+            seconds (float): How long a garbage collection during a game
+                stopped it for
+        """
+        self.gc_seconds.observe(seconds)
+    
+    def quality(self, level: int, dropped: bool):
+        """
+        Args:
+            level (int): How much work the governor is putting off now
+            dropped (bool): Whether it's putting more off than before
+        """
+        self.quality_level = level
+        self.quality_drops += dropped
+    
+    def guesses_per_minute(self) -> float:
+        """
+        Returns:
+            float: How fast the player has been guessing this game
+        """
+        minutes = (perf_counter() - self.game_started) / 60
+        return self.game_guesses / minutes if minutes > 0 else 0.
+    
+    def render(self) -> str:
+        """
+        Returns:
+            str: Every metric, in Prometheus' text format
+        """
+        frame = PREFIX + "frame_seconds"
+        lines = [
+            f"# HELP {frame} The time between frames being drawn.",
+            f"# TYPE {frame} histogram",
+            *self.frame_seconds.lines(frame),
+        ]
+        collection = PREFIX + "gc_pause_seconds"
+        lines += [
+            f"# HELP {collection} Garbage collections during games.",
+            f"# TYPE {collection} histogram",
+            *self.gc_seconds.lines(collection),
+        ]
+        for name, kind, about, value in [
+            ("boulders_spawned_total", "counter", "Boulders made.",
+             self.spawned),
+            ("boulders_landed_total", "counter",
+             "Boulders that reached the ground before being named.",
+             self.landed),
+            ("boulders", "gauge", "Boulders on screen now.", self.boulders),
+            ("quality_level", "gauge",
+             "How much work is put off to keep frames on time.",
+             self.quality_level),
+            ("quality_drops_total", "counter",
+             "Times more work was put off to keep frames on time.",
+             self.quality_drops),
+            ("guesses_per_minute", "gauge",
+             "How fast the player has guessed this game.",
+             self.guesses_per_minute()),
+        ]:
+            lines += [f"# HELP {PREFIX}{name} {about}",
+                      f"# TYPE {PREFIX}{name} {kind}",
+                      f"{PREFIX}{name} {value}"]
+        guesses = PREFIX + "guesses_total"
+        lines += [f"# HELP {guesses} Guesses at boulders' scales.",
+                  f"# TYPE {guesses} counter",
+                  f'{guesses}{{result="correct"}} {self.correct}',
+                  f'{guesses}{{result="wrong"}} {self.wrong}']
+        return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    metrics: Metrics = None  # Set on a subclass for each server
+    
+    def do_GET(self):
+        """ Sends the metrics, at /metrics, as Prometheus expects. """
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format: str, *args):
+        """ Doesn't print every scrape, as the game prints to the console. """
+
+
+def serve(metrics: Metrics, port: int, host: str = HOST) -> HTTPServer:
+    """
+    Serves the metrics over HTTP from a background thread, which stops when
+        the game does.
+    
+    Args:
+        metrics (Metrics): The metrics to serve
+        port (int): The port to serve them from
+        host (str): Where they can be seen from; by default, only this machine
+    
+    Returns:
+        HTTPServer: The server
+    """
+    handler = type("Handler", (MetricsHandler,), {"metrics": metrics})
+    server = HTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="metrics",
+                     daemon=True).start()
+    return server
+
+
+def write(metrics: Metrics, path: str):
+    """
+    Writes the metrics to a file all at once, so that nothing reading it ever
+        sees half of them.
+    
+    Args:
+        metrics (Metrics): The metrics to write
+        path (str): Where to write them
+    """
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w") as f:
+        f.write(metrics.render())
+    os.replace(temporary, path)
+
+
+def keep_writing(metrics: Metrics, path: str,
+                 seconds: float = WRITE_SECONDS) -> threading.Thread:
+    """
+    Writes the metrics to a file every few seconds from a background thread,
+        and once more when the game stops.
+    
+    Args:
+        metrics (Metrics): The metrics to write
+        path (str): Where to write them
+        seconds (float): How often to write them
+    
+    Returns:
+        threading.Thread: The thread writing them
+    """
+    stopped = threading.Event()
+    
+    def loop():
+        """ Writes the metrics until the game stops. """
+        while not stopped.wait(seconds):
+            write(metrics, path)
+    
+    def stop():
+        """ Writes the final metrics. """
+        stopped.set()
+        write(metrics, path)
+    
+    atexit.register(stop)
+    thread = threading.Thread(target=loop, name="metrics", daemon=True)
+    thread.start()
+    return thread
+
+
+METRICS = Metrics()  # Every game counts towards the same metrics
+STARTED: set[str] = set()  # Where the metrics are already going
+
+
+def start(target: str) -> Metrics:
+    """
+    Starts sending the metrics somewhere, unless they already are.  If they
+        can't be, e.g. because the port is in use, the game carries on without
+        sending them, and the next game tries again.
+    
+    Args:
+        target (str): A port to serve them from, or a file to write them to,
+            as "metrics" in .config.json
+    
+    Returns:
+        Metrics: The metrics, for the game to update
+    """
+    if target not in STARTED:
+        try:
+            if target.isdigit():
+                serve(METRICS, int(target))
+            else:
+                keep_writing(METRICS, target)
+        except OSError as e:
+            print(f"MetricsError: {e}")
+            return METRICS
+        STARTED.add(target)
+    return METRICS
@@ -0,0 +1,368 @@
+"""
+Answering by playing the scale on a MIDI keyboard.  Note-ons come from a
+    device through pygame.midi, or from a recorded .mid file played back in
+    real time as a stand-in, and are matched one at a time against the notes
+    of the selected boulder's scale.
+
+Usage: python midi.py --devices
+       python midi.py FILE.mid [SCALE_KEY START]
+    e.g. python midi.py take1.mid q Eb4, to see where take1.mid plays the
+    E flat major scale
+"""
+import struct
+import time
+from theory import HALF_STEPS_PER_OCTAVE, scale_midi_numbers
+
+NOTE_ON = 0x90
+NOTE_OFF = 0x80
+STATUS_MASK = 0xF0
+META = 0xFF
+SYSEX = 0xF0
+SYSEX_ESCAPE = 0xF7
+SET_TEMPO = 0x51
+END_OF_TRACK = 0x2F
+# How many data bytes follow each kind of channel message
+DATA_BYTES = {0x80: 2, 0x90: 2, 0xA0: 2, 0xB0: 2, 0xC0: 1, 0xD0: 1, 0xE0: 2}
+DEFAULT_TEMPO = 500000  # Microseconds per quarter note, i.e. 120 BPM
+CHUNK = struct.Struct(">4sI")
+HEADER = struct.Struct(">HHH")  # format, track count, division
+READ_SIZE = 64  # How many events to read from a device at once
+
+
+class ScaleMatcher:
+    target: [int]  # The pitch classes to play, in order
+    failure: [int]
+    matched: int = 0  # How many notes of the scale have been played so far
+    
+    def __init__(self, pitches: [int]):
+        """
+        Constructor for ScaleMatcher.  Works out, for each number of notes
+            matched, how many would still be matched if the next note were
+            wrong (as in Knuth-Morris-Pratt), so that each note played is
+            matched in constant time, without going back over what was
+            played before.
+        
+        Args:
+            pitches (list[int]): The MIDI note numbers of the scale.  Only the
+                pitch classes are matched, so the scale can be played in any
+                octave, e.g. on a small keyboard.
+        """
+        self.target = [pitch % HALF_STEPS_PER_OCTAVE for pitch in pitches]
+        self.failure = [0] * len(self.target)
+        k = 0
+        for i in range(1, len(self.target)):
+            while k and self.target[i] != self.target[k]:
+                k = self.failure[k - 1]
+            if self.target[i] == self.target[k]:
+                k += 1
+            self.failure[i] = k
+    
+    def feed(self, note: int) -> bool:
+        """
+        Matches one more note played.
+        
+        Args:
+            note (int): The MIDI note number of the note
+        
+        Returns:
+            bool: Whether the whole scale has now been played
+        """
+        pitch_class = note % HALF_STEPS_PER_OCTAVE
+        target = self.target
+        matched = self.matched
+        while matched and target[matched] != pitch_class:
+            matched = self.failure[matched - 1]
+        if target[matched] == pitch_class:
+            matched += 1
+        if matched == len(target):
+            self.matched = 0
+            return True
+        self.matched = matched
+        return False
+
+
+def read_varlen(data: bytes, offset: int) -> tuple[int, int]:
+    """
+    Args:
+        data (bytes): A MIDI track
+        offset (int): Where a variable-length quantity starts
+    
+    Returns:
+        tuple[int, int]: The number, and the offset just after it
+    """
+    value = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            return value, offset
+
+
+def read_track(data: bytes) -> tuple[[tuple[int, int]], [tuple[int, int]]]:
+    """
+    Args:
+        data (bytes): The body of an MTrk chunk
+    
+    Returns:
+        tuple[list[tuple[int, int]], list[tuple[int, int]]]: The tick and note
+            number of each note-on, and the tick and tempo of each tempo change
+    """
+    notes = []
+    tempos = []
+    tick = 0
+    offset = 0
+    running = None  # The status of the last channel message
+    while offset < len(data):
+        delta, offset = read_varlen(data, offset)
+        tick += delta
+        status = data[offset]
+        if status & 0x80:
+            offset += 1
+        elif running is None:
+            raise Exception(f"MidiRunningStatusError: at byte {offset}")
+        else:
+            status = running  # The byte is data, using the last status
+        
+        if status == META:
+            kind = data[offset]
+            length, offset = read_varlen(data, offset + 1)
+            if kind == SET_TEMPO:
+                tempos.append(
+                    (tick, int.from_bytes(data[offset:offset + 3], "big"))
+                )
+            offset += length
+            running = None
+            if kind == END_OF_TRACK:
+                break
+        elif status in (SYSEX, SYSEX_ESCAPE):
+            length, offset = read_varlen(data, offset)
+            offset += length
+            running = None
+        else:
+            kind = status & STATUS_MASK
+            if kind not in DATA_BYTES:
+                raise Exception(f"MidiStatusError: {status:#x}")
+            if kind == NOTE_ON and data[offset + 1]:  # Velocity 0 is an off
+                notes.append((tick, data[offset]))
+            offset += DATA_BYTES[kind]
+            running = status
+    return notes, tempos
+
+
+def read_midi_file(path: str) -> [tuple[float, int]]:
+    """
+    Reads the note-ons from a standard MIDI file, of any format, following
+        its tempo changes.
+    
+    Args:
+        path (str): Where the .mid file is
+    
+    Returns:
+        list[tuple[float, int]]: The time in seconds and the note number of
+            each note-on, in order
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    kind, length = CHUNK.unpack_from(data)
+    if kind != b"MThd":
+        raise Exception(f"NotAMidiFileError: {path}")
+    _, _, division = HEADER.unpack_from(data, CHUNK.size)
+    offset = CHUNK.size + length
+    
+    notes = []
+    tempos = []
+    while offset + CHUNK.size <= len(data):
+        kind, length = CHUNK.unpack_from(data, offset)
+        offset += CHUNK.size
+        if kind == b"MTrk":
+            track_notes, track_tempos = read_track(
+                data[offset:offset + length]
+            )
+            notes += track_notes
+            tempos += track_tempos
+        offset += length  # Skip chunks of other kinds, as the spec says to
+    notes.sort()
+    tempos.sort()
+    
+    if division & 0x8000:  # SMPTE: frames per second and ticks per frame
+        frames_per_second = 0x100 - (division >> 8)
+        seconds_per_tick = 1 / (frames_per_second * (division & 0xFF))
+        return [(tick * seconds_per_tick, note) for tick, note in notes]
+    
+    timed = []
+    tempo_tick = 0  # When the tempo last changed
+    tempo_seconds = 0.
+    tempo = DEFAULT_TEMPO
+    changes = iter(tempos)
+    change = next(changes, None)
+    for tick, note in notes:
+        while change is not None and change[0] <= tick:
+            tempo_seconds += (change[0] - tempo_tick) * tempo / division / 1e6
+            tempo_tick, tempo = change
+            change = next(changes, None)
+        timed.append(
+            (tempo_seconds + (tick - tempo_tick) * tempo / division / 1e6,
+             note)
+        )
+    return timed
+
+
+def write_midi_file(path: str, notes: [int], seconds_per_note: float = .25):
+    """
+    Saves notes as a format 0 MIDI file, one after another, e.g. to make a
+        stand-in for a keyboard.
+    
+    Args:
+        path (str): Where to save it
+        notes (list[int]): The MIDI note numbers to play
+        seconds_per_note (float): How long each note lasts
+    """
+    division = 480
+    ticks = round(seconds_per_note * division * 1e6 / DEFAULT_TEMPO)
+    
+    def varlen(value: int) -> bytes:
+        out = [value & 0x7F]
+        while value > 0x7F:
+            value >>= 7
+            out.append(0x80 | (value & 0x7F))
+        return bytes(reversed(out))
+    
+    track = bytearray()
+    for note in notes:
+        track += varlen(0) + bytes([NOTE_ON, note, 0x60])
+        track += varlen(ticks) + bytes([NOTE_OFF, note, 0])
+    track += varlen(0) + bytes([META, END_OF_TRACK, 0])
+    with open(path, "wb") as f:
+        f.write(CHUNK.pack(b"MThd", HEADER.size))
+        f.write(HEADER.pack(0, 1, division))
+        f.write(CHUNK.pack(b"MTrk", len(track)))
+        f.write(track)
+
+
+class MidiFileSource:
+    events: [tuple[float, int]]
+    next_event: int = 0
+    started: float
+    
+    def __init__(self, path: str):
+        """
+        Constructor for MidiFileSource.  Plays back a recording in real time,
+            starting now, as if it were being played on a keyboard.
+        
+        Args:
+            path (str): Where the .mid file is
+        """
+        self.events = read_midi_file(path)
+        self.started = time.perf_counter()
+    
+    def poll(self) -> [int]:
+        """
+        Returns:
+            list[int]: The notes that have started since the last poll
+        """
+        elapsed = time.perf_counter() - self.started
+        start = self.next_event
+        while (self.next_event < len(self.events)
+               and self.events[self.next_event][0] <= elapsed):
+            self.next_event += 1
+        return [note for _, note in self.events[start:self.next_event]]
+    
+    def close(self):
+        """ Nothing to close; the file has already been read. """
+
+
+class MidiDeviceSource:
+    device: "pygame.midi.Input"
+    
+    def __init__(self, device_id: int = None):
+        """
+        Constructor for MidiDeviceSource.  Opens a MIDI input device.
+        
+        Args:
+            device_id (int): The pygame.midi id of the device, by default the
+                system's default input
+        """
+        import pygame.midi
+        pygame.midi.init()
+        if device_id is None:
+            device_id = pygame.midi.get_default_input_id()
+        if device_id < 0:
+            raise Exception("NoMidiInputError")
+        self.device = pygame.midi.Input(device_id)
+    
+    def poll(self) -> [int]:
+        """
+        Returns:
+            list[int]: The notes that have started since the last poll
+        """
+        notes = []
+        while self.device.poll():
+            for (status, note, velocity, _), _ in \
+                    self.device.read(READ_SIZE):
+                if status & STATUS_MASK == NOTE_ON and velocity:
+                    notes.append(note)
+        return notes
+    
+    def close(self):
+        """ Closes the device. """
+        self.device.close()
+
+
+def open_source(spec: str) -> MidiFileSource | MidiDeviceSource:
+    """
+    Args:
+        spec (str): A .mid file to play back, a pygame.midi device id, or
+            "default" for the default input device
+    
+    Returns:
+        MidiFileSource | MidiDeviceSource: Where the notes will come from
+    """
+    if spec.lower().endswith((".mid", ".midi")):
+        return MidiFileSource(spec)
+    if spec == "default":
+        return MidiDeviceSource()
+    return MidiDeviceSource(int(spec))
+
+
+def list_devices() -> [tuple[int, str]]:
+    """
+    Returns:
+        list[tuple[int, str]]: The id and name of each MIDI input device
+    """
+    import pygame.midi
+    pygame.midi.init()
+    devices = []
+    for device_id in range(pygame.midi.get_count()):
+        _, name, is_input, _, _ = pygame.midi.get_device_info(device_id)
+        if is_input:
+            devices.append((device_id, name.decode()))
+    return devices
+
+
+def main():
+    """ Lists the devices, or describes a .mid file. """
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--devices", action="store_true")
+    parser.add_argument("path", nargs="?")
+    parser.add_argument("scale_key", nargs="?")
+    parser.add_argument("start", nargs="?")
+    args = parser.parse_args()
+    if args.devices or not args.path:
+        for device_id, name in list_devices():
+            print(f"{device_id}: {name}")
+        return
+    
+    events = read_midi_file(args.path)
+    print(f"{args.path}: {len(events)} notes over {events[-1][0]:.1f}s"
+          if events else f"{args.path}: no notes")
+    if args.scale_key and args.start:
+        matcher = ScaleMatcher(scale_midi_numbers(args.scale_key, args.start))
+        for seconds, note in events:
+            if matcher.feed(note):
+                print(f"Scale played, ending at {seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
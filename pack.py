@@ -0,0 +1,376 @@
+"""
+Exercise packs: fixed sets of exercises, e.g. for a week of a curriculum or an
+    exam, in a compact binary file that the game memory-maps and samples from
+    directly, with the sheet music for each exercise already made.
+
+Format (everything little-endian):
+    HEADER
+    The scale type keys, then the clef names, each as a STRING_COUNT and then
+        a STRING_LENGTH and the UTF-8 bytes for each string
+    A RECORD for each exercise, starting at records_offset
+    The sheet music, as UTF-8, starting at glyphs_offset; each record points
+        to its own, and repeats of an exercise share it
+
+Usage: python pack.py build OUT.pack [--from exercises.txt] [--count N]
+           [--key-signatures]
+       python pack.py info PACK
+    exercises.txt has an exercise per line, e.g. "q,Treble,Eb4"; without it,
+    the pack is made from the exercises allowed by the current settings.
+"""
+import mmap
+import random
+import struct
+from theory import SCALE_TYPE_INFO, CLEFS, LETTERS_PER_OCTAVE, SHARP, FLAT, \
+    KEY_SIGNATURES, Exercise, Note, sheet_music, exercise_key_signature
+from helpers import int_from_pattern
+
+PACK_MAGIC = b"SDPK"
+PACK_VERSION = 1
+# magic, version, exercise count, records offset, glyphs offset, glyphs size
+HEADER = struct.Struct("<4sHxxIIII")
+# scale type id, clef id, start pitch, glyphs offset, glyphs length
+RECORD = struct.Struct("<BBHIH2x")
+STRING_COUNT = struct.Struct("<B")
+STRING_LENGTH = struct.Struct("<B")
+LETTERS = "CDEFGAB"
+ACCIDENTAL_RANGE = 8  # Room for up to 3 flats or 4 sharps on a note
+ACCIDENTAL_OFFSET = 3
+
+
+def encode_pitch(note_name: str) -> int:
+    """
+    Args:
+        note_name (str): The name of a note, e.g. Eb4
+    
+    Returns:
+        int: The note as one number, keeping its spelling (so Eb4 isn't D#4)
+    """
+    note = Note(note_name)
+    accidentals = note.sharp_flat.count(SHARP) - note.sharp_flat.count(FLAT)
+    if not 0 <= accidentals + ACCIDENTAL_OFFSET < ACCIDENTAL_RANGE:
+        raise ValueError(f"TooManyAccidentalsError: {note_name}")
+    letter = note.octave * LETTERS_PER_OCTAVE + LETTERS.index(note.letter)
+    return letter * ACCIDENTAL_RANGE + accidentals + ACCIDENTAL_OFFSET
+
+
+def decode_pitch(pitch: int) -> str:
+    """
+    Args:
+        pitch (int): A note as made by encode_pitch
+    
+    Returns:
+        str: The name of the note, e.g. Eb4
+    """
+    letter, accidentals = divmod(pitch, ACCIDENTAL_RANGE)
+    accidentals -= ACCIDENTAL_OFFSET
+    octave, letter = divmod(letter, LETTERS_PER_OCTAVE)
+    return (f"{LETTERS[letter]}{SHARP * accidentals}{FLAT * -accidentals}"
+            f"{octave}")
+
+
+def exercise_glyphs(exercise: Exercise, key_signatures: bool = False) -> str:
+    """
+    Args:
+        exercise (Exercise): The exercise to draw
+        key_signatures (bool): Whether to write it with its key signature
+    
+    Returns:
+        str: The sheet music for the exercise, in Game Font, as Scale draws it
+    """
+    scale_key, clef, starts_on = exercise
+    pattern = [int_from_pattern(c) for c in SCALE_TYPE_INFO[scale_key].pattern]
+    key_signature = KEY_SIGNATURES[0]
+    if key_signatures:
+        key_signature = exercise_key_signature(exercise)
+    return sheet_music(pattern, Note(starts_on), CLEFS[clef], key_signature)
+
+
+def pack_strings(strings: [str]) -> bytes:
+    """
+    Args:
+        strings (list[str]): The strings for a string table
+    
+    Returns:
+        bytes: The string table
+    """
+    parts = [STRING_COUNT.pack(len(strings))]
+    for string in strings:
+        data = string.encode()
+        parts.append(STRING_LENGTH.pack(len(data)) + data)
+    return b"".join(parts)
+
+
+def unpack_strings(buffer, offset: int) -> tuple[[str], int]:
+    """
+    Args:
+        buffer: Where the string table is
+        offset (int): Where in buffer the string table starts
+    
+    Returns:
+        tuple[list[str], int]: The strings, and the offset just after them
+    """
+    count, = STRING_COUNT.unpack_from(buffer, offset)
+    offset += STRING_COUNT.size
+    strings = []
+    for _ in range(count):
+        length, = STRING_LENGTH.unpack_from(buffer, offset)
+        offset += STRING_LENGTH.size
+        strings.append(bytes(buffer[offset:offset + length]).decode())
+        offset += length
+    return strings, offset
+
+
+def write_pack(path: str, exercises: [Exercise], key_signatures: bool = False):
+    """
+    Saves exercises as a pack, making the sheet music for each one.
+    
+    Args:
+        path (str): Where to save the pack
+        exercises (list[Exercise]): The exercises, in order
+        key_signatures (bool): Whether to write the scales with their key
+            signatures
+    """
+    scale_keys = sorted({exercise[0] for exercise in exercises})
+    clefs = sorted({exercise[1] for exercise in exercises})
+    if len(scale_keys) > 0xFF or len(clefs) > 0xFF:
+        raise ValueError("TooManyStringsError: at most 255 of each are allowed")
+    strings = pack_strings(scale_keys) + pack_strings(clefs)
+    records_offset = HEADER.size + len(strings)
+    records_offset += -records_offset % RECORD.size  # Align the records
+    
+    glyph_offsets = {}  # Where each exercise's sheet music is, and its length
+    glyphs = bytearray()
+    records = bytearray()
+    for scale_key, clef, starts_on in exercises:
+        exercise = (scale_key, clef, starts_on)
+        if exercise not in glyph_offsets:
+            text = exercise_glyphs(exercise, key_signatures).encode()
+            glyph_offsets[exercise] = (len(glyphs), len(text))
+            glyphs += text
+        records += RECORD.pack(
+            scale_keys.index(scale_key), clefs.index(clef),
+            encode_pitch(starts_on), *glyph_offsets[exercise]
+        )
+    glyphs_offset = records_offset + len(records)
+    
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(PACK_MAGIC, PACK_VERSION, len(exercises),
+                            records_offset, glyphs_offset, len(glyphs)))
+        f.write(strings)
+        f.write(bytes(records_offset - HEADER.size - len(strings)))
+        f.write(records)
+        f.write(glyphs)
+
+
+class ExercisePack:
+    path: str
+    buffer: mmap.mmap
+    scale_types: [str]  # The keys of the types of scale in the pack
+    clefs: [str]
+    count: int
+    records_offset: int
+    glyphs_offset: int
+    
+    def __init__(self, path: str):
+        """
+        Constructor for ExercisePack.  Memory-maps the pack and reads only its
+            header and string tables; the records are read as they're needed.
+        
+        Args:
+            path (str): Where the pack is
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.count, self.records_offset, self.glyphs_offset,
+         glyphs_size) = HEADER.unpack_from(self.buffer)
+        if magic != PACK_MAGIC:
+            raise Exception(f"NotAPackError: {path}")
+        if version != PACK_VERSION:
+            raise Exception(f"PackVersionError: {version}")
+        if (len(self.buffer) < self.glyphs_offset + glyphs_size
+                or self.glyphs_offset < self.records_offset
+                + self.count * RECORD.size):
+            raise Exception(f"TruncatedPackError: {path}")
+        self.scale_types, offset = unpack_strings(self.buffer, HEADER.size)
+        self.clefs, _ = unpack_strings(self.buffer, offset)
+        for scale_key in self.scale_types:
+            if scale_key not in SCALE_TYPE_INFO:
+                raise Exception(f"UnknownScaleTypeError: {scale_key}")
+        for clef in self.clefs:
+            if clef not in CLEFS:
+                raise Exception(f"UnknownClefError: {clef}")
+    
+    def __len__(self) -> int:
+        """
+        Returns:
+            int: How many exercises there are in the pack
+        """
+        return self.count
+    
+    def record(self, index: int) -> tuple[int, int, int, int, int]:
+        """
+        Args:
+            index (int): The index of an exercise in the pack
+        
+        Returns:
+            tuple[int, int, int, int, int]: Its record, as in RECORD
+        """
+        if not 0 <= index < self.count:
+            raise IndexError(f"ExerciseIndexError: {index}")
+        return RECORD.unpack_from(self.buffer,
+                                  self.records_offset + index * RECORD.size)
+    
+    def __getitem__(self, index: int) -> Exercise:
+        """
+        Args:
+            index (int): The index of an exercise in the pack
+        
+        Returns:
+            Exercise: The exercise
+        """
+        scale_type, clef, pitch, _, _ = self.record(index)
+        return self.scale_types[scale_type], self.clefs[clef], \
+            decode_pitch(pitch)
+    
+    def glyphs(self, index: int) -> str:
+        """
+        Args:
+            index (int): The index of an exercise in the pack
+        
+        Returns:
+            str: The sheet music for the exercise, in Game Font
+        """
+        _, _, _, offset, length = self.record(index)
+        start = self.glyphs_offset + offset
+        return self.buffer[start:start + length].decode()
+    
+    def close(self):
+        """ Unmaps the pack. """
+        self.buffer.close()
+
+
+class PackSampler:
+    pack: ExercisePack
+    rng: random.Random
+    
+    def __init__(self, pack: ExercisePack, rng: random.Random = random):
+        """
+        Constructor for PackSampler.  Samples the exercises in a pack evenly,
+            as the pack's author chose them, so nothing is built up front.
+        
+        Args:
+            pack (ExercisePack): The pack to sample from
+            rng (Random): Where to get random numbers from
+        """
+        if not len(pack):
+            raise Exception(f"NoExercisesError: {pack.path}")
+        self.pack = pack
+        self.rng = rng
+    
+    @property
+    def exercises(self) -> ExercisePack:
+        """
+        Returns:
+            ExercisePack: The exercises, which can be indexed like a list
+        """
+        return self.pack
+    
+    def sample_id(self) -> int:
+        """
+        Returns:
+            int: The index of a random exercise in the pack
+        """
+        return self.rng.randrange(len(self.pack))
+    
+    def sample(self) -> Exercise:
+        """
+        Returns:
+            Exercise: A random exercise from the pack
+        """
+        return self.pack[self.sample_id()]
+    
+    def glyphs(self, exercise_id: int) -> str:
+        """
+        Args:
+            exercise_id (int): The index of an exercise in the pack
+        
+        Returns:
+            str: The sheet music for the exercise, made when the pack was
+        """
+        return self.pack.glyphs(exercise_id)
+    
+    def record(self, exercise: Exercise, correct: bool, reaction_frames: int):
+        """
+        Packs are fixed, so guesses don't change what comes up.
+        
+        Args:
+            exercise (Exercise): The exercise that was guessed at
+            correct (bool): Whether the guess was right
+            reaction_frames (int): How many frames the boulder was on screen
+                before the guess
+        """
+
+
+def read_exercises(path: str) -> [Exercise]:
+    """
+    Args:
+        path (str): A text file with an exercise per line, e.g. "q,Treble,Eb4"
+    
+    Returns:
+        list[Exercise]: The exercises in the file
+    """
+    exercises = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            scale_key, clef, starts_on = (part.strip()
+                                          for part in line.split(","))
+            if scale_key not in SCALE_TYPE_INFO:
+                raise Exception(f"UnknownScaleTypeError: {scale_key}")
+            if clef not in CLEFS:
+                raise Exception(f"UnknownClefError: {clef}")
+            exercises.append((scale_key, clef, starts_on))
+    return exercises
+
+
+def main():
+    """ Builds a pack, or describes one. """
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build")
+    build.add_argument("path")
+    build.add_argument("--from", dest="source",
+                       help="a text file with an exercise per line")
+    build.add_argument("--count", type=int,
+                       help="sample this many exercises rather than one each")
+    build.add_argument("--seed", type=int, default=0)
+    build.add_argument("--key-signatures", action="store_true",
+                       help="write the scales with their key signatures")
+    info = commands.add_parser("info")
+    info.add_argument("path")
+    args = parser.parse_args()
+    
+    if args.command == "build":
+        if args.source:
+            exercises = read_exercises(args.source)
+        else:
+            from config import Settings
+            from simulation import Simulation
+            simulation = Simulation(Settings.load(), random.Random(args.seed))
+            exercises = simulation.sampler.exercises
+            if args.count:
+                exercises = [simulation.sampler.sample()
+                             for _ in range(args.count)]
+        write_pack(args.path, exercises, args.key_signatures)
+    pack = ExercisePack(args.path)
+    print(f"{args.path}: {len(pack)} exercises, scale types "
+          f"{', '.join(pack.scale_types)}, clefs {', '.join(pack.clefs)}")
+    pack.close()
+
+
+if __name__ == "__main__":
+    main()
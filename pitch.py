@@ -0,0 +1,394 @@
+"""
+Answering by singing or playing the scale into a microphone.  Audio is cut
+    into fixed-size blocks, and the pitch of each one is found with a
+    normalised autocorrelation (McLeod's NSDF), all in NumPy, so a block takes
+    a small fraction of its own length to process.  A pitch that holds for a
+    couple of blocks counts as a note being played, and those notes are
+    matched against the selected boulder's scale with midi.ScaleMatcher, just
+    as notes from a MIDI keyboard are.  A WAV file can stand in for the
+    microphone, played back in real time.
+
+Usage: python pitch.py --devices
+       python pitch.py FILE.wav [SCALE_KEY START]
+    e.g. python pitch.py take1.wav q Eb4, to see where take1.wav plays the
+    E flat major scale
+"""
+import math
+import time
+import wave
+from collections import deque
+import numpy as np
+from theory import HALF_STEPS_PER_OCTAVE, LETTER_HALF_STEPS, Note, \
+    scale_midi_numbers
+from audio import SAMPLE_RATE, A4_MIDI_NUMBER, A4_FREQUENCY
+
+# Samples; about 46ms at SAMPLE_RATE.  Doubled for higher sample rates, so
+# that a block always holds two periods of MIN_FREQUENCY
+BLOCK_SIZE = 1024
+MIN_FREQUENCY = 60.  # Hz; just below B1, lower than most basses sing
+MAX_FREQUENCY = 1200.  # Hz; around D6, higher than most sopranos sing
+SILENCE = .01  # Blocks quieter than this (RMS, out of 1) have no pitch
+MIN_CLARITY = .8  # How periodic a block has to be to have a pitch, out of 1
+PEAK_SHARE = .9  # The first peak at least this high of the highest is chosen
+HOLD_BLOCKS = 2  # How many blocks in a row a pitch has to last to be a note
+PCM_SCALE = 1 / 0x8000  # From 16 bit samples to floats from -1 to 1
+# The name of each pitch class, spelt with sharps, to make Notes from; the
+# naturals come second, so that they're used instead of B# and E#
+PITCH_CLASS_NAMES = {
+    **{(half_steps + 1) % HALF_STEPS_PER_OCTAVE: letter + "#"
+       for letter, half_steps in LETTER_HALF_STEPS.items()},
+    **{half_steps: letter for letter, half_steps in LETTER_HALF_STEPS.items()},
+}
+
+
+def needed_block_size(sample_rate: int) -> int:
+    """
+    Args:
+        sample_rate (int): How many samples there are per second
+    
+    Returns:
+        int: How many samples each block needs, BLOCK_SIZE or a power of two
+            times it, so that MIN_FREQUENCY can be found at that rate
+    """
+    size = BLOCK_SIZE
+    while size < 2 * math.ceil(sample_rate / MIN_FREQUENCY):
+        size *= 2
+    return size
+
+
+class PitchDetector:
+    sample_rate: int
+    block_size: int
+    min_lag: int  # The shortest period looked for, in samples
+    max_lag: int  # The longest
+    
+    def __init__(self, sample_rate: int = SAMPLE_RATE, block_size: int = None):
+        """
+        Constructor for PitchDetector.
+        
+        Args:
+            sample_rate (int): How many samples there are per second
+            block_size (int): How many samples each block has, by default
+                as many as needed_block_size() says the rate needs; fewer
+                raise the lowest pitch that can be found
+        """
+        self.sample_rate = sample_rate
+        if block_size is None:
+            block_size = needed_block_size(sample_rate)
+        self.block_size = block_size
+        self.min_lag = max(1, int(sample_rate / MAX_FREQUENCY))
+        self.max_lag = min(self.block_size // 2,
+                           math.ceil(sample_rate / MIN_FREQUENCY))
+    
+    def frequency(self, block: np.ndarray) -> float | None:
+        """
+        Finds the pitch of a block with McLeod's normalised square difference
+            function, which is 1 at lags where the block repeats exactly.
+            The autocorrelation comes from one real FFT, and the normalising
+            energies from one cumulative sum, so there's no Python loop over
+            the lags.
+        
+        Args:
+            block (np.ndarray): block_size samples, from -1 to 1
+        
+        Returns:
+            float | None: The frequency in Hz, or None if the block is too
+                quiet or too noisy to have one
+        """
+        x = block.astype(np.float64) - block.mean()
+        if np.sqrt(np.mean(x * x)) < SILENCE:
+            return None
+        n = len(x)
+        spectrum = np.fft.rfft(x, 2 * n)  # Padded, so it doesn't wrap around
+        autocorrelation = np.fft.irfft(spectrum * spectrum.conj())[:n]
+        energy = np.concatenate(([0.], np.cumsum(x * x)))
+        lags = np.arange(n)
+        # Sum of x[j]^2 + x[j + lag]^2 over the samples that overlap
+        overlap = energy[n - lags] + energy[n] - energy[lags]
+        nsdf = 2 * autocorrelation / np.maximum(overlap, 1e-12)
+        
+        window = nsdf[self.min_lag:self.max_lag + 1]
+        peaks = np.flatnonzero(
+            (window[1:-1] > window[:-2]) & (window[1:-1] >= window[2:])
+            & (window[1:-1] > 0)
+        ) + 1
+        if not len(peaks):
+            return None
+        highest = window[peaks].max()
+        if highest < MIN_CLARITY:
+            return None
+        # The first peak nearly as high as the highest is the period; later
+        # ones are multiples of it
+        peak = peaks[np.argmax(window[peaks] >= PEAK_SHARE * highest)]
+        left, middle, right = window[peak - 1:peak + 2]
+        curve = left - 2 * middle + right
+        shift = (left - right) / (2 * curve) if curve else 0.
+        return self.sample_rate / (self.min_lag + peak + shift)
+
+
+def midi_number(frequency: float) -> int:
+    """
+    Args:
+        frequency (float): A frequency in Hz
+    
+    Returns:
+        int: The MIDI note number of the nearest note, in equal temperament,
+            as from Note.midi_number
+    """
+    return round(A4_MIDI_NUMBER + HALF_STEPS_PER_OCTAVE
+                 * math.log2(frequency / A4_FREQUENCY))
+
+
+def to_note(number: int) -> Note:
+    """
+    Args:
+        number (int): A MIDI note number, as from midi_number()
+    
+    Returns:
+        Note: The note, spelt with sharps, as there's no way to hear which
+            spelling was meant
+    """
+    octave = number // HALF_STEPS_PER_OCTAVE - 1
+    return Note(f"{PITCH_CLASS_NAMES[number % HALF_STEPS_PER_OCTAVE]}{octave}")
+
+
+class NoteTracker:
+    detector: PitchDetector
+    candidate: int = None  # The note the last blocks had
+    held: int = 0  # How many blocks in a row have had it
+    played: int = None  # The last note reported, until the pitch changes
+    
+    def __init__(self, detector: PitchDetector):
+        """
+        Constructor for NoteTracker.
+        
+        Args:
+            detector (PitchDetector): What to find each block's pitch with
+        """
+        self.detector = detector
+    
+    def feed(self, block: np.ndarray) -> int | None:
+        """
+        Follows the pitch through one more block.
+        
+        Args:
+            block (np.ndarray): The next block of samples, from -1 to 1
+        
+        Returns:
+            int | None: The MIDI note number of a note that has just started,
+                i.e. one that's now lasted HOLD_BLOCKS blocks, if there is one
+        """
+        frequency = self.detector.frequency(block)
+        note = None if frequency is None else midi_number(frequency)
+        if note != self.candidate:
+            self.candidate = note
+            self.held = 0
+        self.held += 1
+        if note is None:
+            if self.held >= HOLD_BLOCKS:
+                # A rest, not just a blip, so the same note can come again
+                self.played = None
+            return None
+        if self.held >= HOLD_BLOCKS and note != self.played:
+            self.played = note
+            return note
+        return None
+
+
+def read_wav_file(path: str) -> tuple[np.ndarray, int]:
+    """
+    Args:
+        path (str): Where the 16 bit .wav file is
+    
+    Returns:
+        tuple[np.ndarray, int]: The samples, mixed down to mono, from -1 to
+            1, and how many there are per second
+    """
+    with wave.open(path, "rb") as f:
+        if f.getsampwidth() != 2:
+            raise Exception(f"UnsupportedWavError: {f.getsampwidth() * 8} bit")
+        channels = f.getnchannels()
+        sample_rate = f.getframerate()
+        data = f.readframes(f.getnframes())
+    samples = np.frombuffer(data, dtype="<i2").reshape(-1, channels)
+    return samples.mean(axis=1) * PCM_SCALE, sample_rate
+
+
+def blocks(samples: np.ndarray, block_size: int = BLOCK_SIZE) -> np.ndarray:
+    """
+    Args:
+        samples (np.ndarray): Audio, from -1 to 1
+        block_size (int): How many samples each block has
+    
+    Returns:
+        np.ndarray: The whole blocks of the audio, one per row, as a view
+    """
+    whole = len(samples) // block_size * block_size
+    return samples[:whole].reshape(-1, block_size)
+
+
+class WavFileSource:
+    blocks: np.ndarray
+    tracker: NoteTracker
+    block_seconds: float
+    next_block: int = 0
+    started: float
+    
+    def __init__(self, path: str):
+        """
+        Constructor for WavFileSource.  Plays back a recording in real time,
+            starting now, as if it were coming from a microphone.
+        
+        Args:
+            path (str): Where the .wav file is
+        """
+        samples, sample_rate = read_wav_file(path)
+        detector = PitchDetector(sample_rate)
+        self.blocks = blocks(samples, detector.block_size)
+        self.tracker = NoteTracker(detector)
+        self.block_seconds = detector.block_size / sample_rate
+        self.started = time.perf_counter()
+    
+    def poll(self) -> [int]:
+        """
+        Returns:
+            list[int]: The notes that have started since the last poll
+        """
+        elapsed = time.perf_counter() - self.started
+        notes = []
+        while (self.next_block < len(self.blocks)
+               and (self.next_block + 1) * self.block_seconds <= elapsed):
+            note = self.tracker.feed(self.blocks[self.next_block])
+            if note is not None:
+                notes.append(note)
+            self.next_block += 1
+        return notes
+    
+    def close(self):
+        """ Nothing to close; the file has already been read. """
+
+
+class MicrophoneSource:
+    device: "pygame._sdl2.audio.AudioDevice"
+    tracker: NoteTracker
+    chunks: deque  # Audio from the device's thread that hasn't been used yet
+    pending: np.ndarray  # What's left over after the last whole block
+    
+    def __init__(self, device_name: str = None):
+        """
+        Constructor for MicrophoneSource.  Opens a capture device, which sends
+            audio from a thread of its own.
+        
+        Args:
+            device_name (str): The device's name, from --devices, by default
+                the first one
+        """
+        import pygame._sdl2.audio as sdl_audio
+        names = sdl_audio.get_audio_device_names(True)
+        if device_name is None:
+            if not names:
+                raise Exception("NoMicrophoneError")
+            device_name = names[0]
+        detector = PitchDetector()
+        self.tracker = NoteTracker(detector)
+        self.chunks = deque()
+        self.pending = np.zeros(0, dtype=np.float32)
+        self.device = sdl_audio.AudioDevice(
+            devicename=device_name, iscapture=True, frequency=SAMPLE_RATE,
+            audioformat=sdl_audio.AUDIO_F32, numchannels=1,
+            chunksize=detector.block_size, allowed_changes=0,
+            callback=self.capture
+        )
+        self.device.pause(0)
+    
+    def capture(self, device, memory: memoryview):
+        """
+        Keeps audio from the device, on the device's thread.  deque.append is
+            thread-safe, so this never waits on the game.
+        
+        Args:
+            device (AudioDevice): The device
+            memory (memoryview): The audio, as 32 bit floats
+        """
+        self.chunks.append(bytes(memory))
+    
+    def poll(self) -> [int]:
+        """
+        Returns:
+            list[int]: The notes that have started since the last poll
+        """
+        chunks = [self.pending]
+        while self.chunks:
+            chunks.append(np.frombuffer(self.chunks.popleft(),
+                                        dtype=np.float32))
+        samples = np.concatenate(chunks)
+        whole = blocks(samples, self.tracker.detector.block_size)
+        self.pending = samples[whole.size:]
+        notes = []
+        for block in whole:
+            note = self.tracker.feed(block)
+            if note is not None:
+                notes.append(note)
+        return notes
+    
+    def close(self):
+        """ Closes the device. """
+        self.device.close()
+
+
+def open_source(spec: str) -> WavFileSource | MicrophoneSource:
+    """
+    Args:
+        spec (str): A .wav file to play back, a capture device's name, or
+            "default" for the first one
+    
+    Returns:
+        WavFileSource | MicrophoneSource: Where the notes will come from
+    """
+    if spec.lower().endswith(".wav"):
+        return WavFileSource(spec)
+    if spec == "default":
+        return MicrophoneSource()
+    return MicrophoneSource(spec)
+
+
+def main():
+    """ Lists the capture devices, or finds the notes in a .wav file. """
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--devices", action="store_true")
+    parser.add_argument("path", nargs="?")
+    parser.add_argument("scale_key", nargs="?")
+    parser.add_argument("start", nargs="?")
+    args = parser.parse_args()
+    if args.devices or not args.path:
+        import pygame._sdl2.audio as sdl_audio
+        for name in sdl_audio.get_audio_device_names(True):
+            print(name)
+        return
+    
+    samples, sample_rate = read_wav_file(args.path)
+    detector = PitchDetector(sample_rate)
+    tracker = NoteTracker(detector)
+    matcher = None
+    if args.scale_key and args.start:
+        from midi import ScaleMatcher
+        matcher = ScaleMatcher(scale_midi_numbers(args.scale_key, args.start))
+    block_seconds = detector.block_size / sample_rate
+    started = time.perf_counter()
+    all_blocks = blocks(samples, detector.block_size)
+    for i, block in enumerate(all_blocks):
+        note = tracker.feed(block)
+        if note is None:
+            continue
+        seconds = (i + 1) * block_seconds
+        print(f"{seconds:6.2f}s  {to_note(note).string_form(octave=True)}")
+        if matcher is not None and matcher.feed(note):
+            print(f"Scale played, ending at {seconds:.2f}s")
+    per_block = (time.perf_counter() - started) / max(1, len(all_blocks))
+    print(f"{len(all_blocks)} blocks of {block_seconds * 1000:.1f}ms, "
+          f"{per_block * 1000:.2f}ms each to process")
+
+
+if __name__ == "__main__":
+    main()
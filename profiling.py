@@ -0,0 +1,110 @@
+"""
+Profiling the game while it's being played.  A hotkey starts a cProfile
+    capture of the game's handlers, and pressing it again saves the capture
+    as a timestamped .prof file (for pstats or snakeviz), with a text summary
+    of the functions that took the longest next to it.
+
+Usage: python profiling.py FILE.prof [--lines 25] [--sort cumulative]
+    Prints the summary of a saved capture again, sorted some other way
+"""
+import cProfile
+import io
+import os
+import pstats
+import time
+from contextlib import contextmanager
+
+PROFILE_DIR = ".profiles"
+SUMMARY_LINES = 25
+SUMMARY_SORT = "cumulative"
+
+
+class Capture:
+    profile: cProfile.Profile
+    started: float
+    frames: int = 0  # How many frames were drawn while capturing
+    
+    def __init__(self):
+        """
+        Constructor for Capture.  Nothing is recorded until the handlers run
+            inside profiled().
+        """
+        self.profile = cProfile.Profile()
+        self.started = time.perf_counter()
+    
+    def save(self, directory: str = PROFILE_DIR) -> str:
+        """
+        Stops capturing, and saves the capture and its summary.
+        
+        Args:
+            directory (str): Where to save them
+        
+        Returns:
+            str: Where the .prof file was saved; the summary is next to it,
+                ending in .txt
+        """
+        self.profile.disable()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory,
+                            time.strftime("profile-%Y%m%d-%H%M%S.prof"))
+        self.profile.dump_stats(path)
+        seconds = time.perf_counter() - self.started
+        header = (f"{self.frames} frames in {seconds:.1f}s "
+                  f"({self.frames / max(seconds, 1e-9):.1f} frames per "
+                  f"second)\n")
+        with open(path[:-len(".prof")] + ".txt", "w") as f:
+            f.write(header + summary(path))
+        return path
+
+
+@contextmanager
+def profiled(capture: Capture | None, frame: bool = False):
+    """
+    Records what happens inside the with block, if a capture is running.
+    
+    Args:
+        capture (Capture | None): The capture, or None if there isn't one
+        frame (bool): Whether the block draws a frame, to count it
+    """
+    if capture is None:
+        yield
+        return
+    capture.frames += frame
+    capture.profile.enable()
+    try:
+        yield
+    finally:
+        capture.profile.disable()
+
+
+def summary(path: str, lines: int = SUMMARY_LINES,
+            sort: str = SUMMARY_SORT) -> str:
+    """
+    Args:
+        path (str): A saved .prof file
+        lines (int): How many functions to list
+        sort (str): What to sort them by, as in pstats.Stats.sort_stats
+    
+    Returns:
+        str: The functions that took the longest, as pstats prints them
+    """
+    out = io.StringIO()
+    stats = pstats.Stats(path, stream=out)
+    stats.strip_dirs().sort_stats(sort).print_stats(lines)
+    return out.getvalue()
+
+
+def main():
+    """ Prints the summary of a saved capture. """
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("path")
+    parser.add_argument("--lines", type=int, default=SUMMARY_LINES)
+    parser.add_argument("--sort", default=SUMMARY_SORT,
+                        help="e.g. cumulative, tottime or ncalls")
+    args = parser.parse_args()
+    print(summary(args.path, args.lines, args.sort))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,602 @@
+"""
+Draws scales as sheet music without opening a window, as SVG or as PNG.  The
+    glyphs come straight out of Game Font, which is read and rasterised in pure
+    Python, so the output looks the same as the scales on the boulders.
+
+Usage: python render.py [--png] [--size N] [--[no-]key-signatures]
+    SCALE_KEY CLEF START
+    e.g. python render.py --png q Treble Eb4
+    Scales are written with their key signatures if the game's settings say
+    so, unless told otherwise.
+"""
+import struct
+import zlib
+from hashlib import sha256
+from pathlib import Path
+from config import Settings
+from helpers import int_from_pattern
+from useful import GAME_FONT_PATH
+from theory import SCALE_TYPE_INFO, CLEFS, KEY_SIGNATURES, LEDGER_LINES, \
+    Exercise, Note, sheet_music, exercise_key_signature
+from scale import SCALE_TEXT_SIZE, BACKGROUND_WIDTH, BACKGROUND_HEIGHT
+
+RENDER_CACHE_DIR = ".render_cache"
+CURVE_STEPS = 8  # How many straight lines to use for each curve in a glyph
+SUBSAMPLES = 4  # Scanlines per pixel when rasterising, for anti-aliasing
+TEXT_DROP = 10  # How far below the centre of the background the text sits
+
+# Flags for the points of simple glyphs
+ON_CURVE = 0x01
+X_SHORT = 0x02
+Y_SHORT = 0x04
+REPEAT = 0x08
+X_SAME_OR_POSITIVE = 0x10
+Y_SAME_OR_POSITIVE = 0x20
+
+# Flags for the components of composite glyphs
+ARGS_ARE_WORDS = 0x0001
+ARGS_ARE_XY = 0x0002
+HAS_SCALE = 0x0008
+MORE_COMPONENTS = 0x0020
+HAS_XY_SCALE = 0x0040
+HAS_TWO_BY_TWO = 0x0080
+
+
+class TrueTypeFont:
+    data: bytes
+    tables: dict[str, int]
+    units_per_em: int
+    ascent: int
+    descent: int
+    version: str
+    
+    def __init__(self, path: str):
+        """
+        Constructor for TrueTypeFont.  Reads just enough of a .ttf file to get
+            the outlines and widths of its glyphs.
+        
+        Args:
+            path (str): The path to the .ttf file
+        """
+        self.data = Path(path).read_bytes()
+        num_tables = self.unpack(">H", 4)[0]
+        self.tables = {}
+        for i in range(num_tables):
+            tag, _, offset, _ = self.unpack(">4sIII", 12 + 16 * i)
+            self.tables[tag.decode("latin-1")] = offset
+        
+        head = self.tables["head"]
+        self.units_per_em = self.unpack(">H", head + 18)[0]
+        self.long_loca = self.unpack(">h", head + 50)[0] == 1
+        self.num_glyphs = self.unpack(">H", self.tables["maxp"] + 4)[0]
+        hhea = self.tables["hhea"]
+        self.ascent, self.descent = self.unpack(">hh", hhea + 4)
+        self.num_h_metrics = self.unpack(">H", hhea + 34)[0]
+        # Any change to the file, even without bumping its revision, has to
+        # invalidate what was drawn with it.
+        self.version = sha256(self.data).hexdigest()[:16]
+        self.cmap = self.read_cmap()
+        self.outlines = {}
+    
+    def unpack(self, fmt: str, offset: int) -> tuple:
+        """
+        Args:
+            fmt (str): The struct format to read
+            offset (int): Where in the file to read it from
+        
+        Returns:
+            tuple: The values read
+        """
+        return struct.unpack_from(fmt, self.data, offset)
+    
+    def read_cmap(self) -> dict[int, int]:
+        """
+        Reads the mapping from characters to glyphs, from a format 4 or a
+            format 12 Windows Unicode subtable.
+        
+        Returns:
+            dict[int, int]: The glyph index for each codepoint
+        """
+        cmap = self.tables["cmap"]
+        cmap_subtables = {}
+        for i in range(self.unpack(">H", cmap + 2)[0]):
+            platform, encoding, offset = self.unpack(">HHI", cmap + 4 + 8 * i)
+            cmap_subtables[(platform, encoding)] = cmap + offset
+        
+        mapping = {}
+        if (3, 10) in cmap_subtables:
+            sub = cmap_subtables[(3, 10)]
+            for i in range(self.unpack(">I", sub + 12)[0]):
+                first, last, glyph = self.unpack(">III", sub + 16 + 12 * i)
+                for char in range(first, last + 1):
+                    mapping[char] = glyph + char - first
+            return mapping
+        if (3, 1) not in cmap_subtables:
+            raise Exception("UnsupportedFontError: no Unicode cmap")
+        
+        sub = cmap_subtables[(3, 1)]
+        seg_count = self.unpack(">H", sub + 6)[0] // 2
+        ends = sub + 14
+        starts = ends + 2 * seg_count + 2
+        deltas = starts + 2 * seg_count
+        range_offsets = deltas + 2 * seg_count
+        for i in range(seg_count):
+            end = self.unpack(">H", ends + 2 * i)[0]
+            start = self.unpack(">H", starts + 2 * i)[0]
+            delta = self.unpack(">h", deltas + 2 * i)[0]
+            range_offset = self.unpack(">H", range_offsets + 2 * i)[0]
+            for char in range(start, end + 1):
+                if char == 0xFFFF:
+                    continue
+                if range_offset == 0:
+                    glyph = (char + delta) & 0xFFFF
+                else:
+                    glyph_at = (range_offsets + 2 * i + range_offset
+                                + 2 * (char - start))
+                    glyph = self.unpack(">H", glyph_at)[0]
+                    if glyph:
+                        glyph = (glyph + delta) & 0xFFFF
+                if glyph:
+                    mapping[char] = glyph
+        return mapping
+    
+    def glyph_index(self, char: str) -> int:
+        """
+        Args:
+            char (str): The character to look up
+        
+        Returns:
+            int: The index of its glyph, 0 (the missing glyph) if there's none
+        """
+        return self.cmap.get(ord(char), 0)
+    
+    def advance(self, glyph: int) -> int:
+        """
+        Args:
+            glyph (int): The index of the glyph
+        
+        Returns:
+            int: How far along to move after drawing it, in font units
+        """
+        metric = min(glyph, self.num_h_metrics - 1)
+        return self.unpack(">H", self.tables["hmtx"] + 4 * metric)[0]
+    
+    def glyph_bounds(self, glyph: int) -> tuple[int, int]:
+        """
+        Args:
+            glyph (int): The index of the glyph
+        
+        Returns:
+            tuple[int, int]: The start and end of its data in the glyf table
+        """
+        loca = self.tables["loca"]
+        if self.long_loca:
+            return self.unpack(">II", loca + 4 * glyph)
+        start, end = self.unpack(">HH", loca + 2 * glyph)
+        return start * 2, end * 2
+    
+    def outline(self, glyph: int) -> [[tuple[float, float, bool]]]:
+        """
+        Gets the contours of a glyph, as lists of (x, y, on_curve) points in
+            font units.  These are cached, as the same few glyphs get drawn
+            over and over again.
+        
+        Args:
+            glyph (int): The index of the glyph
+        
+        Returns:
+            list[list[tuple[float, float, bool]]]: The contours of the glyph
+        """
+        if glyph not in self.outlines:
+            self.outlines[glyph] = self.read_outline(glyph)
+        return self.outlines[glyph]
+    
+    def read_outline(self, glyph: int) -> [[tuple[float, float, bool]]]:
+        """ See outline for explanation; this does the actual reading. """
+        start, end = self.glyph_bounds(glyph)
+        if start == end:
+            return []  # E.g. spaces and the blank accidentals
+        at = self.tables["glyf"] + start
+        num_contours = self.unpack(">h", at)[0]
+        at += 10
+        if num_contours < 0:
+            return self.read_composite_outline(at)
+        
+        contour_ends = self.unpack(f">{num_contours}H", at)
+        at += 2 * num_contours
+        at += 2 + self.unpack(">H", at)[0]  # Skip the hinting instructions
+        num_points = contour_ends[-1] + 1 if contour_ends else 0
+        
+        flags = []
+        while len(flags) < num_points:
+            flag = self.data[at]
+            at += 1
+            repeats = 1
+            if flag & REPEAT:
+                repeats += self.data[at]
+                at += 1
+            flags += [flag] * repeats
+        
+        coordinates = []
+        for short, same_or_positive in ((X_SHORT, X_SAME_OR_POSITIVE),
+                                        (Y_SHORT, Y_SAME_OR_POSITIVE)):
+            value = 0
+            values = []
+            for flag in flags:
+                if flag & short:
+                    change = self.data[at]
+                    at += 1
+                    value += change if flag & same_or_positive else -change
+                elif not flag & same_or_positive:
+                    value += self.unpack(">h", at)[0]
+                    at += 2
+                values.append(value)
+            coordinates.append(values)
+        
+        contours = []
+        first = 0
+        for last in contour_ends:
+            contours.append([
+                (coordinates[0][i], coordinates[1][i], bool(flags[i] & ON_CURVE))
+                for i in range(first, last + 1)
+            ])
+            first = last + 1
+        return contours
+    
+    def read_composite_outline(self,
+                               at: int
+                               ) -> [[tuple[float, float, bool]]]:
+        """
+        Reads a glyph made up of other glyphs, moved and possibly stretched.
+        
+        Args:
+            at (int): Where the list of components starts
+        
+        Returns:
+            list[list[tuple[float, float, bool]]]: The contours of the glyph
+        """
+        contours = []
+        flags = MORE_COMPONENTS
+        while flags & MORE_COMPONENTS:
+            flags, component = self.unpack(">HH", at)
+            at += 4
+            if flags & ARGS_ARE_WORDS:
+                dx, dy = self.unpack(">hh", at)
+                at += 4
+            else:
+                dx, dy = self.unpack(">bb", at)
+                at += 2
+            if not flags & ARGS_ARE_XY:
+                dx = dy = 0  # Point matching is not used by Game Font
+            
+            a, b, c, d = 1., 0., 0., 1.
+            if flags & HAS_SCALE:
+                a = d = self.unpack(">h", at)[0] / 0x4000
+                at += 2
+            elif flags & HAS_XY_SCALE:
+                a, d = (v / 0x4000 for v in self.unpack(">hh", at))
+                at += 4
+            elif flags & HAS_TWO_BY_TWO:
+                a, b, c, d = (v / 0x4000 for v in self.unpack(">hhhh", at))
+                at += 8
+            
+            for contour in self.outline(component):
+                contours.append([
+                    (a * x + c * y + dx, b * x + d * y + dy, on_curve)
+                    for x, y, on_curve in contour
+                ])
+        return contours
+
+
+def quadratic_segments(contour: [tuple[float, float, bool]]
+                       ) -> [tuple[tuple, tuple, tuple]]:
+    """
+    Splits a TrueType contour into quadratic curves, filling in the on-curve
+        points that are implied between two off-curve points.  Straight lines
+        come out as curves with their control point in the middle.
+    
+    Args:
+        contour (list[tuple[float, float, bool]]): The points of the contour
+    
+    Returns:
+        list[tuple[tuple, tuple, tuple]]: (start, control, end) for each curve
+    """
+    points = []
+    for i, (x, y, on_curve) in enumerate(contour):
+        prev_x, prev_y, prev_on_curve = contour[i - 1]
+        if not on_curve and not prev_on_curve:
+            points.append(((x + prev_x) / 2, (y + prev_y) / 2, True))
+        points.append((x, y, on_curve))
+    if not points:
+        return []
+    # Rotate so that we start on the curve
+    first_on = next(i for i, point in enumerate(points) if point[2])
+    points = points[first_on:] + points[:first_on]
+    
+    segments = []
+    start = points[0][:2]
+    control = None
+    for x, y, on_curve in points[1:] + points[:1]:
+        if not on_curve:
+            control = (x, y)
+            continue
+        end = (x, y)
+        if control is None:
+            control = ((start[0] + x) / 2, (start[1] + y) / 2)
+        segments.append((start, control, end))
+        start = end
+        control = None
+    return segments
+
+
+def exercise_text(exercise: Exercise, key_signatures: bool = False) -> str:
+    """
+    Args:
+        exercise (Exercise): The scale type key, clef name and starting note
+        key_signatures (bool): Whether to write it with its key signature, as
+            the game does when "key_signatures" is set
+    
+    Returns:
+        str: The scale as sheet music in Game Font, just as it's drawn in game
+    """
+    scale_key, clef_name, start = exercise
+    pattern = [int_from_pattern(c) for c in SCALE_TYPE_INFO[scale_key].pattern]
+    key_signature = KEY_SIGNATURES[0]
+    if key_signatures:
+        key_signature = exercise_key_signature(exercise)
+    return sheet_music(pattern, Note(start), CLEFS[clef_name], key_signature)
+
+
+class StaffRenderer:
+    font: TrueTypeFont
+    size: int
+    key_signatures: bool  # Whether scales are written with key signatures
+    
+    def __init__(self, font_path: str = GAME_FONT_PATH, size: int = 1,
+                 key_signatures: bool = False):
+        """
+        Constructor for StaffRenderer.
+        
+        Args:
+            font_path (str): The font to draw with, by default Game Font
+            size (int): How many times bigger than in game to draw the scales
+            key_signatures (bool): Whether to write the scales with their key
+                signatures, as the game does when "key_signatures" is set
+        """
+        self.font = TrueTypeFont(font_path)
+        self.size = size
+        self.key_signatures = key_signatures
+        self.width = BACKGROUND_WIDTH * size
+        self.height = BACKGROUND_HEIGHT * size
+    
+    def segments(self, exercise: Exercise) -> [tuple[tuple, tuple, tuple]]:
+        """
+        Lays out the glyphs for an exercise in pixels, centred on the white
+            background in the same way that Scale.make_text centres them.
+        
+        Args:
+            exercise (Exercise): The exercise to lay out
+        
+        Returns:
+            list[tuple[tuple, tuple, tuple]]: The quadratic curves to draw,
+                closed into contours, in pixels with y going down
+        """
+        glyphs = [self.font.glyph_index(c)
+                  for c in exercise_text(exercise, self.key_signatures)]
+        px_per_unit = SCALE_TEXT_SIZE * self.size / self.font.units_per_em
+        text_width = sum(self.font.advance(g) for g in glyphs) * px_per_unit
+        text_height = (self.font.ascent - self.font.descent) * px_per_unit
+        pen_x = (self.width - text_width) / 2
+        baseline = ((self.height - text_height) / 2 + TEXT_DROP * self.size
+                    + self.font.ascent * px_per_unit)
+        
+        def to_px(point: tuple[float, float]) -> tuple[float, float]:
+            return (pen_x + point[0] * px_per_unit,
+                    baseline - point[1] * px_per_unit)
+        
+        segments = []
+        for glyph in glyphs:
+            for contour in self.font.outline(glyph):
+                for start, control, end in quadratic_segments(contour):
+                    segments.append((to_px(start), to_px(control), to_px(end)))
+            pen_x += self.font.advance(glyph) * px_per_unit
+        return segments
+    
+    def svg(self, exercise: Exercise) -> str:
+        """
+        Draws an exercise as an SVG, with the glyphs turned into paths so that
+            it doesn't need Game Font to be installed to be viewed.
+        
+        Args:
+            exercise (Exercise): The exercise to draw
+        
+        Returns:
+            str: The SVG document
+        """
+        path = []
+        previous_end = None
+        for start, control, end in self.segments(exercise):
+            if start != previous_end:
+                path.append(f"M{start[0]:.2f} {start[1]:.2f}")
+            path.append(f"Q{control[0]:.2f} {control[1]:.2f} "
+                        f"{end[0]:.2f} {end[1]:.2f}")
+            previous_end = end
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" '
+            f'width="{self.width}" height="{self.height}" '
+            f'viewBox="0 0 {self.width} {self.height}">'
+            f'<rect width="100%" height="100%" fill="white"/>'
+            f'<path fill="black" d="{"".join(path)}"/>'
+            f'</svg>\n'
+        )
+    
+    def png(self, exercise: Exercise) -> bytes:
+        """
+        Draws an exercise as a greyscale PNG.  The curves are flattened into
+            lines and filled with the non-zero winding rule, SUBSAMPLES
+            scanlines per row of pixels, with the ends of each span shaded by
+            how much of the pixel they cover.
+        
+        Args:
+            exercise (Exercise): The exercise to draw
+        
+        Returns:
+            bytes: The PNG file
+        """
+        edges = []
+        for start, control, end in self.segments(exercise):
+            previous = start
+            for step in range(1, CURVE_STEPS + 1):
+                t = step / CURVE_STEPS
+                point = tuple(
+                    (1 - t) ** 2 * s + 2 * (1 - t) * t * c + t ** 2 * e
+                    for s, c, e in zip(start, control, end)
+                )
+                if point[1] != previous[1]:
+                    edges.append((previous, point))
+                previous = point
+        
+        coverage = [[0.] * self.width for _ in range(self.height)]
+        for row in range(self.height * SUBSAMPLES):
+            y = (row + .5) / SUBSAMPLES
+            crossings = []
+            for (x0, y0), (x1, y1) in edges:
+                if min(y0, y1) <= y < max(y0, y1):
+                    x = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+                    crossings.append((x, 1 if y1 > y0 else -1))
+            crossings.sort()
+            winding = 0
+            for i, (x, direction) in enumerate(crossings[:-1]):
+                winding += direction
+                if winding:
+                    self.fill_span(coverage[row // SUBSAMPLES],
+                                   x, crossings[i + 1][0])
+        
+        raw = bytearray()
+        for line in coverage:
+            raw.append(0)  # No filter on this row
+            raw += bytes(255 - min(255, int(255 * c)) for c in line)
+        return b"".join((
+            b"\x89PNG\r\n\x1a\n",
+            png_chunk(b"IHDR", struct.pack(">IIBBBBB", self.width,
+                                           self.height, 8, 0, 0, 0, 0)),
+            png_chunk(b"IDAT", zlib.compress(bytes(raw), 9)),
+            png_chunk(b"IEND", b""),
+        ))
+    
+    def fill_span(self, line: [float], start: float, end: float):
+        """
+        Adds one scanline's worth of coverage between start and end.
+        
+        Args:
+            line (list[float]): The coverage of each pixel in the row
+            start (float): The x-coordinate at which the span starts
+            end (float): The x-coordinate at which the span ends
+        """
+        start = max(start, 0.)
+        end = min(end, float(self.width))
+        if end <= start:
+            return
+        first, last = int(start), int(end)
+        share = 1 / SUBSAMPLES
+        if first == last:
+            line[first] += (end - start) * share
+            return
+        line[first] += (first + 1 - start) * share
+        for x in range(first + 1, last):
+            line[x] += share
+        if last < self.width:
+            line[last] += (end - last) * share
+    
+    def cache_key(self, exercise: Exercise, kind: str) -> str:
+        """
+        Args:
+            exercise (Exercise): The exercise that was drawn
+            kind (str): "svg" or "png"
+        
+        Returns:
+            str: A hash of everything that changes what the drawing looks like
+        """
+        scale_key, clef_name, start = exercise
+        key = "|".join((SCALE_TYPE_INFO[scale_key].name, start, clef_name,
+                        self.font.version, str(self.size),
+                        str(self.key_signatures), kind))
+        return sha256(key.encode()).hexdigest()
+    
+    def cached(self,
+               exercise: Exercise,
+               kind: str = "svg",
+               cache_dir: str = RENDER_CACHE_DIR
+               ) -> Path:
+        """
+        Draws an exercise, unless the same drawing is already on disk.
+        
+        Args:
+            exercise (Exercise): The exercise to draw
+            kind (str): "svg" or "png"
+            cache_dir (str): The directory to keep the drawings in
+        
+        Returns:
+            Path: Where the drawing is
+        """
+        path = Path(cache_dir) / f"{self.cache_key(exercise, kind)}.{kind}"
+        if path.exists():
+            return path
+        match kind:
+            case "svg":
+                contents = self.svg(exercise).encode()
+            case "png":
+                contents = self.png(exercise)
+            case _:
+                raise ValueError(f"UnknownRenderKindError: {kind}")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename, so nobody ever reads half of a drawing
+        temp_path = path.with_suffix(f".{kind}.tmp")
+        temp_path.write_bytes(contents)
+        temp_path.replace(path)
+        return path
+
+
+def png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    """
+    Args:
+        chunk_type (bytes): The four letter type of the chunk
+        data (bytes): The contents of the chunk
+    
+    Returns:
+        bytes: The chunk, with its length and checksum
+    """
+    checksum = zlib.crc32(chunk_type + data)
+    return struct.pack(">I", len(data)) + chunk_type + data \
+        + struct.pack(">I", checksum)
+
+
+def main():
+    """ Draws the exercise given on the command line and prints its path. """
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("scale_key", choices=SCALE_TYPE_INFO)
+    parser.add_argument("clef", choices=CLEFS)
+    parser.add_argument("start")
+    parser.add_argument("--png", action="store_true")
+    parser.add_argument("--size", type=int, default=1)
+    parser.add_argument("--key-signatures",
+                        action=argparse.BooleanOptionalAction,
+                        default=Settings.load().key_signatures)
+    args = parser.parse_args()
+    exercise = (args.scale_key, args.clef, args.start)
+    # Only what the game could draw, with as many ledger lines as it allows,
+    # so that nothing off the staff ever gets into the cache
+    from validate import Cell
+    if exercise not in Cell(args.scale_key, args.clef, LEDGER_LINES,
+                            LEDGER_LINES).exercises():
+        parser.error(f"the game never starts a "
+                     f"{SCALE_TYPE_INFO[args.scale_key].name} scale on "
+                     f"{args.start} in the {args.clef} clef")
+    renderer = StaffRenderer(size=args.size,
+                             key_signatures=args.key_signatures)
+    print(renderer.cached(exercise, "png" if args.png else "svg"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+The rules of the game: how big and fast the boulders are, how often they
+    come, and what they're worth.  Both the game and the simulations of it
+    use these, so they don't need designer.
+"""
+
+BOULDER_SCALE = 5
+EMOJI_WIDTH = 34
+BOULDER_WIDTH = BOULDER_SCALE * EMOJI_WIDTH
+BOULDER_HEIGHT = BOULDER_SCALE * 158 // 5  # The emoji isn't quite square
+BOULDER_BASE_SPEED = 1
+BOULDER_SPEED = 2
+BOULDER_BASE_POINTS = 1
+
+FAILED_BOULDER_PENALTY = -5
+
+BOULDER_MAX_PROB = 2 ** -6
+MAX_BOULDERS = 4
+
+# The window that everything is laid out for, and that simulations assume
+WINDOW_WIDTH = 800
+WINDOW_HEIGHT = 600
+FPS = 30  # designer's default
+GUTTER = 200  # How far away from the right to put the score and other info
+
+SPEED_SCORE_SCALE = 30  # How many points it takes to roughly double the speed
+SPEED_EXPONENT = .9
+SPAWN_FLOOR = .1  # The chance of a boulder at a score of 0, out of max_prob
+SPAWN_MIDPOINT = 50  # The score at which the chance is half way up the curve
+SPAWN_SPREAD = 25  # How many points it takes to go most of the way up
+
+
+def boulder_speed(score: float,
+                  base_speed: int,
+                  score_scale: float = SPEED_SCORE_SCALE,
+                  exponent: float = SPEED_EXPONENT
+                  ) -> float:
+    """
+    Finds the speed with which to move the boulders down, given the player's
+        current score.
+    
+    Args:
+        score (int): The player's score
+        base_speed (int): The base speed of the boulders, when the score is less
+            than 1
+        score_scale (float): How many points it takes to roughly double the
+            speed
+        exponent (float): How quickly the speed keeps going up after that
+    
+    Returns:
+        int: The speed for the boulders
+    """
+    if score < 1:
+        return base_speed
+    return base_speed * (1 + ((score - 1) / score_scale) ** exponent)
+
+
+def boulder_probability(score: float,
+                        boulder_count: int,
+                        max_prob: float,
+                        floor: float = SPAWN_FLOOR,
+                        midpoint: float = SPAWN_MIDPOINT,
+                        spread: float = SPAWN_SPREAD
+                        ) -> float:
+    """
+    Finds the chance of making a new boulder this frame, given the player's
+        current score.  It starts at `floor` of max_prob, and goes up to
+        max_prob as the score increases.  If there are no boulders, it's always
+        max_prob.
+    
+    Args:
+        score (float): The player's score
+        boulder_count (int): How many boulders there are at the moment
+        max_prob (float): The highest chance of making a boulder in a frame
+        floor (float): The lowest chance, as a fraction of max_prob
+        midpoint (float): The score at which the chance is half way up
+        spread (float): How many points it takes to go most of the way up
+    
+    Returns:
+        float: The chance of making a new boulder this frame
+    """
+    if boulder_count == 0:
+        return max_prob
+    return max_prob * (
+        floor + (1 - floor) / (1 + 2.7**((midpoint - score) / spread))
+    )
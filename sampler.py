@@ -0,0 +1,249 @@
+# Imports for type checking
+from __future__ import annotations
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from world import World
+
+# Normal imports
+import random
+from dataclasses import dataclass, field
+from theory import SCALE_TYPE_INFO, SCALE_TYPE_KEYS, CLEFS, \
+    SCALE_KEY_SIGNATURES, Exercise
+
+ERROR_PRIOR = .5  # How often we assume the player is wrong before any guesses
+SLOW_REACTION_FRAMES = 150  # 5 seconds at 30 fps; slower than this is "slow"
+STATS_DECAY = .3  # How much each new guess counts towards the running stats
+WEIGHT_FLOOR = .1  # Mastered exercises still come up sometimes
+SLOWNESS_WEIGHT = .5  # How much being slow counts compared to being wrong
+
+
+class FenwickTree:
+    weights: [float]
+    tree: [float]
+    
+    def __init__(self, weights: [float]):
+        """
+        Constructor for FenwickTree (a.k.a. binary indexed tree).  Builds the
+            tree of partial sums in O(n), so that updates, totals and weighted
+            searches are all O(log n) afterwards.
+        
+        Args:
+            weights (list[float]): The initial non-negative weights
+        """
+        self.weights = list(weights)
+        self.tree = [0.] + self.weights
+        for i in range(1, len(self.tree)):
+            parent = i + (i & -i)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[i]
+    
+    def __len__(self) -> int:
+        """
+        Returns:
+            int: The number of weights in the tree
+        """
+        return len(self.weights)
+    
+    def __getitem__(self, index: int) -> float:
+        """
+        Args:
+            index (int): The index of the weight to get
+        
+        Returns:
+            float: The weight at index
+        """
+        return self.weights[index]
+    
+    def __setitem__(self, index: int, weight: float):
+        """
+        Changes the weight at index, updating the partial sums in O(log n).
+        
+        Args:
+            index (int): The index of the weight to change
+            weight (float): The new, non-negative, weight
+        """
+        delta = weight - self.weights[index]
+        self.weights[index] = weight
+        i = index + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+    
+    def total(self) -> float:
+        """
+        Returns:
+            float: The sum of all of the weights
+        """
+        total = 0.
+        i = len(self.weights)
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+    
+    def find(self, target: float) -> int:
+        """
+        Finds the index at which the running total of the weights first goes
+            above target, by walking down the tree in O(log n).
+        
+        Args:
+            target (float): A value in [0, total())
+        
+        Returns:
+            int: The index of the weight that target falls within
+        """
+        index = 0
+        step = 1 << (len(self.weights).bit_length() - 1) if self.weights else 0
+        while step:
+            if index + step < len(self.tree) and self.tree[index+step] <= target:
+                index += step
+                target -= self.tree[index]
+            step >>= 1
+        # Floating point drift can push us one past the end
+        return min(index, len(self.weights) - 1)
+
+
+@dataclass
+class ExerciseStats:
+    prior: float  # The weight this exercise would have had being chosen evenly
+    error_rate: float = ERROR_PRIOR
+    reaction_frames: float = SLOW_REACTION_FRAMES
+    
+    def record(self, correct: bool, reaction_frames: int):
+        """
+        Folds a guess into the running (exponentially decaying) stats.
+        
+        Args:
+            correct (bool): Whether the guess was right
+            reaction_frames (int): How many frames the boulder was on screen
+                before the guess
+        """
+        self.error_rate += STATS_DECAY * ((not correct) - self.error_rate)
+        self.reaction_frames += (
+            STATS_DECAY * (reaction_frames - self.reaction_frames)
+        )
+    
+    def weight(self) -> float:
+        """
+        The weight is higher the more often the player gets this exercise wrong
+            and the slower they are at it.
+        
+        Returns:
+            float: The weight with which to sample this exercise
+        """
+        slowness = min(self.reaction_frames / SLOW_REACTION_FRAMES, 1.)
+        return self.prior * (
+            WEIGHT_FLOOR + self.error_rate + SLOWNESS_WEIGHT * slowness
+        )
+
+
+@dataclass
+class ExerciseSampler:
+    exercises: [Exercise]
+    stats: [ExerciseStats]
+    ids: dict[Exercise, int] = field(default_factory=dict)
+    weights: FenwickTree = None
+    rng: random.Random = random  # The random module works as a Random too
+    
+    def __post_init__(self):
+        """ Builds the lookup from exercise to id and the tree of weights. """
+        self.ids = {exercise: i for i, exercise in enumerate(self.exercises)}
+        self.weights = FenwickTree(stats.weight() for stats in self.stats)
+    
+    @classmethod
+    def from_world(cls,
+                   world: World,
+                   rng: random.Random = random
+                   ) -> ExerciseSampler:
+        """
+        Enumerates every exercise allowed by the world's settings.  Each one
+            starts with the chance it would have had being picked the old way
+            (scale type, then clef, then starting note, each evenly), so the
+            sampler only drifts from that as the player makes guesses.
+        
+        Args:
+            world (World): The world from which to get settings
+            rng (Random): Where to get random numbers from, so that separate
+                games can be repeatable and independent of each other
+        
+        Returns:
+            ExerciseSampler: A sampler over all of the allowed exercises
+        """
+        scale_keys = [
+            SCALE_TYPE_KEYS[name] for name in world.settings.scale_types
+            if name in SCALE_TYPE_KEYS
+        ]
+        clef_names = [name for name in world.settings.clefs if name in CLEFS]
+        clef_notes = {name: CLEFS[name].all_notes(world) for name in clef_names}
+        
+        exercises = []
+        stats = []
+        for scale_key in scale_keys:
+            for clef_name in clef_names:
+                starts = sorted(
+                    SCALE_TYPE_INFO[scale_key].possible_starts
+                    & clef_notes[clef_name]
+                )
+                if world.settings.key_signatures:
+                    starts = [
+                        start for start in starts
+                        if -world.settings.max_flats_key_signature
+                        <= SCALE_KEY_SIGNATURES[scale_key][start[:-1]]
+                        <= world.settings.max_sharps_key_signature
+                    ]
+                for start in starts:
+                    exercises.append((scale_key, clef_name, start))
+                    stats.append(ExerciseStats(
+                        1 / (len(scale_keys) * len(clef_names) * len(starts))
+                    ))
+        if not exercises:
+            raise Exception(
+                "NoExercisesError: "
+                f"{world.settings.scale_types}, {world.settings.clefs}"
+            )
+        return cls(exercises, stats, rng=rng)
+    
+    def sample_id(self) -> int:
+        """
+        Picks an exercise, favouring those the player is weakest at, in
+            O(log n).
+        
+        Returns:
+            int: The id of the chosen exercise
+        """
+        return self.weights.find(self.rng.random() * self.weights.total())
+    
+    def sample(self) -> Exercise:
+        """
+        Returns:
+            Exercise: An exercise, chosen as in sample_id
+        """
+        return self.exercises[self.sample_id()]
+    
+    def glyphs(self, exercise_id: int) -> str | None:
+        """
+        Args:
+            exercise_id (int): The id of an exercise
+        
+        Returns:
+            str | None: The sheet music for the exercise, if it's already made;
+                these exercises are made from the settings, so it never is
+        """
+        return None
+    
+    def record(self, exercise: Exercise, correct: bool, reaction_frames: int):
+        """
+        Updates the weight of an exercise after a guess, in O(log n).
+        
+        Args:
+            exercise (Exercise): The exercise that was guessed at
+            correct (bool): Whether the guess was right
+            reaction_frames (int): How many frames the boulder was on screen
+                before the guess
+        """
+        if exercise not in self.ids:
+            return
+        i = self.ids[exercise]
+        self.stats[i].record(correct, reaction_frames)
+        self.weights[i] = self.stats[i].weight()
@@ -0,0 +1,323 @@
+"""
+Runs many games at once in one process, for a lab full of students, with each
+    game a Simulation that is driven over a socket.
+
+Protocol (everything big-endian):
+    Client to server: one key name per line, e.g. b"left\\n", as in designer.
+        b"escape\\n" ends the session.
+    Server to client: messages of a 1 byte type, a 4 byte length, then data:
+        b"T": JSON list of the session's exercises; frames refer to them by id
+        b"F": a frame: FRAME_HEADER, then a BOULDER_RECORD for each boulder
+        b"E": JSON of the final score, just before the server hangs up
+
+Usage: python server.py --unix /tmp/scale_drop.sock
+       python server.py --port 8765
+       python server.py --clients 200 --seconds 10  (local load test)
+"""
+import asyncio
+import json
+import struct
+import time
+from dataclasses import dataclass, field
+from random import Random
+from config import Settings
+from rules import FPS
+from simulation import Simulation
+
+FRAME_HEADER = struct.Struct(">IfHB?")  # frame, score, selected, count, paused
+BOULDER_RECORD = struct.Struct(">HhHe")  # x, y, exercise id, value
+MESSAGE_HEADER = struct.Struct(">cI")
+MAX_WRITE_BUFFER = 64 * 1024  # Skip frames for clients this far behind
+MAX_KEY_LENGTH = 32
+LISTEN_BACKLOG = 1024  # A whole lab connecting at once shouldn't be refused
+
+
+def message(kind: bytes, data: bytes) -> bytes:
+    """
+    Args:
+        kind (bytes): The one byte type of the message
+        data (bytes): The contents of the message
+    
+    Returns:
+        bytes: The message, ready to send
+    """
+    return MESSAGE_HEADER.pack(kind, len(data)) + data
+
+
+@dataclass(eq=False)  # Sessions go in a set, so hash them by identity
+class Session:
+    simulation: Simulation
+    writer: asyncio.StreamWriter
+    exercise_ids: dict = field(default_factory=dict)
+    
+    def __post_init__(self):
+        """ Uses the sampler's ids, so both ends agree on what they mean """
+        self.exercise_ids = self.simulation.sampler.ids
+    
+    def exercise_table(self) -> bytes:
+        """
+        Returns:
+            bytes: The message telling the client which id is which exercise
+        """
+        table = json.dumps(self.simulation.sampler.exercises)
+        return message(b"T", table.encode())
+    
+    def frame(self) -> bytes:
+        """
+        Packs the state of the game that the client needs in order to draw it.
+        
+        Returns:
+            bytes: The frame message
+        """
+        simulation = self.simulation
+        parts = [FRAME_HEADER.pack(
+            simulation.frame, simulation.score, simulation.selected,
+            len(simulation.boulders), simulation.paused
+        )]
+        for boulder in simulation.boulders.values():
+            parts.append(BOULDER_RECORD.pack(
+                boulder.x, max(-0x8000, int(boulder.y)),
+                self.exercise_ids[boulder.exercise], boulder.value
+            ))
+        return message(b"F", b"".join(parts))
+
+
+class GameServer:
+    settings: Settings
+    sessions: set[Session]
+    seed: int | None
+    
+    def __init__(self, settings: Settings = None, seed: int = None):
+        """
+        Constructor for GameServer.  The settings, and through them the tables
+            in scale.py, are shared between all of the sessions.
+        
+        Args:
+            settings (Settings): The settings for every session, by default
+                loaded from .config.json
+            seed (int): Seeds every session's random numbers, for repeatable
+                runs; by default, each session is different
+        """
+        self.settings = settings if settings is not None else Settings.load()
+        self.sessions = set()
+        self.seed = seed
+    
+    async def handle(self,
+                     reader: asyncio.StreamReader,
+                     writer: asyncio.StreamWriter):
+        """
+        Runs one client's session: sends the exercise table, then feeds its
+            key presses to its simulation until it presses escape or leaves.
+        
+        Args:
+            reader (StreamReader): Where the client's keys come from
+            writer (StreamWriter): Where the client's frames go
+        """
+        session = Session(Simulation(self.settings, Random(self.seed)), writer)
+        writer.write(session.exercise_table())
+        self.sessions.add(session)
+        try:
+            while True:
+                line = await reader.readline()
+                key = line.strip().decode("ascii", "replace")
+                if not line or key == "escape":
+                    break
+                if len(key) <= MAX_KEY_LENGTH:
+                    session.simulation.press(key)
+        except (ConnectionError, ValueError, asyncio.LimitOverrunError):
+            # It left, or sent a line longer than the reader's limit, which
+            # readline() raises a ValueError for
+            pass
+        finally:
+            self.sessions.discard(session)
+        try:
+            final = {"score": session.simulation.score,
+                     "frames": session.simulation.frame}
+            writer.write(message(b"E", json.dumps(final).encode()))
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()  # Whatever happened, the connection is closed
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+    
+    async def tick_forever(self):
+        """
+        Steps every session once per frame, all from the one task, and sends
+            each client its frame.  Clients that aren't keeping up miss frames
+            rather than making the server buffer them.
+        """
+        next_frame = time.perf_counter()
+        while True:
+            for session in list(self.sessions):
+                session.simulation.step()
+                transport = session.writer.transport
+                if transport.is_closing():
+                    continue
+                if transport.get_write_buffer_size() < MAX_WRITE_BUFFER:
+                    session.writer.write(session.frame())
+            next_frame += 1 / FPS
+            await asyncio.sleep(max(0., next_frame - time.perf_counter()))
+    
+    async def serve(self, unix_path: str = None,
+                    host: str = "127.0.0.1", port: int = 8765):
+        """
+        Listens on a Unix socket if unix_path is given, otherwise on TCP, and
+            runs the sessions until cancelled.
+        
+        Args:
+            unix_path (str): The path of the Unix socket to listen on
+            host (str): The host to listen on for TCP, by default only locally
+            port (int): The port to listen on for TCP
+        """
+        if unix_path is not None:
+            server = await asyncio.start_unix_server(
+                self.handle, unix_path, backlog=LISTEN_BACKLOG
+            )
+        else:
+            server = await asyncio.start_server(
+                self.handle, host, port, backlog=LISTEN_BACKLOG
+            )
+        async with server:
+            await asyncio.gather(server.serve_forever(), self.tick_forever())
+
+
+@dataclass
+class ClientState:
+    exercises: list = field(default_factory=list)
+    frames: int = 0
+    frame: int = 0
+    score: float = 0.
+    selected: int = 0
+    paused: bool = False
+    boulders: list[tuple[int, int, tuple, float]] = field(default_factory=list)
+    final: dict = None
+
+
+async def read_message(reader: asyncio.StreamReader) -> tuple[bytes, bytes]:
+    """
+    Args:
+        reader (StreamReader): Where the server's messages come from
+    
+    Returns:
+        tuple[bytes, bytes]: The type and contents of the next message
+    """
+    kind, length = MESSAGE_HEADER.unpack(
+        await reader.readexactly(MESSAGE_HEADER.size)
+    )
+    return kind, await reader.readexactly(length)
+
+
+def apply_message(state: ClientState, kind: bytes, data: bytes):
+    """
+    Updates what the client knows about its game from a server message.
+    
+    Args:
+        state (ClientState): What the client knows about its game
+        kind (bytes): The type of the message
+        data (bytes): The contents of the message
+    """
+    match kind:
+        case b"T":
+            state.exercises = [tuple(e) for e in json.loads(data)]
+        case b"F":
+            (state.frame, state.score, state.selected, count,
+             state.paused) = FRAME_HEADER.unpack_from(data)
+            state.boulders = []
+            for i in range(count):
+                x, y, exercise_id, value = BOULDER_RECORD.unpack_from(
+                    data, FRAME_HEADER.size + i * BOULDER_RECORD.size
+                )
+                state.boulders.append(
+                    (x, y, state.exercises[exercise_id], value)
+                )
+            state.frames += 1
+        case b"E":
+            state.final = json.loads(data)
+
+
+async def run_client(keys: [str], frames: int, unix_path: str = None,
+                     host: str = "127.0.0.1", port: int = 8765
+                     ) -> ClientState:
+    """
+    A simple local client: waits for `frames` frames, pressing the next of
+        `keys` after each one, then presses escape and waits for the score.
+    
+    Args:
+        keys (list[str]): The keys to press, in order, repeated as needed
+        frames (int): How many frames to play for
+        unix_path (str): The Unix socket to connect to, if not using TCP
+        host (str): The host to connect to over TCP
+        port (int): The port to connect to over TCP
+    
+    Returns:
+        ClientState: What the client saw of its game
+    """
+    if unix_path is not None:
+        reader, writer = await asyncio.open_unix_connection(unix_path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    state = ClientState()
+    while state.frames < frames:
+        kind, data = await read_message(reader)
+        apply_message(state, kind, data)
+        if kind == b"F" and keys:
+            writer.write(f"{keys[state.frames % len(keys)]}\n".encode())
+    writer.write(b"escape\n")
+    while state.final is None:
+        apply_message(state, *await read_message(reader))
+    writer.close()
+    return state
+
+
+async def load_test(clients: int, seconds: float, unix_path: str):
+    """
+    Starts a server and `clients` local clients on a Unix socket, and prints
+        how many frames per second it managed in total.
+    
+    Args:
+        clients (int): How many sessions to run at once
+        seconds (float): How long to play for
+        unix_path (str): The Unix socket to use
+    """
+    game_server = GameServer(seed=0)
+    serving = asyncio.create_task(game_server.serve(unix_path))
+    await asyncio.sleep(.1)
+    keys = ["left", "q", "right", "w", "e", "r"]
+    start = time.perf_counter()
+    states = await asyncio.gather(*(
+        run_client(keys, int(seconds * FPS), unix_path)
+        for _ in range(clients)
+    ))
+    elapsed = time.perf_counter() - start
+    serving.cancel()
+    total_frames = sum(state.frames for state in states)
+    print(f"{clients} sessions, {total_frames} frames in {elapsed:.2f}s: "
+          f"{total_frames / elapsed:.0f} frames/s "
+          f"({total_frames / elapsed / clients:.1f} per session, "
+          f"target {FPS})")
+
+
+def main():
+    """ Runs the server, or a local load test of it. """
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--unix", help="path of a Unix socket to listen on")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--clients", type=int,
+                        help="run a local load test with this many clients")
+    parser.add_argument("--seconds", type=float, default=5.)
+    args = parser.parse_args()
+    if args.clients:
+        unix_path = args.unix or "/tmp/scale_drop_load_test.sock"
+        asyncio.run(load_test(args.clients, args.seconds, unix_path))
+    else:
+        asyncio.run(GameServer().serve(args.unix, args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
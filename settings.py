@@ -1,121 +1,14 @@
-import json
 from designer import *
-from dataclasses import dataclass, asdict, field
-from useful import Menu, MenuEntry, GAME_FONT_PATH, pm_bool, GAME_FONT_NAME, \
-    make_scale_keys_text, TEXT_FONT_NAME, ignore_numpad
-from scale import TOTAL_NOTES, LEDGER_LINES, NOTES_START, LETTERS_PER_OCTAVE, \
+from dataclasses import dataclass, field
+from config import Settings
+from helpers import pm_bool
+from useful import Menu, MenuEntry, GAME_FONT_PATH, GAME_FONT_NAME, \
+    make_scale_keys_text, TEXT_FONT_NAME, ignore_numpad, keep_warm
+from layout import Layout, current_layout
+from theory import TOTAL_NOTES, LEDGER_LINES, NOTES_START, \
     NORMAL_SCALE_NAMES, SCALE_TYPE_INFO, NORMAL_SCALE_KEYS, \
     CHURCH_MODES_NAMES, CHURCH_MODES_KEYS, CLEFS, CLEF_SYMBOLS_NAMES
 
-DEFAULT_CONFIG = {
-    "scale_types": ["Major",
-                    "Natural Minor", "Harmonic Minor", "Melodic Minor"],
-    "clefs": ["Treble", "Bass"],
-    "max_sharps_key_signature": 4,
-    "max_flats_key_signature": 4,
-    "max_high_ledger_positions": 4,
-    "max_low_ledger_positions": 4,
-}
-
-
-@dataclass(kw_only=True)
-class Settings(object):
-    scale_types: [str]
-    clefs: [str]
-    max_sharps_key_signature: int
-    max_flats_key_signature: int
-    max_high_ledger_positions: int
-    max_low_ledger_positions: int
-    
-    def __post_init__(self):
-        """ Causes self.validate() to be called after initialisation """
-        self.validate()
-    
-    @classmethod
-    def load(cls):
-        """
-        Returns a Settings object from the settings stored in .config.json, or
-            if the config isn't found, uses the default settings.
-        """
-        try:
-            with open(".config.json") as f:
-                config_string = f.read()
-                config = json.loads(config_string)
-        except FileNotFoundError:
-            config = DEFAULT_CONFIG
-        
-        self = Settings(**config)
-        return self
-    
-    def save(self):
-        """ Saves this Settings object as JSON data to .config.json """
-        config = asdict(self)
-        config_string = json.dumps(config, indent=2)
-        with open(".config.json", "w") as f:
-            f.write(config_string)
-    
-    def validate(self):
-        """
-        Handles checking of incoming data from .config.json to ensure that it's
-            viable.  Additionally, handles fixing this data.
-        """
-        self.validate_scale_types()
-        self.validate_clefs()
-        self.validate_key_signatures()
-        self.validate_ledger_lines()
-    
-    def validate_scale_types(self):
-        """
-        Handles the validation of the scale types: uses the default if none are
-            listed in .config.json
-        """
-        if not self.scale_types:
-            self.scale_types = DEFAULT_CONFIG["scale_types"]
-    
-    def validate_clefs(self):
-        """
-        Handles the validation of the clefs: uses the default if none are listed
-            in .config.json
-        """
-        if not self.clefs:
-            self.clefs = DEFAULT_CONFIG["clefs"]
-    
-    def validate_key_signatures(self):
-        """
-        Handles the validation of the key signatures, though functionality
-            needing them hasn't been implemented.
-        """
-        self.max_sharps_key_signature = min(
-            self.max_sharps_key_signature, LETTERS_PER_OCTAVE
-        )
-        self.max_flats_key_signature = min(
-            self.max_flats_key_signature, LETTERS_PER_OCTAVE
-        )
-        self.max_sharps_key_signature = max(
-            self.max_sharps_key_signature, 0
-        )
-        self.max_flats_key_signature = max(
-            self.max_flats_key_signature, 0
-        )
-    
-    def validate_ledger_lines(self):
-        """
-        Handles the validation of the ledger lines: uses the closest viable
-            count if the values stored in .config.json are out of range.
-        """
-        self.max_low_ledger_positions = min(
-            self.max_low_ledger_positions, LEDGER_LINES
-        )
-        self.max_high_ledger_positions = min(
-            self.max_high_ledger_positions, LEDGER_LINES
-        )
-        self.max_low_ledger_positions = max(
-            self.max_low_ledger_positions, 0
-        )
-        self.max_high_ledger_positions = max(
-            self.max_high_ledger_positions, 0
-        )
-
 
 ACTIVE   = 1.
 INACTIVE = .3
@@ -130,47 +23,123 @@ class SettingsScreen(Menu):
     active_sub_menu: str = ""
     active_sub_menu_left: bool = True
     sub_menu: list[Text] | Menu | None = None
+    sub_menus: dict[str, list[Text] | Menu] = field(default_factory=dict)
+    layout: Layout = field(default_factory=current_layout)
     
     def __post_init__(self):
         """
         The SettingsScreen menu always has the same entries, so these are set in
-            __post_init_(), after overriding the field and making it optional
+            __post_init_(), after overriding the field and making it optional.
+            The sub menus are all made here too, hidden, so that going in and
+            out of them only has to show, hide, and restyle them.
         """
         self.entries = [
             MenuEntry("Enable/Disable Standard Scales", self.standard_scales),
             MenuEntry("Enable/Disable Church Modes", self.church_modes),
             MenuEntry("Enable/Disable Clefs", self.clefs),
             # MenuEntry("Increase/Decrease Key Signature Range", print, "Keys"),
-            MenuEntry("Increase/Decrease Ledger Lines", self.ledger_lines)
+            MenuEntry("Increase/Decrease Ledger Lines", self.ledger_lines),
+            MenuEntry("Enable/Disable Ear Training", self.ear_training),
+            MenuEntry("Enable/Disable Key Signatures", self.key_signatures)
         ]
         super().__post_init__()
+        self.restyle_ear_training()
+        self.restyle_key_signatures()
+        self.sub_menus = {
+            "standard scales": self.make_scale_types_sub_menu(
+                NORMAL_SCALE_NAMES
+            ),
+            "church modes": self.make_scale_types_sub_menu(CHURCH_MODES_NAMES),
+            "clefs": self.make_clefs_sub_menu(),
+            "ledger lines": self.make_ledger_lines_sub_menu(),
+        }
+        for sub_menu in self.sub_menus.values():
+            set_sub_menu_visible(sub_menu, False)
 
+    def make_scale_types_sub_menu(self, scale_names: [str]) -> list[Text]:
+        """
+        Makes the (hidden) sub menu to enable and disable some scale types.
+        
+        Args:
+            scale_names (list[str]): The names of the scale types to list
+        
+        Returns:
+            list[Text]: The instructions, followed by a line for each type
+        """
+        sub_menu = [
+            text('black', "Type a key to Enable/Disable a scale type",
+                 current_layout().font_size(24), font_name=TEXT_FONT_NAME)
+        ]
+        sub_menu += make_scale_keys_text(scale_names)
+        return sub_menu
+    
+    def make_clefs_sub_menu(self) -> Menu:
+        """
+        Makes the (hidden) sub menu to enable and disable clefs.
+        
+        Returns:
+            Menu: A menu with an entry for each clef
+        """
+        clef_entries = []
+        for clef in CLEFS.values():
+            clef_entry = MenuEntry(clef.symbol, self.toggle_clef, clef.name)
+            clef_entries.append(clef_entry)
+        return Menu("Enable/Disable Clefs", clef_entries,
+                    left=True, margin_left=400, margin_top=50,
+                    body_font=(GAME_FONT_NAME, GAME_FONT_PATH))
+    
+    def make_ledger_lines_sub_menu(self) -> list[Text]:
+        """
+        Makes the (hidden) sub menu to change the number of ledger lines.  The
+            notes on it are filled in by ledger_lines().
+        
+        Returns:
+            list[Text]: The lowest note, then the highest note
+        """
+        layout = current_layout()
+        sub_menu = [
+            text('black', "", layout.font_size(60), anchor="midright",
+                 font_name=GAME_FONT_NAME, font_path=GAME_FONT_PATH),
+            text('black', "", layout.font_size(60), anchor="midleft",
+                 font_name=GAME_FONT_NAME, font_path=GAME_FONT_PATH)
+        ]
+        sub_menu[0].x -= layout.px(30)
+        sub_menu[1].x += layout.px(30)
+        return sub_menu
+    
+    def enter_sub_menu(self, name: str) -> bool:
+        """
+        Shows one of the sub menus, hiding the one that was shown before.
+        
+        Args:
+            name (str): The name of the sub menu to show
+        
+        Returns:
+            bool: Whether the sub menu wasn't already being shown
+        """
+        if self.active_sub_menu == name:
+            return False
+        if self.sub_menu is not None:
+            set_sub_menu_visible(self.sub_menu, False)
+        self.active_sub_menu = name
+        self.sub_menu = self.sub_menus[name]
+        set_sub_menu_visible(self.sub_menu, True)
+        return True
+    
     def standard_scales(self):
         """
         Handles the settings to enable and disable the standard scale types.
         """
-        if self.active_sub_menu != "standard scales":
-            self.active_sub_menu = "standard scales"
-            self.sub_menu = [
-                text('black', "Type a key to Enable/Disable a scale type", 24,
-                     font_name=TEXT_FONT_NAME)
-            ]
-            self.sub_menu += make_scale_keys_text(NORMAL_SCALE_NAMES)
-        for scale_type_text in self.sub_menu[1:]:
-            if scale_type_text.text[3:] in self.settings.scale_types:
-                scale_type_text.alpha = ACTIVE
-            else:
-                scale_type_text.alpha = INACTIVE
+        self.enter_sub_menu("standard scales")
+        self.restyle_scale_types()
     
     def church_modes(self):
         """ Handles the settings to enable and disable the church modes. """
-        if self.active_sub_menu != "church modes":
-            self.active_sub_menu = "church modes"
-            self.sub_menu = [
-                text('black', "Type a key to Enable/Disable a scale type", 24,
-                     font_name=TEXT_FONT_NAME)
-            ]
-            self.sub_menu += make_scale_keys_text(CHURCH_MODES_NAMES)
+        self.enter_sub_menu("church modes")
+        self.restyle_scale_types()
+    
+    def restyle_scale_types(self):
+        """ Darkens the enabled scale types and greys out the others. """
         for scale_type_text in self.sub_menu[1:]:
             if scale_type_text.text[3:] in self.settings.scale_types:
                 scale_type_text.alpha = ACTIVE
@@ -179,15 +148,7 @@ class SettingsScreen(Menu):
 
     def clefs(self):
         """ Handles the settings to enable and disable clefs. """
-        if self.active_sub_menu != "clefs":
-            self.active_sub_menu = "clefs"
-            clef_entries = []
-            for clef in CLEFS.values():
-                clef_entry = MenuEntry(clef.symbol, self.toggle_clef, clef.name)
-                clef_entries.append(clef_entry)
-            self.sub_menu = Menu("Enable/Disable Clefs", clef_entries,
-                                 left=True, margin_left=400, margin_top=50,
-                                 body_font=(GAME_FONT_NAME, GAME_FONT_PATH))
+        self.enter_sub_menu("clefs")
         for text_ in self.sub_menu.menu_text:
             if CLEF_SYMBOLS_NAMES[text_.text[-1]] in self.settings.clefs:
                 text_.alpha = ACTIVE
@@ -219,43 +180,87 @@ class SettingsScreen(Menu):
         high_ledger_line = chr(NOTES_START + TOTAL_NOTES - LEDGER_LINES
                                + self.settings.max_high_ledger_positions)
         
-        if self.active_sub_menu == "ledger lines":
+        if self.enter_sub_menu("ledger lines"):
+            self.active_sub_menu_left = True
+        # Only redraw the notes when they change; that's the expensive part
+        if self.sub_menu[0].text != low_ledger_line:
             self.sub_menu[0].text = low_ledger_line
-            self.sub_menu[0].alpha = (
-                ACTIVE if self.active_sub_menu_left else INACTIVE
-            )
+        if self.sub_menu[1].text != high_ledger_line:
             self.sub_menu[1].text = high_ledger_line
-            self.sub_menu[1].alpha = (
-                INACTIVE if self.active_sub_menu_left else ACTIVE
-            )
-        else:
-            self.active_sub_menu = "ledger lines"
-            self.active_sub_menu_left = True
-            self.sub_menu = [
-                text('black', low_ledger_line, 60, anchor="midright",
-                     font_name=GAME_FONT_NAME, font_path=GAME_FONT_PATH),
-                text('black', high_ledger_line, 60, anchor="midleft",
-                     font_name=GAME_FONT_NAME, font_path=GAME_FONT_PATH,
-                     alpha=INACTIVE)
-            ]
-            self.sub_menu[0].x -= 30
-            self.sub_menu[1].x += 30
+        self.sub_menu[0].alpha = (
+            ACTIVE if self.active_sub_menu_left else INACTIVE
+        )
+        self.sub_menu[1].alpha = (
+            INACTIVE if self.active_sub_menu_left else ACTIVE
+        )
 
+    def ear_training(self):
+        """
+        Turns the ear training mode, where the selected boulder's scale is
+            also played aloud, on or off.
+        """
+        self.settings.ear_training = not self.settings.ear_training
+        self.restyle_ear_training()
+    
+    def restyle_ear_training(self):
+        """ Greys out the ear training entry when it's turned off. """
+        self.menu_text[-2].alpha = (
+            ACTIVE if self.settings.ear_training else INACTIVE
+        )
+    
+    def key_signatures(self):
+        """
+        Turns writing the scales with their key signatures on or off; only
+            scales within the key signature range come up while it's on.
+        """
+        self.settings.key_signatures = not self.settings.key_signatures
+        self.restyle_key_signatures()
+    
+    def restyle_key_signatures(self):
+        """ Greys out the key signatures entry when it's turned off. """
+        self.menu_text[-1].alpha = (
+            ACTIVE if self.settings.key_signatures else INACTIVE
+        )
+    
+    def is_stale(self) -> bool:
+        """
+        Returns:
+            bool: Whether .config.json or the size of the window has changed
+                since the menu was made, so that it has to be made again
+                instead of being shown as it was left
+        """
+        return (Settings.load() != self.settings
+                or current_layout() != self.layout)
+    
     def exit_sub_menu(self):
         """ Does everything needed to return to the main settings menu. """
         self.active_sub_menu = ""
         self.active_sub_menu_left = True
-        if isinstance(self.sub_menu, Menu):
-            self.sub_menu.destroy()
-        if isinstance(self.sub_menu, list):
-            for designer_object in self.sub_menu:
-                destroy(designer_object)
+        if self.sub_menu is not None:
+            set_sub_menu_visible(self.sub_menu, False)
         self.sub_menu = None
 
 
+def set_sub_menu_visible(sub_menu: list[Text] | Menu, visible: bool):
+    """
+    Shows or hides a whole sub menu.
+    
+    Args:
+        sub_menu (list[Text] | Menu): The sub menu to show or hide
+        visible (bool): Whether it should be shown
+    """
+    if isinstance(sub_menu, Menu):
+        sub_menu.set_visible(visible)
+    else:
+        for designer_object in sub_menu:
+            set_visible(designer_object, visible)
+
+
 def void_setup():
     """ See world.void_setup for explanation """
-    return SettingsScreen(left=True, size_percent=70, margin_left=20)
+    menu = SettingsScreen(left=True, size_percent=70, margin_left=20)
+    keep_warm("settings_menu", menu.is_stale, menu.exit_sub_menu)
+    return menu
 
 
 def void_keyPressed(menu: SettingsScreen, key: str):
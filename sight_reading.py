@@ -0,0 +1,231 @@
+from designer import *
+from dataclasses import dataclass, field
+from config import Settings
+from sampler import ExerciseSampler
+from stream import StaffWindow, Segment, PATTERNS, staff
+from helpers import MatchStr, MatchIter
+from useful import GAME_FONT_NAME, GAME_FONT_PATH, make_scale_keys_text, \
+    keep_warm
+from layout import Layout, current_layout
+from rules import BOULDER_BASE_POINTS, BOULDER_BASE_SPEED, \
+    FAILED_BOULDER_PENALTY, boulder_speed
+from theory import SCALE_TYPE_INFO, SCALE_TYPE_KEYS
+
+STAFF_TEXT_SIZE = 48
+STAFF_SPEED = 2  # How much faster the staff moves than the boulders
+SELECTED   = 1.
+UNSELECTED = .5
+ANSWERED   = .15
+
+SCALE_KEYS = MatchIter(SCALE_TYPE_INFO)
+
+
+@dataclass
+class SightReading:
+    settings: Settings = field(default_factory=Settings.load)
+    layout: Layout = field(default_factory=current_layout)
+    sampler: ExerciseSampler = None
+    window: StaffWindow = None
+    # The Text showing each segment on the staff, by the segment's index
+    texts: dict[int, DesignerObject] = field(default_factory=dict)
+    spare: [DesignerObject] = field(default_factory=list)  # To reuse
+    ruler: DesignerObject = None  # Only used to measure glyphs
+    text_score: DesignerObject = None
+    scale_keys_text: [DesignerObject] = None
+    score: float = 0.
+    paused: bool = False
+    selected: int = -1  # The index of the segment to name, -1 if none
+    
+    def __post_init__(self):
+        """
+        Makes what every session shows, then starts one.  The Texts for the
+            staff are made as they're first needed, and then reused, so there
+            are only ever as many as fit on screen at once.
+        """
+        self.ruler = self.staff_text()
+        hide(self.ruler)
+        self.text_score = text(
+            'black', f"{self.score:.4}", self.layout.font_size(30),
+            get_width(), self.layout.px(20),
+            font_name=GAME_FONT_NAME, font_path=GAME_FONT_PATH)
+        self.scale_keys_text = make_scale_keys_text([
+            scale_name for scale_name in SCALE_TYPE_KEYS
+            if scale_name in self.settings.scale_types
+        ])
+        self.new_session()
+    
+    def staff_text(self) -> DesignerObject:
+        """
+        Returns:
+            DesignerObject: A Text to show a segment of the staff with, drawn
+                from its left edge
+        """
+        return text('black', "", self.layout.font_size(STAFF_TEXT_SIZE),
+                    0, get_height() / 2, anchor="midleft",
+                    font_name=GAME_FONT_NAME, font_path=GAME_FONT_PATH)
+    
+    def measure(self, glyphs: str) -> float:
+        """
+        Args:
+            glyphs (str): Some of the staff, in Game Font
+        
+        Returns:
+            float: How wide it is on screen
+        """
+        return self.ruler.estimate_size(glyphs)[0]
+    
+    def new_session(self):
+        """ Starts the staff again, with a new sampler, as in a new world. """
+        self.sampler = ExerciseSampler.from_world(self)
+        self.window = staff(self.sampler, get_width() - self.layout.gutter,
+                            self.measure, self.settings.key_signatures)
+        self.follow()
+    
+    def is_stale(self) -> bool:
+        """
+        Returns:
+            bool: Whether the settings or the size of the window have changed
+                since the session was made, as in World.is_stale
+        """
+        return (Settings.load() != self.settings
+                or current_layout() != self.layout)
+    
+    def reset(self):
+        """ Gets ready for another session when the scene is visited again. """
+        for index in list(self.texts):
+            self.release(index)
+        self.score = 0.
+        self.paused = False
+        self.selected = -1
+        self.new_session()
+        self.display_score()
+    
+    def release(self, index: int):
+        """
+        Hides the Text of a segment that's gone, to reuse for another one.
+        
+        Args:
+            index (int): The index of the segment
+        """
+        display = self.texts.pop(index)
+        hide(display)
+        self.spare.append(display)
+    
+    def scroll(self):
+        """
+        Moves the staff left, a little faster as the score goes up, and counts
+            the segments that went off the left without being named.
+        """
+        speed = (boulder_speed(self.score, BOULDER_BASE_SPEED) * STAFF_SPEED
+                 * self.layout.factor)
+        for segment in self.window.scroll(speed):
+            if not segment.answered:
+                self.sampler.record(segment.exercise, False,
+                                    segment.frames_visible)
+                self.score += FAILED_BOULDER_PENALTY
+            self.release(segment.index)
+    
+    def follow(self):
+        """
+        Moves the Texts to where the segments are, giving a Text to each
+            segment that's just been made.
+        """
+        for segment in self.window.shown:
+            display = self.texts.get(segment.index)
+            if display is None:
+                display = self.spare.pop() if self.spare else self.staff_text()
+                display.text = segment.glyphs
+                display.alpha = UNSELECTED
+                segment.value = BOULDER_BASE_POINTS
+                self.texts[segment.index] = display
+            display.x = segment.x
+            set_visible(display, self.window.visible(segment))
+    
+    def select(self, segment: Segment | None):
+        """
+        Brightens the segment to name next, fading out the one before it.
+        
+        Args:
+            segment (Segment | None): The segment, or None if there isn't one
+        """
+        index = -1 if segment is None else segment.index
+        if index == self.selected:
+            return
+        if self.selected in self.texts:
+            self.texts[self.selected].alpha = UNSELECTED
+        self.selected = index
+        if index in self.texts:
+            self.texts[index].alpha = SELECTED
+    
+    def guess(self, scale_key: str):
+        """
+        Names the type of scale of the selected segment.  If it's right, the
+            segment's points are added to the score, and it's greyed out;
+            otherwise it's worth half as much, as a boulder would be.
+        
+        Args:
+            scale_key (str): The key for the type of scale guessed
+        """
+        segment = self.window.current()
+        if segment is None:
+            return
+        correct = PATTERNS[segment.exercise[0]] == PATTERNS[scale_key]
+        self.sampler.record(segment.exercise, correct, segment.frames_visible)
+        if correct:
+            self.score += segment.value
+            segment.answered = True
+            self.texts[segment.index].alpha = ANSWERED
+            self.selected = -1
+        else:
+            segment.value *= 0.50
+    
+    def pause(self):
+        """ Pauses the staff, hiding it so that it can't be read meanwhile. """
+        self.paused = not self.paused
+        for segment in self.window.shown:
+            set_visible(self.texts[segment.index],
+                        not self.paused and self.window.visible(segment))
+    
+    def display_score(self):
+        """ Displays the score off to the side of the screen, as World does. """
+        self.text_score.text = f"{self.score:.4}"
+        self.text_score.x = get_width() - (self.layout.gutter
+                                           - self.text_score.width//2)
+
+
+def void_setup() -> SightReading:
+    """ See world.void_setup for explanation """
+    reading = SightReading()
+    keep_warm("sight_reading", reading.is_stale, reading.reset)
+    return reading
+
+
+def void_draw(reading: SightReading):
+    """ See world.void_draw for explanation """
+    if reading.paused:
+        return
+    reading.scroll()
+    reading.follow()
+    reading.select(reading.window.current())
+    reading.display_score()
+
+
+def void_keyPressed(reading: SightReading, key: str):
+    """ See world.void_keyPressed for explanation """
+    match MatchStr(str(key)):
+        case SCALE_KEYS.value if not reading.paused:
+            reading.guess(key)
+        case 'escape':
+            print(reading.score)
+            pop_scene()
+        case 'space':
+            reading.pause()
+        case _:
+            print(key)
+
+
+def whens():
+    """ Calls all of the required `when`s for the sight-reading mode. """
+    when('starting: sight_reading', void_setup)
+    when('updating: sight_reading', void_draw)
+    when('typing: sight_reading', void_keyPressed)
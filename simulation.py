@@ -0,0 +1,276 @@
+"""
+The game without designer: boulders, guesses and scores as plain data, stepped
+    a frame at a time, so that many games can be played at once without a
+    window.  Tuning plays bots against it, the server runs a session of it for
+    each client, and the terminal version draws it with curses.
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from random import Random
+from sampler import ExerciseSampler
+from theory import SCALE_TYPE_INFO, Exercise
+from config import Settings
+from snapshot import Snapshot, BoulderState, sampler_stats, \
+    restore_sampler_stats
+from rules import BOULDER_WIDTH, BOULDER_HEIGHT, BOULDER_BASE_SPEED, \
+    BOULDER_BASE_POINTS, FAILED_BOULDER_PENALTY, BOULDER_MAX_PROB, \
+    MAX_BOULDERS, GUTTER, WINDOW_WIDTH, WINDOW_HEIGHT, boulder_speed, \
+    boulder_probability, SPEED_SCORE_SCALE, SPEED_EXPONENT, SPAWN_FLOOR, \
+    SPAWN_MIDPOINT, SPAWN_SPREAD, FPS
+
+
+@dataclass(frozen=True)
+class Difficulty:
+    """
+    Everything that makes the game harder or easier, with the values used by
+        the real game as the defaults.  See boulder_probability and
+        boulder_speed for what the curves' parameters do.
+    """
+    boulder_max_prob: float = BOULDER_MAX_PROB
+    max_boulders: int = MAX_BOULDERS
+    spawn_floor: float = SPAWN_FLOOR
+    spawn_midpoint: float = SPAWN_MIDPOINT
+    spawn_spread: float = SPAWN_SPREAD
+    base_speed: float = BOULDER_BASE_SPEED
+    speed_score_scale: float = SPEED_SCORE_SCALE
+    speed_exponent: float = SPEED_EXPONENT
+    failed_boulder_penalty: float = FAILED_BOULDER_PENALTY
+
+
+@dataclass
+class SimulatedBoulder:
+    x: int
+    y: float
+    exercise: Exercise
+    value: float = BOULDER_BASE_POINTS
+    frames_visible: int = 0
+    
+    def is_colliding(self, other: SimulatedBoulder) -> bool:
+        """
+        Checks if this boulder overlaps another, treating both as rectangles
+            the size of the boulder emoji, or if they have the same x.
+        
+        Args:
+            other (SimulatedBoulder): The boulder to check against
+        
+        Returns:
+            bool: Whether the boulders are in each other's way
+        """
+        return self.x == other.x or (
+            abs(self.x - other.x) < BOULDER_WIDTH
+            and abs(self.y - other.y) < BOULDER_HEIGHT
+        )
+
+
+@dataclass
+class Simulation:
+    """
+    A game of boulders falling without any DesignerObjects, so that many can be
+        run at once, without a window.  It follows the same rules as World and
+        the handlers in world.py, frame for frame, starting with a boulder as
+        World.begin() does.
+    """
+    settings: Settings
+    rng: Random = field(default_factory=Random)
+    width: int = WINDOW_WIDTH
+    height: int = WINDOW_HEIGHT
+    boulders: dict[int, SimulatedBoulder] = field(default_factory=dict)
+    score: float = 0.
+    selected: int = 0  # The key of the selected boulder, its x-coordinate
+    paused: bool = False
+    frame: int = 0
+    landed: int = 0  # How many boulders hit the ground
+    correct_guesses: int = 0
+    wrong_guesses: int = 0
+    sampler: ExerciseSampler = None
+    difficulty: Difficulty = Difficulty()
+    # Whether to start with a boulder; not when carrying on from a snapshot
+    opening_boulder: bool = True
+    
+    def __post_init__(self):
+        """
+        Sets up the sampler, sharing the simulation's random numbers, and
+            makes the first boulder, as World.begin() does.
+        """
+        if self.sampler is None:
+            self.sampler = ExerciseSampler.from_world(self, self.rng)
+        if self.opening_boulder:
+            self.spawn()
+    
+    def spawn(self) -> SimulatedBoulder | None:
+        """
+        Makes a boulder in the same way as Boulder.__init__: randomly across the
+            top, moved up until it doesn't overlap any others, and dropped if it
+            ends up too far above the window.
+        
+        Returns:
+            SimulatedBoulder | None: The new boulder, or None if it was dropped
+        """
+        x = self.rng.randint(BOULDER_WIDTH//2,
+                             self.width - BOULDER_WIDTH//2 - GUTTER)
+        boulder = SimulatedBoulder(x, 0, None)
+        while (any(boulder.is_colliding(other)
+                   for other in self.boulders.values())
+               and boulder.y >= -2 * BOULDER_HEIGHT):
+            boulder.y -= BOULDER_HEIGHT//2
+        if boulder.y < -2 * BOULDER_HEIGHT:
+            return None
+        boulder.exercise = self.sampler.sample()
+        self.boulders[boulder.x] = boulder
+        if len(self.boulders) == 1:
+            self.selected = boulder.x
+        return boulder
+    
+    def remove(self, boulder: SimulatedBoulder):
+        """
+        Removes a boulder, selecting the lowest one if it was selected.
+        
+        Args:
+            boulder (SimulatedBoulder): The boulder to remove
+        """
+        del self.boulders[boulder.x]
+        if boulder.x == self.selected:
+            self.select_lowest()
+    
+    def select_lowest(self):
+        """ Selects the boulder lowest down in the window. """
+        if not self.boulders:
+            self.selected = 0
+            return
+        self.selected = max(self.boulders.values(), key=lambda b: b.y).x
+    
+    def select(self, right: bool):
+        """
+        Selects the next boulder to the right or left, ignoring those above the
+            window, as in World.select.
+        
+        Args:
+            right (bool): Whether to select the next to the right or to the left
+        """
+        if not self.boulders:
+            self.selected = 0
+            return
+        onscreen = sorted(x for x, b in self.boulders.items() if b.y > 0)
+        if not onscreen:
+            self.select_lowest()
+            return
+        if right:
+            later = [x for x in onscreen if x > self.selected]
+            self.selected = later[0] if later else onscreen[0]
+        else:
+            earlier = [x for x in onscreen if x < self.selected]
+            self.selected = earlier[-1] if earlier else onscreen[-1]
+    
+    def step(self):
+        """ Runs one frame of the game, as world.void_draw does. """
+        if self.paused:
+            return
+        self.frame += 1
+        difficulty = self.difficulty
+        boulder_prob = boulder_probability(
+            self.score, len(self.boulders), difficulty.boulder_max_prob,
+            difficulty.spawn_floor, difficulty.spawn_midpoint,
+            difficulty.spawn_spread
+        )
+        if (self.rng.random() < boulder_prob
+                and len(self.boulders) < difficulty.max_boulders):
+            self.spawn()
+        speed = boulder_speed(self.score, difficulty.base_speed,
+                              difficulty.speed_score_scale,
+                              difficulty.speed_exponent)
+        for boulder in list(self.boulders.values()):
+            boulder.y += speed
+            if boulder.y > 0:
+                boulder.frames_visible += 1
+            if boulder.y > self.height:
+                self.sampler.record(boulder.exercise, False,
+                                    boulder.frames_visible)
+                self.remove(boulder)
+                self.score += difficulty.failed_boulder_penalty
+                self.landed += 1
+    
+    def guess(self, scale_key: str) -> bool:
+        """
+        Guesses the type of scale on the selected boulder.
+        
+        Args:
+            scale_key (str): The key for the type of scale guessed
+        
+        Returns:
+            bool: Whether the guess was right
+        """
+        if self.selected not in self.boulders:
+            return False
+        boulder = self.boulders[self.selected]
+        correct = (SCALE_TYPE_INFO[boulder.exercise[0]].pattern
+                   == SCALE_TYPE_INFO[scale_key].pattern)
+        self.sampler.record(boulder.exercise, correct, boulder.frames_visible)
+        if correct:
+            self.correct_guesses += 1
+            self.score += boulder.value
+            self.remove(boulder)
+        else:
+            self.wrong_guesses += 1
+            boulder.value *= 0.50
+        return correct
+    
+    def press(self, key: str):
+        """
+        Handles a key press, as world.void_keyPressed does (apart from escape,
+            which is up to whatever is running the simulation).
+        
+        Args:
+            key (str): The name of the key that was pressed
+        """
+        if key == 'space':
+            self.paused = not self.paused
+        elif self.paused:
+            return
+        elif key in ('left', 'right'):
+            self.select(key == 'right')
+        elif key in SCALE_TYPE_INFO:
+            self.guess(key)
+    
+    def snapshot(self) -> Snapshot:
+        """
+        Returns:
+            Snapshot: The game as it is now, which World.restore can also carry
+                on with
+        """
+        keys = list(self.boulders)
+        boulders = [BoulderState(b.x, b.y, b.exercise, b.value,
+                                 b.frames_visible)
+                    for b in self.boulders.values()]
+        selected = keys.index(self.selected) if self.selected in keys else -1
+        return Snapshot(self.score, self.rng.getstate(), boulders, selected,
+                        self.paused, self.frame, sampler_stats(self.sampler))
+    
+    @classmethod
+    def from_snapshot(cls, settings: Settings, snapshot: Snapshot,
+                      **kwargs) -> Simulation:
+        """
+        Starts a simulation from the middle of a game, e.g. one suspended in
+            the window version.
+        
+        Args:
+            settings (Settings): The settings to play with
+            snapshot (Snapshot): The game to start from
+            **kwargs: Anything else to pass to Simulation, e.g. a difficulty
+        
+        Returns:
+            Simulation: The simulation, ready to step
+        """
+        simulation = cls(settings, opening_boulder=False, **kwargs)
+        simulation.rng.setstate(snapshot.rng_state)
+        restore_sampler_stats(simulation.sampler, snapshot.exercise_stats)
+        simulation.score = snapshot.score
+        simulation.paused = snapshot.paused
+        simulation.frame = snapshot.frame
+        for state in snapshot.boulders:
+            simulation.boulders[state.x] = SimulatedBoulder(
+                state.x, state.y, state.exercise, state.value,
+                state.frames_visible
+            )
+        if 0 <= snapshot.selected < len(snapshot.boulders):
+            simulation.selected = snapshot.boulders[snapshot.selected].x
+        return simulation
@@ -0,0 +1,193 @@
+"""
+Snapshots of a game in progress, as plain data, so that a game can be
+    suspended and resumed, and tools can start from the middle of a game.  A
+    snapshot doesn't hold any DesignerObjects; resuming makes new ones.
+
+Format (everything little-endian):
+    HEADER
+    The random number generator's state, as RNG_WORDS then RNG_GAUSS
+    The scale type keys, then the clef names, as string tables from pack.py
+    A BOULDER_RECORD for each boulder
+    An EXERCISE_STATS_RECORD for each exercise the sampler knows about
+"""
+from __future__ import annotations
+import struct
+from dataclasses import dataclass, field
+from theory import Exercise
+from sampler import ExerciseSampler
+from pack import pack_strings, unpack_strings, encode_pitch, decode_pitch
+
+SNAPSHOT_MAGIC = b"SDSS"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_PATH = ".suspended.snapshot"
+# magic, version, paused, score, frame, selected index, boulders, exercises
+HEADER = struct.Struct("<4sH?xdIiII")
+RNG_STATE_WORDS = 625  # The size of the Mersenne Twister's state
+RNG_WORDS = struct.Struct(f"<I{RNG_STATE_WORDS}I")  # version, then the state
+RNG_GAUSS = struct.Struct("<?d")  # Whether there's a spare gauss(), and it
+# x, y, value, frames visible, scale type id, clef id, start pitch
+BOULDER_RECORD = struct.Struct("<iddIBBH")
+# scale type id, clef id, start pitch, error rate, reaction frames
+EXERCISE_STATS_RECORD = struct.Struct("<BBHdd")
+
+
+@dataclass
+class BoulderState:
+    x: int
+    y: float
+    exercise: Exercise
+    value: float
+    frames_visible: int = 0
+
+
+@dataclass
+class Snapshot:
+    score: float
+    rng_state: tuple  # From Random.getstate()
+    boulders: [BoulderState] = field(default_factory=list)
+    selected: int = -1  # The index of the selected boulder, -1 if none is
+    paused: bool = False
+    frame: int = 0
+    # The sampler's running stats for each exercise: error rate and reaction
+    # frames, so that what comes up next carries on from where it was
+    exercise_stats: dict[Exercise, tuple[float, float]] = \
+        field(default_factory=dict)
+    
+    def to_bytes(self) -> bytes:
+        """
+        Returns:
+            bytes: The snapshot in the format described at the top of the file
+        """
+        exercises = [boulder.exercise for boulder in self.boulders]
+        exercises += list(self.exercise_stats)
+        scale_keys = sorted({exercise[0] for exercise in exercises})
+        clefs = sorted({exercise[1] for exercise in exercises})
+        scale_ids = {key: i for i, key in enumerate(scale_keys)}
+        clef_ids = {name: i for i, name in enumerate(clefs)}
+        
+        version, state, gauss = self.rng_state
+        parts = [
+            HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, self.paused,
+                        self.score, self.frame, self.selected,
+                        len(self.boulders), len(self.exercise_stats)),
+            RNG_WORDS.pack(version, *state),
+            RNG_GAUSS.pack(gauss is not None, gauss or 0.),
+            pack_strings(scale_keys),
+            pack_strings(clefs),
+        ]
+        for boulder in self.boulders:
+            scale_key, clef, starts_on = boulder.exercise
+            parts.append(BOULDER_RECORD.pack(
+                boulder.x, boulder.y, boulder.value, boulder.frames_visible,
+                scale_ids[scale_key], clef_ids[clef], encode_pitch(starts_on)
+            ))
+        for (scale_key, clef, starts_on), (error_rate, reaction_frames) \
+                in self.exercise_stats.items():
+            parts.append(EXERCISE_STATS_RECORD.pack(
+                scale_ids[scale_key], clef_ids[clef], encode_pitch(starts_on),
+                error_rate, reaction_frames
+            ))
+        return b"".join(parts)
+    
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Snapshot:
+        """
+        Args:
+            data (bytes): A snapshot made by to_bytes()
+        
+        Returns:
+            Snapshot: The snapshot
+        """
+        (magic, version, paused, score, frame, selected, boulder_count,
+         stats_count) = HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC:
+            raise Exception("NotASnapshotError")
+        if version != SNAPSHOT_VERSION:
+            raise Exception(f"SnapshotVersionError: {version}")
+        offset = HEADER.size
+        rng_version, *state = RNG_WORDS.unpack_from(data, offset)
+        offset += RNG_WORDS.size
+        has_gauss, gauss = RNG_GAUSS.unpack_from(data, offset)
+        offset += RNG_GAUSS.size
+        scale_keys, offset = unpack_strings(data, offset)
+        clefs, offset = unpack_strings(data, offset)
+        
+        boulders = []
+        for x, y, value, frames_visible, scale_id, clef_id, pitch in \
+                BOULDER_RECORD.iter_unpack(data[
+                    offset:offset + boulder_count * BOULDER_RECORD.size
+                ]):
+            exercise = (scale_keys[scale_id], clefs[clef_id],
+                        decode_pitch(pitch))
+            boulders.append(
+                BoulderState(x, y, exercise, value, frames_visible)
+            )
+        offset += boulder_count * BOULDER_RECORD.size
+        
+        exercise_stats = {}
+        for scale_id, clef_id, pitch, error_rate, reaction_frames in \
+                EXERCISE_STATS_RECORD.iter_unpack(data[
+                    offset:offset + stats_count * EXERCISE_STATS_RECORD.size
+                ]):
+            exercise = (scale_keys[scale_id], clefs[clef_id],
+                        decode_pitch(pitch))
+            exercise_stats[exercise] = (error_rate, reaction_frames)
+        
+        rng_state = (rng_version, tuple(state), gauss if has_gauss else None)
+        return cls(score, rng_state, boulders, selected, paused, frame,
+                   exercise_stats)
+    
+    def save(self, path: str = SNAPSHOT_PATH):
+        """
+        Args:
+            path (str): Where to save the snapshot
+        """
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+    
+    @classmethod
+    def load(cls, path: str = SNAPSHOT_PATH) -> Snapshot:
+        """
+        Args:
+            path (str): Where the snapshot was saved
+        
+        Returns:
+            Snapshot: The snapshot
+        """
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+def sampler_stats(sampler) -> dict[Exercise, tuple[float, float]]:
+    """
+    Args:
+        sampler (ExerciseSampler | PackSampler): The sampler of a game
+    
+    Returns:
+        dict[Exercise, tuple[float, float]]: The running stats of each of its
+            exercises, or nothing if it doesn't keep any (packs don't)
+    """
+    if not isinstance(sampler, ExerciseSampler):
+        return {}
+    return {exercise: (stats.error_rate, stats.reaction_frames)
+            for exercise, stats in zip(sampler.exercises, sampler.stats)}
+
+
+def restore_sampler_stats(sampler,
+                          exercise_stats: dict[Exercise, tuple[float, float]]):
+    """
+    Puts a snapshot's stats back into a sampler, for the exercises it still
+        has (the settings might have changed since).
+    
+    Args:
+        sampler (ExerciseSampler | PackSampler): The sampler of a game
+        exercise_stats (dict[Exercise, tuple[float, float]]): From a snapshot
+    """
+    if not isinstance(sampler, ExerciseSampler):
+        return
+    for exercise, (error_rate, reaction_frames) in exercise_stats.items():
+        if exercise in sampler.ids:
+            i = sampler.ids[exercise]
+            sampler.stats[i].error_rate = error_rate
+            sampler.stats[i].reaction_frames = reaction_frames
+            sampler.weights[i] = sampler.stats[i].weight()
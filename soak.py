@@ -0,0 +1,244 @@
+"""
+Plays the real game headlessly, one game after another, for hours of game
+    time as a kiosk would, and checks that memory and the number of live
+    objects stop growing.  Memory is measured with tracemalloc and objects are
+    counted by type, every few minutes of game time, against the first
+    measurement (once the caches have warmed up).
+
+Usage: python soak.py [--hours 8] [--game-minutes 10] [--interval 5]
+                      [--max-growth-kb 1024] [--max-object-growth 200]
+                      [--max-boulders 4] [--boulder-max-prob 0.015625]
+    Exits with status 1 as soon as either grows past its limit, printing what
+    grew the most.  A long --game-minutes checks a single game left running,
+    and more boulders, more often (e.g. --max-boulders 8 --boulder-max-prob
+    .5), crowds the screen so that placing boulders goes wrong more often.
+"""
+import contextlib
+import gc
+import io
+import sys
+import tempfile
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass
+from random import Random
+from time import perf_counter
+from useful import start_headless, render_frame, apply_scene_change, \
+    push_warm_scene
+from rules import MAX_BOULDERS, BOULDER_MAX_PROB, FPS
+
+KIOSK_HOURS = 8
+GAME_MINUTES = 10  # How long each player plays before the next one starts
+SAMPLE_MINUTES = 5
+MAX_GROWTH_KB = 1024
+MAX_OBJECT_GROWTH = 200  # Per type; a full screen of boulders is far less
+REPORT_LINES = 10
+# The chance, each frame, of the player doing each thing
+GUESS_CHANCE = 1 / 45
+ARROW_CHANCE = 1 / 60
+PAUSE_CHANCE = 1 / 3000
+ACCURACY = .8
+
+
+@dataclass
+class Sample:
+    frame: int
+    traced: int  # Bytes allocated, from tracemalloc
+    objects: Counter  # Live objects tracked by the GC, by type name
+    snapshot: tracemalloc.Snapshot
+
+
+def take_sample(frame: int) -> Sample:
+    """
+    Args:
+        frame (int): How many frames have been played so far
+    
+    Returns:
+        Sample: The memory in use and the live objects, after a full
+            collection so that only what's really still referenced counts
+    """
+    gc.collect()
+    objects = Counter(type(o).__name__ for o in gc.get_objects())
+    return Sample(frame, tracemalloc.get_traced_memory()[0], objects,
+                  tracemalloc.take_snapshot())
+
+
+def object_growth(baseline: Sample, sample: Sample) -> [tuple[str, int]]:
+    """
+    Args:
+        baseline (Sample): The first sample
+        sample (Sample): A later sample
+    
+    Returns:
+        list[tuple[str, int]]: Each type of object that there are more of,
+            with how many more, most first
+    """
+    growth = sample.objects - baseline.objects
+    return growth.most_common()
+
+
+def press(world, key: str):
+    """
+    Presses a key in the game, keeping what the handler prints out of the
+        report.
+    
+    Args:
+        world (World): The game
+        key (str): The name of the key
+    """
+    from world import void_keyPressed
+    with contextlib.redirect_stdout(io.StringIO()):
+        void_keyPressed(world, key)
+
+
+def act(world, rng: Random):
+    """
+    Plays one frame like a real player: mostly guessing the selected boulder,
+        sometimes wrongly, sometimes moving the selection, and now and then
+        pausing the game or carrying on.
+    
+    Args:
+        world (World): The game
+        rng (Random): Where to get random numbers from
+    """
+    if world.paused:
+        if rng.random() < PAUSE_CHANCE * 10:
+            press(world, 'space')
+        return
+    roll = rng.random()
+    if roll < GUESS_CHANCE and world.selected in world.boulders:
+        scale_key = world.boulders[world.selected].scale.exercise[0]
+        if rng.random() > ACCURACY:
+            scale_key = rng.choice("qwer")
+        press(world, scale_key)
+    elif roll < GUESS_CHANCE + ARROW_CHANCE:
+        press(world, rng.choice(['left', 'right']))
+    elif roll < GUESS_CHANCE + ARROW_CHANCE + PAUSE_CHANCE:
+        press(world, 'space')
+
+
+def soak(hours: float = KIOSK_HOURS, game_minutes: float = GAME_MINUTES,
+         sample_minutes: float = SAMPLE_MINUTES,
+         max_growth_kb: float = MAX_GROWTH_KB,
+         max_object_growth: int = MAX_OBJECT_GROWTH,
+         max_boulders: int = MAX_BOULDERS,
+         boulder_max_prob: float = BOULDER_MAX_PROB, seed: int = 0) -> bool:
+    """
+    Plays games back to back through designer's scenes, as the menu does, so
+        that everything a game makes is made and thrown away, or reset for
+        the next game, for real.  Scores
+        are saved to a temporary history, not the real one.
+    
+    Args:
+        hours (float): How much game time to play for
+        game_minutes (float): How long each game lasts
+        sample_minutes (float): How much game time between samples
+        max_growth_kb (float): How much memory may grow past the first sample
+        max_object_growth (int): How many more objects of any one type there
+            may be than in the first sample
+        max_boulders (int): The most boulders there can be at once
+        boulder_max_prob (float): The most likely a boulder is to be made
+            each frame
+        seed (int): The seed for the game and the player
+    
+    Returns:
+        bool: Whether nothing grew past its limit
+    """
+    start_headless()
+    import random
+    import designer
+    import history
+    import world
+    world.whens()
+    history.WRITER = history.HistoryWriter(
+        f"{tempfile.mkdtemp()}/soak.sqlite3"
+    )
+    random.seed(seed)
+    rng = Random(seed)
+    
+    total_frames = round(hours * 60 * 60 * FPS)
+    game_frames = max(1, round(game_minutes * 60 * FPS))
+    sample_frames = max(1, round(sample_minutes * 60 * FPS))
+    tracemalloc.start()
+    baseline = None
+    started = perf_counter()
+    frame = 0
+    print(f"{'game time':>10}{'memory KiB':>12}{'growth':>10}"
+          f"{'objects':>10}{'sprites':>9}{'ms/frame':>10}")
+    while frame < total_frames:
+        push_warm_scene("world")
+        apply_scene_change()
+        game = designer.GLOBAL_DIRECTOR.game_state
+        game.max_boulders = max_boulders
+        game.boulder_max_prob = boulder_max_prob
+        for _ in range(min(game_frames, total_frames - frame)):
+            world.void_draw(game)
+            render_frame(game)
+            act(game, rng)
+            frame += 1
+            if frame % sample_frames:
+                continue
+            
+            sample = take_sample(frame)
+            if baseline is None:
+                baseline = sample
+            growth = (sample.traced - baseline.traced) / 1024
+            print(f"{frame / FPS / 60:>8.0f}m {sample.traced / 1024:>11.0f}"
+                  f"{growth:>+10.0f}{sum(sample.objects.values()):>10}"
+                  f"{len(designer.GLOBAL_DIRECTOR.all_sprites):>9}"
+                  f"{(perf_counter() - started) / frame * 1000:>10.2f}")
+            grown = object_growth(baseline, sample)
+            if (growth > max_growth_kb
+                    or grown and grown[0][1] > max_object_growth):
+                report(baseline, sample, grown)
+                return False
+        press(game, 'escape')
+        apply_scene_change()
+        del game
+    history.WRITER.close()
+    return True
+
+
+def report(baseline: Sample, sample: Sample, grown: [tuple[str, int]]):
+    """
+    Prints what grew the most between two samples.
+    
+    Args:
+        baseline (Sample): The first sample
+        sample (Sample): The sample that went past a limit
+        grown (list[tuple[str, int]]): From object_growth
+    """
+    print(f"Leak after {sample.frame / FPS / 60:.0f} minutes of game time")
+    print("Objects that grew the most:")
+    for name, count in grown[:REPORT_LINES]:
+        print(f"  {name:<32}{count:>+8}")
+    print("Lines that allocated the most since the first sample:")
+    for stat in sample.snapshot.compare_to(baseline.snapshot,
+                                           "lineno")[:REPORT_LINES]:
+        print(f"  {stat}")
+
+
+def main():
+    """ Runs a soak from the command line. """
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hours", type=float, default=KIOSK_HOURS)
+    parser.add_argument("--game-minutes", type=float, default=GAME_MINUTES)
+    parser.add_argument("--interval", type=float, default=SAMPLE_MINUTES,
+                        help="minutes of game time between samples")
+    parser.add_argument("--max-growth-kb", type=float, default=MAX_GROWTH_KB)
+    parser.add_argument("--max-object-growth", type=int,
+                        default=MAX_OBJECT_GROWTH)
+    parser.add_argument("--max-boulders", type=int, default=MAX_BOULDERS)
+    parser.add_argument("--boulder-max-prob", type=float,
+                        default=BOULDER_MAX_PROB)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    passed = soak(args.hours, args.game_minutes, args.interval,
+                  args.max_growth_kb, args.max_object_growth,
+                  args.max_boulders, args.boulder_max_prob, args.seed)
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
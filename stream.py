@@ -0,0 +1,199 @@
+"""
+The endless sight-reading mode's staff, which doesn't need designer.  One long
+    staff scrolls past, made as it's needed by a chain of generators:
+        exercises() picks each scale with the sampler,
+        notes() walks up it one note at a time with Note.up_by,
+        segments() writes its notes in Game Font with Note.string_form,
+        and a StaffWindow keeps only the segments on screen, plus a short
+        look-ahead past the right of the window.
+    However long a session runs, nothing else is ever made, so memory and the
+    work done each frame stay the same.
+"""
+from collections import deque
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+from itertools import count, groupby
+from helpers import int_from_pattern
+from theory import SCALE_TYPE_INFO, CLEFS, KEY_SIGNATURES, \
+    KEY_SIGNATURE_GLYPHS, Exercise, Note, exercise_key_signature
+
+LOOK_AHEAD = 1  # How many segments to make past the right of the window
+PATTERNS = {
+    scale_key: [int_from_pattern(c) for c in scale_type.pattern]
+    for scale_key, scale_type in SCALE_TYPE_INFO.items()
+}
+
+
+@dataclass
+class Segment:
+    index: int  # How many segments came before it in the session
+    exercise_id: int
+    exercise: Exercise
+    glyphs: str  # The clef and the notes, in Game Font
+    width: float = 0.
+    x: float = 0.  # Where its left edge is
+    value: float = 0.  # How many points naming it is worth
+    frames_visible: int = 0
+    answered: bool = False
+
+
+def exercises(sampler) -> Iterator[tuple[int, int, Exercise]]:
+    """
+    Picks scale after scale, for as long as they're wanted.
+    
+    Args:
+        sampler (ExerciseSampler): What to pick them with, so that the ones
+            the player is weakest at come up most
+    
+    Yields:
+        tuple[int, int, Exercise]: The segment's index, and the id of the
+            exercise in the sampler and the exercise itself
+    """
+    for index in count():
+        exercise_id = sampler.sample_id()
+        yield index, exercise_id, sampler.exercises[exercise_id]
+
+
+def notes(exercises: Iterator[tuple[int, int, Exercise]]
+          ) -> Iterator[tuple[int, int, Exercise, Note]]:
+    """
+    Walks up each scale from its first note to its octave, one note at a time.
+    
+    Args:
+        exercises (Iterator[tuple[int, int, Exercise]]): From exercises()
+    
+    Yields:
+        tuple[int, int, Exercise, Note]: The segment's index and its exercise,
+            as from exercises(), and one of its notes
+    """
+    for index, exercise_id, exercise in exercises:
+        scale_key, _, start = exercise
+        pattern = PATTERNS[scale_key]
+        note = Note(start)
+        yield index, exercise_id, exercise, note
+        for up_by in pattern:
+            note = note.up_by(up_by, len(pattern))
+            yield index, exercise_id, exercise, note
+
+
+def segments(notes: Iterator[tuple[int, int, Exercise, Note]],
+             key_signatures: bool = False) -> Iterator[Segment]:
+    """
+    Writes each scale's notes in Game Font, as sheet_music() does, as they
+        come.
+    
+    Args:
+        notes (Iterator[tuple[int, int, Exercise, Note]]): From notes()
+        key_signatures (bool): Whether to write each scale with its key
+            signature
+    
+    Yields:
+        Segment: Each scale, ready to go on the staff
+    """
+    for index, scale_notes in groupby(notes, key=lambda item: item[0]):
+        _, exercise_id, exercise, note = next(scale_notes)
+        clef = CLEFS[exercise[1]]
+        key_signature = KEY_SIGNATURES[0]
+        if key_signatures:
+            key_signature = exercise_key_signature(exercise)
+        glyphs = [
+            clef.symbol,
+            KEY_SIGNATURE_GLYPHS[clef.name, key_signature.sharps_flats],
+            note.string_form(clef, key_signature)
+        ]
+        for *_, note in scale_notes:
+            glyphs.append(note.string_form(clef, key_signature))
+        yield Segment(index, exercise_id, exercise, "".join(glyphs))
+
+
+@dataclass
+class StaffWindow:
+    source: Iterator[Segment]
+    width: float  # The width of the part of the window the staff is in
+    measure: Callable[[str], float]  # How wide some glyphs are on screen
+    look_ahead: int = LOOK_AHEAD
+    shown: deque[Segment] = field(default_factory=deque)
+    
+    def __post_init__(self):
+        """ Fills the window from its right edge, as if it had just begun. """
+        self.fill(self.width)
+    
+    def fill(self, start: float = None):
+        """
+        Takes segments from the source until the staff reaches past the right
+            of the window by look_ahead segments.
+        
+        Args:
+            start (float): Where the first segment goes, if there are none yet
+        """
+        while (not self.shown or self.look_ahead > sum(
+                segment.x >= self.width for segment in self.shown)):
+            segment = next(self.source)
+            segment.width = self.measure(segment.glyphs)
+            if self.shown:
+                segment.x = self.shown[-1].x + self.shown[-1].width
+            else:
+                segment.x = start
+            self.shown.append(segment)
+    
+    def scroll(self, speed: float) -> [Segment]:
+        """
+        Moves the staff left, making more of it as it comes into the window.
+        
+        Args:
+            speed (float): How far to move it
+        
+        Returns:
+            list[Segment]: The segments that have gone off the left of the
+                window, which are no longer shown
+        """
+        for segment in self.shown:
+            segment.x -= speed
+            segment.frames_visible += self.visible(segment)
+        gone = []
+        while self.shown and self.shown[0].x + self.shown[0].width < 0:
+            gone.append(self.shown.popleft())
+        self.fill()
+        return gone
+    
+    def visible(self, segment: Segment) -> bool:
+        """
+        Args:
+            segment (Segment): One of the segments shown
+        
+        Returns:
+            bool: Whether all of it has come into the window yet; it's only
+                drawn once it has, so that it doesn't go over what's to the
+                right of the staff
+        """
+        return segment.x + segment.width <= self.width
+    
+    def current(self) -> Segment | None:
+        """
+        Returns:
+            Segment | None: The segment to name next: the leftmost one in the
+                window that hasn't been named yet, if any
+        """
+        for segment in self.shown:
+            if not self.visible(segment):
+                return None
+            if not segment.answered:
+                return segment
+        return None
+
+
+def staff(sampler, width: float, measure: Callable[[str], float],
+          key_signatures: bool = False) -> StaffWindow:
+    """
+    Args:
+        sampler (ExerciseSampler): What to pick the scales with
+        width (float): The width of the part of the window the staff is in
+        measure (Callable[[str], float]): How wide some glyphs are on screen
+        key_signatures (bool): Whether to write scales with key signatures
+    
+    Returns:
+        StaffWindow: The whole pipeline, with the window full
+    """
+    return StaffWindow(
+        segments(notes(exercises(sampler)), key_signatures), width, measure
+    )
@@ -0,0 +1,146 @@
+"""
+Stress mode: runs the real game loop with the cap on boulders lifted, spawning
+    a boulder every frame, and reports how the time for a frame, a spawn and a
+    key press grow with the number of boulders on screen.
+
+Usage: python stress.py [--max-boulders 300] [--frames 3000]
+                        [--boulder-scale 1] [--json results.json] [--window]
+"""
+import json
+import random
+from statistics import mean
+from time import perf_counter
+from useful import start_headless, render_frame
+
+STRESS_MAX_BOULDERS = 300
+STRESS_FRAMES = 3000
+STRESS_BOULDER_SCALE = 1  # Small boulders, so that hundreds fit on screen
+BUCKET_SIZE = 25  # Group the measurements by this many live boulders
+STRESS_KEYS = ["left", "right", "q", "w", "e", "r"]
+
+
+def percentile(values: [float], fraction: float) -> float:
+    """
+    Args:
+        values (list[float]): The values to look through
+        fraction (float): How far through the sorted values to look, e.g. .95
+    
+    Returns:
+        float: The value that `fraction` of the values are at or below
+    """
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run(max_boulders: int = STRESS_MAX_BOULDERS,
+        frames: int = STRESS_FRAMES,
+        boulder_scale: int = STRESS_BOULDER_SCALE,
+        window: bool = False,
+        seed: int = 0) -> dict[int, dict[str, float]]:
+    """
+    Plays `frames` frames of the game, trying to spawn a boulder every frame
+        and pressing one of STRESS_KEYS every frame, timing each part.
+    
+    Args:
+        max_boulders (int): The most boulders to have at once
+        frames (int): How many frames to run for
+        boulder_scale (int): How big to make the boulders
+        window (bool): Whether to show the game while it runs
+        seed (int): The seed for the random numbers, for repeatable runs
+    
+    Returns:
+        dict[int, dict[str, float]]: The timings in milliseconds for each bucket
+            of live boulder counts, keyed by the lowest count in the bucket
+    """
+    start_headless(window)
+    import world as world_module
+    from boulder import Boulder
+    
+    random.seed(seed)
+    world = world_module.World(max_boulders=max_boulders,
+                               boulder_max_prob=0.,  # We do the spawning
+                               boulder_scale=boulder_scale)
+    # Time everything at full quality, rather than whatever the governor sheds
+    world.governor.budget = float("inf")
+    samples = {}
+    for frame in range(frames):
+        live = len(world.boulders)
+        sample = samples.setdefault(live // BUCKET_SIZE * BUCKET_SIZE, {
+            "frame": [], "update": [], "render": [], "spawn": [], "key": []
+        })
+        
+        if live < world.max_boulders:
+            start = perf_counter()
+            Boulder(world)
+            sample["spawn"].append(perf_counter() - start)
+        
+        start = perf_counter()
+        world_module.void_draw(world)
+        updated = perf_counter()
+        render_frame(world)
+        rendered = perf_counter()
+        sample["update"].append(updated - start)
+        sample["render"].append(rendered - updated)
+        sample["frame"].append(rendered - start)
+        
+        start = perf_counter()
+        key = STRESS_KEYS[frame % len(STRESS_KEYS)]
+        world_module.void_keyPressed(world, key)
+        sample["key"].append(perf_counter() - start)
+    
+    report = {}
+    for bucket, sample in sorted(samples.items()):
+        report[bucket] = {"frames": len(sample["frame"])}
+        for name, times in sample.items():
+            if not times:
+                continue
+            report[bucket][f"{name}_mean_ms"] = 1000 * mean(times)
+            report[bucket][f"{name}_p95_ms"] = 1000 * percentile(times, .95)
+    return report
+
+
+def format_table(report: dict[int, dict[str, float]]) -> str:
+    """
+    Args:
+        report (dict[int, dict[str, float]]): The report from run()
+    
+    Returns:
+        str: The report as a table, one row per bucket of live boulders
+    """
+    columns = ["frame_mean_ms", "frame_p95_ms", "update_mean_ms",
+               "render_mean_ms", "spawn_mean_ms", "key_mean_ms", "key_p95_ms"]
+    lines = ["boulders  frames  " + "  ".join(
+        f"{column[:-3]:>14}" for column in columns
+    )]
+    for bucket, row in report.items():
+        lines.append(f"{bucket:>4}-{bucket + BUCKET_SIZE - 1:<4}"
+                     f"{row['frames']:>7}  " + "  ".join(
+                         f"{row.get(column, float('nan')):>14.3f}"
+                         for column in columns
+                     ))
+    return "\n".join(lines)
+
+
+def main():
+    """ Runs the stress mode and prints the report. """
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--max-boulders", type=int,
+                        default=STRESS_MAX_BOULDERS)
+    parser.add_argument("--frames", type=int, default=STRESS_FRAMES)
+    parser.add_argument("--boulder-scale", type=int,
+                        default=STRESS_BOULDER_SCALE)
+    parser.add_argument("--json", help="also write the report here as JSON")
+    parser.add_argument("--window", action="store_true",
+                        help="show the game while it runs")
+    args = parser.parse_args()
+    report = run(args.max_boulders, args.frames, args.boulder_scale,
+                 args.window)
+    print(format_table(report))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
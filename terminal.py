@@ -0,0 +1,161 @@
+"""
+Plays the game in a terminal with curses, for machines where starting pygame
+    is too slow.  It runs the same rules as the window version, through
+    Simulation, and shows each boulder as a box with the notes of its scale.
+
+Usage: python terminal.py
+"""
+import curses
+import time
+from config import Settings
+from helpers import int_from_pattern
+from rules import GUTTER, BOULDER_HEIGHT, FPS
+from simulation import Simulation
+from theory import SCALE_TYPE_INFO, SCALE_TYPE_KEYS, Note, note_names
+
+BOX_WIDTH = 16  # Columns, including the border
+BOX_HEIGHT = 4  # Rows, including the border
+SIDEBAR_WIDTH = 24  # Columns for the score and the keys
+NOTES_PER_LINE = 4
+KEY_NAMES = {
+    curses.KEY_LEFT: "left",
+    curses.KEY_RIGHT: "right",
+    27: "escape",
+    ord(" "): "space",
+}
+
+
+def boulder_lines(exercise: tuple[str, str, str], paused: bool) -> [str]:
+    """
+    Args:
+        exercise (Exercise): The exercise on the boulder
+        paused (bool): Whether the game is paused, hiding the scale
+    
+    Returns:
+        list[str]: The lines of text inside the boulder's box
+    """
+    if paused:
+        return ["?" * (BOX_WIDTH - 2)] * (BOX_HEIGHT - 2)
+    scale_key, _, starts_on = exercise
+    pattern = [int_from_pattern(c) for c in SCALE_TYPE_INFO[scale_key].pattern]
+    notes = note_names(pattern, Note(starts_on)).split()
+    return [" ".join(notes[i:i + NOTES_PER_LINE])
+            for i in range(0, len(notes), NOTES_PER_LINE)]
+
+
+def key_name(code: int) -> str | None:
+    """
+    Converts a curses key code to the name designer would give it, so it can be
+        handed to Simulation.press.
+    
+    Args:
+        code (int): The key code from getch()
+    
+    Returns:
+        str | None: The name of the key, or None if it isn't one we use
+    """
+    if code in KEY_NAMES:
+        return KEY_NAMES[code]
+    if 0 <= code < 0x110000 and chr(code) in SCALE_TYPE_INFO:
+        return chr(code)
+    return None
+
+
+def draw(screen: curses.window, simulation: Simulation, legend: [str]):
+    """
+    Draws a frame: the boulders, scaled from the window's coordinates to the
+        terminal's, and the score and keys down the side.
+    
+    Args:
+        screen (window): The terminal
+        simulation (Simulation): The game to draw
+        legend (list[str]): Which key to press for which type of scale
+    """
+    rows, columns = screen.getmaxyx()
+    play_columns = max(BOX_WIDTH, columns - SIDEBAR_WIDTH)
+    x_scale = (play_columns - BOX_WIDTH) / (simulation.width - GUTTER)
+    y_scale = rows / (simulation.height + BOULDER_HEIGHT / 2)
+    screen.erase()
+    for boulder in simulation.boulders.values():
+        top = int(boulder.y * y_scale) - BOX_HEIGHT // 2
+        left = int(boulder.x * x_scale)
+        if top + BOX_HEIGHT <= 0 or top >= rows:
+            continue
+        style = curses.A_BOLD if boulder.x == simulation.selected \
+            else curses.A_DIM
+        inside = boulder_lines(boulder.exercise, simulation.paused)
+        lines = ["+" + "-" * (BOX_WIDTH - 2) + "+"]
+        lines += [f"|{line:^{BOX_WIDTH - 2}}|" for line in inside]
+        lines.append(lines[0])
+        for i, line in enumerate(lines):
+            if 0 <= top + i < rows:
+                put(screen, top + i, left, line, style)
+    
+    sidebar = [f"Score: {simulation.score:.4}", ""] + legend
+    if simulation.paused:
+        sidebar += ["", "Paused: space to go on"]
+    for i, line in enumerate(sidebar):
+        put(screen, i, play_columns + 1, line[:SIDEBAR_WIDTH - 1])
+    screen.refresh()
+
+
+def put(screen: curses.window, row: int, column: int, text: str,
+        style: int = curses.A_NORMAL):
+    """
+    Writes text, ignoring whatever doesn't fit in the terminal.
+    
+    Args:
+        screen (window): The terminal
+        row (int): The row to write on
+        column (int): The column to start at
+        text (str): What to write
+        style (int): The curses attributes to write it with
+    """
+    try:
+        screen.addstr(row, column, text, style)
+    except curses.error:
+        pass  # Writing the bottom right corner, or off the edge
+
+
+def play(screen: curses.window, settings: Settings) -> float:
+    """
+    Runs the game until escape is pressed, at FPS frames per second.
+    
+    Args:
+        screen (window): The terminal
+        settings (Settings): The settings to play with
+    
+    Returns:
+        float: The final score
+    """
+    curses.curs_set(0)
+    screen.nodelay(True)
+    screen.keypad(True)
+    simulation = Simulation(settings)
+    legend = [f"{SCALE_TYPE_KEYS[name]}: {name}" for name in SCALE_TYPE_KEYS
+              if name in settings.scale_types]
+    next_frame = time.perf_counter()
+    while True:
+        code = screen.getch()
+        while code != -1:
+            key = key_name(code)
+            if key == "escape":
+                return simulation.score
+            if key is not None:
+                simulation.press(key)
+            code = screen.getch()
+        simulation.step()
+        draw(screen, simulation, legend)
+        next_frame += 1 / FPS
+        time.sleep(max(0., next_frame - time.perf_counter()))
+
+
+def main():
+    """ Plays the game in the terminal, then prints the score. """
+    import os
+    os.environ.setdefault("ESCDELAY", "25")  # Don't wait a second for escape
+    print(curses.wrapper(play, Settings.load()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,632 @@
+"""
+The music theory behind the game: notes, clefs and the types of scale, and
+    writing scales out as sheet music in Game Font or as note names.  None of
+    it needs designer, so it can be used without a window.
+"""
+# Imports for type checking
+from __future__ import annotations
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from world import World
+
+# Normal imports
+from dataclasses import dataclass, field
+from helpers import get_next_letter, pm_bool, cmp, int_from_pattern
+
+# An exercise is the key of the scale type, the name of the clef, and the note
+# that the scale starts on, e.g. ("q", "Treble", "Eb4")
+Exercise = tuple[str, str, str]
+
+# I might change these to better symbols at some point.
+SHARP = '#'
+FLAT  = 'b'
+
+ORDER_OF_SHARPS = 'FCGDAEB'
+LETTERS_PER_OCTAVE = len(ORDER_OF_SHARPS)
+HALF_STEPS_PER_OCTAVE = 12
+# How many half steps above C each natural note is
+LETTER_HALF_STEPS = {'C': 0, 'D': 2, 'E': 4, 'F': 5, 'G': 7, 'A': 9, 'B': 11}
+
+STAFF_LINES  = 5
+STAFF_SPACES = 4
+LEDGER_LINES = 4
+TOTAL_NOTES = STAFF_LINES + STAFF_SPACES + 2 * LEDGER_LINES
+
+NOTES_START = 0xE000
+FLATS_START = 0xE020
+NATURALS_START = 0xE040
+SHARPS_START = 0xE060
+ACCIDENTALS_START = {
+    SHARP: SHARPS_START,
+    FLAT: FLATS_START
+}
+
+
+@dataclass
+class ScaleInfo:
+    name: str  # The name of the type of scale
+    pattern: str  # The pattern of whole and half (and augmented) steps
+    # The notes that this type of scale can start without octaves
+    possible_starts_octaveless: [str]
+    # All of the possible start positions
+    possible_starts: set[str] = field(default_factory=set)
+    # The pattern of the scale whose key signature this type of scale is
+    # written with, if not its own (e.g. harmonic minor uses natural minor's)
+    signature_pattern: str = None
+    
+    def __post_init__(self):
+        """
+        Creates possible_starts from possible_starts_octaveless, and defaults
+            signature_pattern to pattern
+        """
+        if self.signature_pattern is None:
+            self.signature_pattern = self.pattern
+        for possible_start in self.possible_starts_octaveless:
+            for octave in range(9):
+                self.possible_starts.add(possible_start + str(octave))
+
+
+# A dictionary to store some info about the types of scale, indexed with the
+# key that must be pressed to choose the type of scale
+SCALE_TYPE_INFO = {
+    "q": ScaleInfo("Major",          "WWHWWWH", [
+        "Cb", "Gb", "Db", "Ab", "Eb", "Bb", "F",
+        "C", "G", "D", "A", "E", "B", "F#", "C#"
+    ]),
+    "w": ScaleInfo("Natural Minor",  "WHWWHWW", [
+        "Ab", "Eb", "Bb", "F", "C", "G", "D",
+        "A", "E", "B", "F#", "C#", "G#", "D#", "A#"
+    ]),
+    "e": ScaleInfo("Harmonic Minor", "WHWWH3H", [
+        "Ab", "Eb", "Bb", "F", "C", "G", "D",
+        "A", "E", "B", "F#", "C#", "G#", "D#", "A#"
+    ], signature_pattern="WHWWHWW"),
+    "r": ScaleInfo("Melodic Minor",  "WHWWWWH", [
+        "Ab", "Eb", "Bb", "F", "C", "G", "D",
+        "A", "E", "B", "F#", "C#", "G#", "D#", "A#"
+    ], signature_pattern="WHWWHWW"),
+    "1": ScaleInfo("Ionian",         "WWHWWWH", [
+        "Cb", "Gb", "Db", "Ab", "Eb", "Bb", "F",
+        "C", "G", "D", "A", "E", "B", "F#", "C#"
+    ]),
+    "2": ScaleInfo("Dorian",         "WHWWWHW", [
+        "Db", "Ab", "Eb", "Bb", "F", "C", "G",
+        "D", "A", "E", "B", "F#", "C#", "G#", "D#"
+    ]),
+    "3": ScaleInfo("Phrygian",       "HWWWHWW", [
+        "Eb", "Bb", "F", "C", "G", "D", "A",
+        "E", "B", "F#", "C#", "G#", "D#", "A#", "E#"
+    ]),
+    "4": ScaleInfo("Lydian",         "WWWHWWH", [
+        "Fb", "Cb", "Gb", "Db", "Ab", "Eb", "Bb",
+        "F", "C", "G", "D", "A", "E", "B", "F#"
+    ]),
+    "5": ScaleInfo("Mixolydian",     "WWHWWHW", [
+        "Gb", "Db", "Ab", "Eb", "Bb", "F", "C",
+        "G", "D", "A", "E", "B", "F#", "C#", "G#"
+    ]),
+    "6": ScaleInfo("Aeolian",        "WHWWHWW", [
+        "Ab", "Eb", "Bb", "F", "C", "G", "D",
+        "A", "E", "B", "F#", "C#", "G#", "D#", "A#"
+    ]),
+    "7": ScaleInfo("Lochrian",       "HWWHWWW", [
+        "Bb", "F", "C", "G", "D", "A", "E",
+        "B", "F#", "C#", "G#", "D#", "A#", "E#", "B#"
+    ])
+}
+
+# A dictionary to store the mapping of the names of scale types to the key that
+# must be pressed to choose the type of scale
+SCALE_TYPE_KEYS = {
+    scale_info.name: key for key, scale_info in SCALE_TYPE_INFO.items()
+}
+
+NORMAL_SCALE_KEYS = ['q', 'w', 'e', 'r']
+CHURCH_MODES_KEYS = [f"{i}" for i in range(1, LETTERS_PER_OCTAVE + 1)]
+
+NORMAL_SCALE_NAMES = [SCALE_TYPE_INFO[key].name for key in NORMAL_SCALE_KEYS]
+CHURCH_MODES_NAMES = [SCALE_TYPE_INFO[i].name for i in CHURCH_MODES_KEYS]
+
+
+@dataclass
+class Clef:
+    name: str
+    symbol: str
+    lowest_note: Note  # Note number 1, not 0
+    sharps_pattern: [bool]  # True: up   a 5th, False: down a 4th
+    flats_pattern:  [bool]  # True: down a 5th, False: up   a 4th
+    
+    def all_notes(self, world: World) -> set:
+        """
+            Creates a set of all possible starting notes from lowest_note
+            
+            Args:
+                world (World): The world from which to get settings
+            
+            Returns:
+                set: The set of all possible starting notes for this clef, given
+                    the number of ledger lines as defined in `world.settings`
+        """
+        all_notes = []
+        letter_now = self.lowest_note.letter
+        octave_now = self.lowest_note.octave
+        for i in range(TOTAL_NOTES - LETTERS_PER_OCTAVE):
+            temp_notes = [letter_now] * 3
+            temp_notes[0] += FLAT
+            temp_notes[2] += SHARP
+            temp_notes = [f"{note}{octave_now}" for note in temp_notes]
+            all_notes += temp_notes
+            
+            letter_now = get_next_letter(letter_now)
+            if letter_now == "C":
+                octave_now += 1
+                
+        return set(
+            all_notes[
+                3 * (LEDGER_LINES - world.settings.max_low_ledger_positions):
+                len(all_notes) -
+                3 * (LEDGER_LINES - world.settings.max_high_ledger_positions)
+            ]
+        )
+
+
+class KeySignature:
+    sharps_flats: int
+    
+    def __init__(self, sharps_flats: int = 0):
+        """
+        Constructor for KeySignature.  Just assigns the input to the field.
+        
+        Args:
+            sharps_flats (int): The number of sharps or flats in the key
+                signature.  Positive for sharps, negative for flats.
+        """
+        self.sharps_flats = sharps_flats
+    
+    def __contains__(self, note: Note) -> bool:
+        """
+        Tests if the letter of note is in the key signature.
+        
+        Args:
+            note (Note): The note to test about
+        
+        Returns:
+            bool: Whether the letter of note is in the key signature.
+        """
+        if self.sharps_flats < 0:
+            return note.letter in ORDER_OF_SHARPS[self.sharps_flats:]
+        return note.letter in ORDER_OF_SHARPS[:self.sharps_flats]
+    
+    def __rxor__(self, note: Note) -> bool:
+        """
+        Using this to see if a Note and this key signature have the same type.
+            I.e. we should have already determined if the Note was in the key
+            signature, and we're now checking if the accidental on the note is
+            different from what they key signature would make it.
+        
+        Args:
+            note (Note): The note to compare to this key signature
+        
+        Returns:
+            bool: Whether the accidental and key signature are different
+        """
+        if note not in self:
+            raise KeyError(
+                "NoteNotEffectedByKeySignatureError: "
+                f"Note: {str(note)}, KeySignature: {self.sharps_flats}"
+            )
+        # Accidental on the note != what the key signature would make it,
+        # so that e.g. F## still shows its double sharp in G major
+        return note.get_sharp_flat() != cmp(self.sharps_flats, 0)
+
+
+class Note:
+    letter: str
+    sharp_flat: str = ''
+    octave: int
+    
+    def __init__(self, note: str):
+        """
+        Constructor for Note.  Creates a note from its string representation.
+            Letters are just the first letter
+            Octaves are found from the last digit of the string.
+        
+        Args:
+            note (str): The string representation to be converted.
+        """
+        if ord('A') <= ord(note[0]) <= ord('G'):
+            self.letter = note[0]
+        else:
+            raise Exception(f"InvalidNoteLetterError: {note[0]}")
+        
+        try:
+            self.octave = int(note[-1])
+        except ValueError:
+            raise Exception(f"InvalidOctaveError: {note[-1]}")
+        
+        sharps_flats = 0
+        for accidental in note[1:-1]:
+            if accidental == '#':
+                sharps_flats += 1
+            elif accidental == 'b':
+                sharps_flats -= 1
+        self.sharp_flat = SHARP*sharps_flats + FLAT*-sharps_flats
+    
+    def __str__(self) -> str:
+        """
+        Automatically called when a Note is passed into print or str.  It will
+            be very similar to what was passed in to the constructor.
+        
+        Returns:
+            str: The string representation of the Note
+        """
+        return f"{self.letter}{self.sharp_flat} {self.octave}"
+    
+    def font_offset_number(self, clef: Clef) -> int:
+        """
+        Gets the amount to shift from the base character in the font.  When
+            added to NOTES_START, FLATS_START, NATURALS_START, etc, gives the
+            correct symbol.  I.e. how high on the staff the note needs to be.
+        
+        Args:
+            clef (Clef): The clef that the note will be displayed in, so we know
+                how high on the staff it needs to be.
+        
+        Returns:
+            int: How high on the staff the note needs to be, given the clef.
+        """
+        octave_diff = self.octave - clef.lowest_note.octave
+        # Deal with the fact that octaves change at C, not at A
+        octave_diff += (self.letter < 'C') - (clef.lowest_note.letter < 'C')
+        # +1, because the lowest_note is number 1, not 0
+        note_diff = ord(self.letter) - ord(clef.lowest_note.letter) +1
+        return octave_diff * LETTERS_PER_OCTAVE + note_diff
+    
+    def accidentals_symbols(self, clef: Clef, with_natural: bool = True) -> str:
+        """
+        Gets the symbols to display the accidentals of this note, given the clef
+            and whether to also display naturals.
+            Note: since the font has no width for accidentals, multiple flats
+            will look like one flat and many sharps will look either like one
+            double sharp, or a double sharp overlaid on a single sharp.
+        
+        Args:
+            clef (Clef): The clef with respect to which to find the characters
+                for the accidentals.
+            with_natural (bool): Whether to display naturals, or leave them
+                blank.  By default, True, displaying them.
+        
+        Returns:
+            str: The accidentals to display.
+        """
+        if not self.sharp_flat:
+            if not with_natural:
+                return ""
+            return chr(NATURALS_START + self.font_offset_number(clef))
+        accidental = self.sharp_flat[0]
+        char_ind = ACCIDENTALS_START[accidental] + self.font_offset_number(clef)
+        return self.sharp_flat.replace(accidental, chr(char_ind))
+    
+    def string_form(self,
+                    clef: Clef = None,
+                    key_signature: KeySignature = KeySignature(),
+                    octave: bool = False
+                    ) -> str:
+        """
+        Makes a string version of the note, very similar to that originally
+            passed into the constructor, if no clef is specified.
+        If a clef is specified, a version of the Note that can be displayed as
+            sheet music with Game Font is returned.
+        
+        Args:
+            clef (Clef): The clef with respect to which to make a string for the
+                note.  By default, None, in which case a text version is given,
+                instead of one to be displayed with Game Font.
+            key_signature (KeySignature): The key signature to use to see if an
+                accidental needs to be displayed.
+            octave (bool): Whether to include the octave number.  By default,
+                False, i.e. no octave number.
+        
+        Returns:
+            str: The string representation of the note, either a plain text form
+                or one to be displayed with Game Font.
+        """
+        if clef is not None:
+            accidental = ""
+            if self in key_signature:
+                if self ^ key_signature:
+                    accidental = self.accidentals_symbols(clef)
+            else:
+                accidental = self.accidentals_symbols(clef, with_natural=False)
+            note_on_staff = chr(NOTES_START + self.font_offset_number(clef))
+            return accidental + note_on_staff
+        ret = str(self)
+        if not octave:
+            return ret[:-2]  # Remove two chars for the space and octave number
+        return ret
+    
+    def get_sharp_flat(self) -> int:
+        """
+        Gets the number of sharps/flats, negative if flats.
+        
+        Returns:
+            int: said number
+        """
+        if not self.sharp_flat:
+            return 0
+        return len(self.sharp_flat) * pm_bool(self.sharp_flat[0] == SHARP)
+    
+    def midi_number(self) -> int:
+        """
+        Gets the MIDI note number of the note, i.e. the number of half steps up
+            from C-1, so that middle-C (C4) is 60.  As in up_by, octave numbers
+            change at C, so B#3 is the same pitch as C4.
+        
+        Returns:
+            int: said number
+        """
+        return (
+            (self.octave + 1) * HALF_STEPS_PER_OCTAVE
+            + LETTER_HALF_STEPS[self.letter]
+            + self.get_sharp_flat()
+        )
+    
+    def up_by(self, half_steps: int, scale_length: int) -> Note:
+        """
+        Get the note half_steps higher than this note.
+        
+        Args:
+            half_steps (int): The number of half steps up from this one that the
+                note to get is.
+            scale_length (int): The length of the scale (excluding the octave),
+                used to determine behaviour regarding whether to always go up by
+                    exactly one letter name.
+        
+        Returns:
+            Note: The next note in the scale.
+        """
+        if not 1 <= half_steps <= 3:
+            raise ValueError(f"BadSizedScaleJumpError: {half_steps}")
+        temp_letter = self.letter
+        temp_sharp_flat_num = self.get_sharp_flat() + half_steps
+        temp_octave = self.octave
+        
+        match scale_length:
+            case 5:   # Pentatonic
+                pass
+            case 6:   # Whole Tone
+                pass
+            case 7:   # Most western scales
+                temp_letter = get_next_letter(self.letter)
+                temp_sharp_flat_num -= 1 if self.letter in ['B', 'E'] else 2
+                temp_octave += 1 if self.letter == 'B' else 0
+            case 8:   # I can't remember what this one's called, but it's WHx4.
+                pass
+            case 12:  # Chromatic
+                pass
+            case _:
+                pass
+        
+        temp_sharp_flat = SHARP*temp_sharp_flat_num + FLAT*-temp_sharp_flat_num
+        return Note(f"{temp_letter}{temp_sharp_flat}{temp_octave}")
+
+
+CLEFS = {
+    "Bass":          Clef("Bass",          '\uE0A9', Note("C2"),
+                          [False, True, False, False, True, False],
+                          [False, True, False, True, False, True]
+                          ),
+    "Treble":        Clef("Treble",        '\uE0AE', Note("A3"),
+                          [False, True, False, False, True, False],
+                          [False, True, False, True, False, True]
+                          ),
+    "Baritone":      Clef("Baritone",      '\uE0AB', Note("E2"),
+                          [True, False, True, False, False, True],
+                          [True, False, True, False, True, False]
+                          ),
+    "Tenor":         Clef("Tenor",         '\uE0AD', Note("G2"),
+                          [True, False, True, False, True, False],
+                          [False, True, False, True, False, True]
+                          ),
+    "Alto":          Clef("Alto",          '\uE0AF', Note("B2"),
+                          [False, True, False, False, True, False],
+                          [False, True, False, True, False, True]
+                          ),
+    "Mezzo-Soprano": Clef("Mezzo-Soprano", '\uE0AA', Note("D3"),
+                          [False, True, False, True, False, True],
+                          [True, False, True, False, True, False]
+                          ),
+    "Soprano":       Clef("Soprano",       '\uE0AC', Note("F3"),
+                          [True, False, True, False, True, False],
+                          [True, False, True, False, True, False]
+                          )
+}
+
+CLEF_SYMBOLS_NAMES = {clef.symbol: name for name, clef in CLEFS.items()}
+
+# Where the key signatures' first sharp and flat can go: the staff, and the
+# space just above or below it (note numbers, as from Note.font_offset_number)
+KEY_SIGNATURE_LOWEST = LEDGER_LINES
+KEY_SIGNATURE_HIGHEST = LEDGER_LINES + STAFF_LINES + STAFF_SPACES + 1
+# How many letters each step in Clef.sharps_pattern and Clef.flats_pattern
+# moves, for True and False
+SHARPS_STEPS = {True: 4, False: -3}  # Up a 5th, down a 4th
+FLATS_STEPS = {True: -4, False: 3}  # Down a 5th, up a 4th
+KEY_SIGNATURE_RANGE = range(-LETTERS_PER_OCTAVE, LETTERS_PER_OCTAVE + 1)
+
+
+def key_signature_positions(clef: Clef, sharps_flats: int) -> [int]:
+    """
+    Finds where each accidental of a key signature goes on the staff, starting
+        from the F (for sharps) or B (for flats) that keeps the whole pattern
+        on the staff.
+    
+    Args:
+        clef (Clef): The clef the key signature is written in
+        sharps_flats (int): The number of sharps or flats in the key signature.
+            Positive for sharps, negative for flats.
+    
+    Returns:
+        list[int]: The note number of each accidental, in the order they're
+            written
+    """
+    if sharps_flats > 0:
+        first, pattern, steps = 'F', clef.sharps_pattern, SHARPS_STEPS
+    else:
+        first, pattern, steps = 'B', clef.flats_pattern, FLATS_STEPS
+    for octave in range(9, -1, -1):  # The highest one that fits
+        positions = [Note(f"{first}{octave}").font_offset_number(clef)]
+        for up in pattern:
+            positions.append(positions[-1] + steps[up])
+        if all(KEY_SIGNATURE_LOWEST <= position <= KEY_SIGNATURE_HIGHEST
+               for position in positions):
+            return positions[:abs(sharps_flats)]
+    raise Exception(f"KeySignatureDoesNotFitError: {clef.name}")
+
+
+def key_signature_glyphs(clef: Clef, sharps_flats: int) -> str:
+    """
+    Args:
+        clef (Clef): The clef the key signature is written in
+        sharps_flats (int): The number of sharps or flats in the key signature.
+            Positive for sharps, negative for flats.
+    
+    Returns:
+        str: The key signature in Game Font, to go after the clef; each
+            accidental is drawn over a blank staff spacer
+    """
+    if not sharps_flats:
+        return ""
+    start = ACCIDENTALS_START[SHARP if sharps_flats > 0 else FLAT]
+    return "".join(chr(start + position) + chr(start)
+                   for position in key_signature_positions(clef, sharps_flats))
+
+
+# Every key signature in every clef, made once here, so drawing a scale with
+# one is just a lookup
+KEY_SIGNATURES = {n: KeySignature(n) for n in KEY_SIGNATURE_RANGE}
+KEY_SIGNATURE_GLYPHS = {
+    (name, n): key_signature_glyphs(clef, n)
+    for name, clef in CLEFS.items() for n in KEY_SIGNATURE_RANGE
+}
+
+
+def sheet_music(pattern: [int], starts_on: Note, clef: Clef,
+                key_signature: KeySignature = KEY_SIGNATURES[0]) -> str:
+    """
+    Convert a scale to sheet music in Game Font.  This doesn't need any
+        DesignerObjects, so it can be used without a window.
+    
+    Args:
+        pattern (list[int]): The pattern of the scale, in half steps
+        starts_on (Note): The note to start on
+        clef (Clef): The clef to display the scale in
+        key_signature (KeySignature): The key signature to write after the
+            clef; notes it already covers don't get their own accidentals.
+            By default, none.
+    
+    Returns:
+        str: The sheet music scale
+    """
+    this_note = starts_on
+    disp_text = clef.symbol
+    disp_text += KEY_SIGNATURE_GLYPHS[clef.name, key_signature.sharps_flats]
+    for up_by in pattern + [2]:  # The 2 is just so it runs again
+        disp_text += this_note.string_form(clef, key_signature)
+        this_note = this_note.up_by(up_by, len(pattern))
+    return disp_text
+
+
+def scale_notes(pattern: [int], starts_on: Note) -> [Note]:
+    """
+    Walks up a scale from its first note to its octave, as __repr__ does.
+    
+    Args:
+        pattern (list[int]): The pattern of the scale, in half steps
+        starts_on (Note): The note to start on
+    
+    Returns:
+        list[Note]: Every note of the scale, including the octave
+    """
+    notes = [starts_on]
+    for up_by in pattern:
+        notes.append(notes[-1].up_by(up_by, len(pattern)))
+    return notes
+
+
+def scale_midi_numbers(scale_key: str, starts_on: str) -> [int]:
+    """
+    Gets the pitches of a scale by walking up it with Note.up_by, the same way
+        that the scale is drawn.
+    
+    Args:
+        scale_key (str): The key for the type of scale
+        starts_on (str): The name of the note to start on, e.g. Eb4
+    
+    Returns:
+        list[int]: The MIDI note number of each note, up to the octave
+    """
+    pattern = [int_from_pattern(c) for c in SCALE_TYPE_INFO[scale_key].pattern]
+    notes = scale_notes(pattern, Note(starts_on))
+    return [note.midi_number() for note in notes]
+
+
+def note_names(pattern: [int], starts_on: Note) -> str:
+    """
+    Convert a scale to text as simply a list of notes without octaves, as
+        Scale.__repr__ does, so that it can be shown without Game Font.
+    
+    Args:
+        pattern (list[int]): The pattern of the scale, in half steps
+        starts_on (Note): The note to start on
+    
+    Returns:
+        str: The notes of the scale, separated by spaces
+    """
+    this_note = starts_on
+    disp_text = starts_on.string_form()
+    for up_by in pattern:
+        disp_text += " "
+        this_note = this_note.up_by(up_by, len(pattern))
+        disp_text += this_note.string_form()
+    return disp_text
+
+
+def scale_key_signature(scale_type: ScaleInfo, starts_on: Note) -> int:
+    """
+    Args:
+        scale_type (ScaleInfo): The type of scale
+        starts_on (Note): The note the scale starts on
+    
+    Returns:
+        int: The number of sharps or flats in the key signature that the scale
+            is written with.  Positive for sharps, negative for flats.
+    """
+    pattern = [int_from_pattern(c) for c in scale_type.signature_pattern]
+    return sum(note.get_sharp_flat()
+               for note in scale_notes(pattern, starts_on)[:-1])
+
+
+# The key signature of every type of scale from every note it can start on
+# (without the octave, which doesn't change it), made once here
+SCALE_KEY_SIGNATURES = {
+    scale_key: {
+        start: scale_key_signature(scale_type, Note(f"{start}4"))
+        for start in scale_type.possible_starts_octaveless
+    }
+    for scale_key, scale_type in SCALE_TYPE_INFO.items()
+}
+
+
+def exercise_key_signature(exercise: Exercise) -> KeySignature:
+    """
+    Args:
+        exercise (Exercise): The exercise
+    
+    Returns:
+        KeySignature: The key signature that the exercise's scale is written
+            with
+    """
+    scale_key, _, starts_on = exercise
+    return KEY_SIGNATURES[SCALE_KEY_SIGNATURES[scale_key][starts_on[:-1]]]
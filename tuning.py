@@ -0,0 +1,277 @@
+"""
+Tunes the difficulty by playing lots of simulated games with bot players,
+    across a process pool, over a grid of Difficulty parameters.
+
+Usage: python tuning.py [--grid spawn_midpoint=30,50,70 ...]
+                        [--bots beginner,intermediate,expert]
+                        [--sessions 50] [--minutes 3] [--json report.json]
+    Any field of simulation.Difficulty can be put in the grid.
+"""
+import json
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict, fields, replace
+from itertools import product
+from random import Random
+from statistics import mean, pstdev
+from time import perf_counter
+from theory import SCALE_TYPE_INFO
+from config import Settings
+from rules import FPS
+from simulation import Simulation, Difficulty
+
+SESSIONS_PER_CELL = 50
+SESSION_MINUTES = 3
+
+
+@dataclass(frozen=True)
+class BotProfile:
+    name: str
+    reaction_frames: float  # How long it takes, on average, to read a scale
+    reaction_spread: float  # The standard deviation of that
+    accuracy: float  # The chance of naming the scale right
+
+
+BOT_PROFILES = {
+    "beginner":     BotProfile("beginner",     150, 50, .6),
+    "intermediate": BotProfile("intermediate",  90, 30, .8),
+    "expert":       BotProfile("expert",        45, 15, .95),
+}
+
+
+class Bot:
+    profile: BotProfile
+    rng: Random
+    target: int | None = None  # The key of the boulder being read
+    ready_at: int = 0  # The frame when the bot will have read it
+    
+    def __init__(self, profile: BotProfile, rng: Random):
+        """
+        Constructor for Bot.
+        
+        Args:
+            profile (BotProfile): How fast and how accurate the bot is
+            rng (Random): Where to get random numbers from
+        """
+        self.profile = profile
+        self.rng = rng
+    
+    def reaction(self) -> int:
+        """
+        Returns:
+            int: How many frames it'll take to read a scale this time
+        """
+        return max(1, round(self.rng.gauss(self.profile.reaction_frames,
+                                           self.profile.reaction_spread)))
+    
+    def act(self, simulation: Simulation):
+        """
+        Plays one frame: reads the lowest boulder on screen (starting again if
+            a different one becomes the lowest), selects it, and guesses once it
+            has finished reading it.  After a wrong guess it reads it again.
+        
+        Args:
+            simulation (Simulation): The game to play
+        """
+        onscreen = [b for b in simulation.boulders.values() if b.y > 0]
+        if not onscreen or simulation.paused:
+            self.target = None
+            return
+        lowest = max(onscreen, key=lambda b: b.y)
+        if lowest.x != self.target:
+            self.target = lowest.x
+            self.ready_at = simulation.frame + self.reaction()
+        if simulation.frame < self.ready_at:
+            return
+        
+        for _ in range(len(simulation.boulders)):
+            if simulation.selected == self.target:
+                break
+            simulation.press('right')
+        right_key = lowest.exercise[0]
+        if self.rng.random() < self.profile.accuracy:
+            simulation.press(right_key)
+            return
+        right_pattern = SCALE_TYPE_INFO[right_key].pattern
+        wrong_keys = sorted({
+            exercise[0] for exercise in simulation.sampler.exercises
+            if SCALE_TYPE_INFO[exercise[0]].pattern != right_pattern
+        })
+        if wrong_keys:
+            simulation.press(self.rng.choice(wrong_keys))
+        self.ready_at = simulation.frame + self.reaction()
+
+
+SETTINGS: Settings = None  # Set in each worker process by init_worker
+
+
+def init_worker(config: dict):
+    """
+    Loads the settings once in each worker process, rather than sending them
+        with every game.
+    
+    Args:
+        config (dict): The settings, as saved in .config.json
+    """
+    global SETTINGS
+    SETTINGS = Settings(**config)
+
+
+def play(task: tuple[Difficulty, BotProfile, int, int]) -> dict[str, float]:
+    """
+    Plays one simulated game.
+    
+    Args:
+        task (tuple[Difficulty, BotProfile, int, int]): The difficulty, the
+            bot, the seed, and how many frames to play for
+    
+    Returns:
+        dict[str, float]: How the game went
+    """
+    difficulty, profile, seed, frames = task
+    rng = Random(seed)
+    simulation = Simulation(SETTINGS, rng, difficulty=difficulty)
+    bot = Bot(profile, rng)
+    peak_score = 0.
+    for _ in range(frames):
+        simulation.step()
+        bot.act(simulation)
+        peak_score = max(peak_score, simulation.score)
+    return {
+        "score": simulation.score,
+        "peak_score": peak_score,
+        "landed": simulation.landed,
+        "correct": simulation.correct_guesses,
+        "wrong": simulation.wrong_guesses,
+    }
+
+
+def sweep(grid: dict[str, list[float]],
+          bots: [BotProfile],
+          sessions: int = SESSIONS_PER_CELL,
+          minutes: float = SESSION_MINUTES,
+          settings: Settings = None,
+          processes: int = None
+          ) -> list[dict]:
+    """
+    Plays `sessions` games for every combination of grid values and bots,
+        spread across a pool of processes.
+    
+    Args:
+        grid (dict[str, list[float]]): The values to try for each Difficulty
+            field; fields that aren't given keep their defaults
+        bots (list[BotProfile]): The bots to play with
+        sessions (int): How many games to play per combination
+        minutes (float): How long each game lasts
+        settings (Settings): The settings to play with, by default loaded from
+            .config.json
+        processes (int): How many processes to use, by default one per CPU
+    
+    Returns:
+        list[dict]: One summary per combination
+    """
+    settings = settings if settings is not None else Settings.load()
+    frames = int(minutes * 60 * FPS)
+    cells = [
+        (replace(Difficulty(), **dict(zip(grid, values))), bot)
+        for values in product(*grid.values())
+        for bot in bots
+    ]
+    tasks = [
+        (difficulty, bot, seed, frames)
+        for difficulty, bot in cells
+        for seed in range(sessions)
+    ]
+    with ProcessPoolExecutor(processes, initializer=init_worker,
+                             initargs=(asdict(settings),)) as pool:
+        results = list(pool.map(play, tasks, chunksize=max(1, sessions // 4)))
+    
+    report = []
+    for i, (difficulty, bot) in enumerate(cells):
+        games = results[i * sessions:(i + 1) * sessions]
+        guesses = sum(game["correct"] + game["wrong"] for game in games)
+        report.append({
+            "parameters": {name: getattr(difficulty, name) for name in grid},
+            "bot": bot.name,
+            "sessions": sessions,
+            "score_mean": mean(game["score"] for game in games),
+            "score_sd": pstdev(game["score"] for game in games),
+            "peak_score_mean": mean(game["peak_score"] for game in games),
+            "landed_per_minute": mean(game["landed"] for game in games)
+                                 / minutes,
+            "correct_per_minute": mean(game["correct"] for game in games)
+                                  / minutes,
+            "accuracy": sum(game["correct"] for game in games)
+                        / max(1, guesses),
+        })
+    return report
+
+
+def format_table(report: list[dict]) -> str:
+    """
+    Args:
+        report (list[dict]): The report from sweep()
+    
+    Returns:
+        str: The report as a table, one row per combination
+    """
+    columns = ["score_mean", "score_sd", "peak_score_mean",
+               "landed_per_minute", "correct_per_minute", "accuracy"]
+    lines = [f"{'parameters':<40}{'bot':<14}" + "".join(
+        f"{column:>20}" for column in columns
+    )]
+    for row in report:
+        parameters = ", ".join(f"{k}={v}" for k, v in row["parameters"].items())
+        lines.append(f"{parameters or 'defaults':<40}{row['bot']:<14}" + "".join(
+            f"{row[column]:>20.2f}" for column in columns
+        ))
+    return "\n".join(lines)
+
+
+def parse_grid(specs: [str]) -> dict[str, list[float]]:
+    """
+    Args:
+        specs (list[str]): Things like "spawn_midpoint=30,50,70"
+    
+    Returns:
+        dict[str, list[float]]: The values to try for each Difficulty field
+    """
+    types = {f.name: f.type for f in fields(Difficulty)}
+    grid = {}
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        if name not in types:
+            raise ValueError(f"UnknownDifficultyParameterError: {name}")
+        convert = int if types[name] in (int, "int") else float
+        grid[name] = [convert(value) for value in values.split(",")]
+    return grid
+
+
+def main():
+    """ Runs a sweep from the command line and prints the report. """
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--grid", nargs="*", default=[],
+                        help="e.g. spawn_midpoint=30,50,70 speed_exponent=.8,1")
+    parser.add_argument("--bots", default=",".join(BOT_PROFILES))
+    parser.add_argument("--sessions", type=int, default=SESSIONS_PER_CELL)
+    parser.add_argument("--minutes", type=float, default=SESSION_MINUTES)
+    parser.add_argument("--processes", type=int)
+    parser.add_argument("--json", help="also write the report here as JSON")
+    args = parser.parse_args()
+    
+    bots = [BOT_PROFILES[name] for name in args.bots.split(",")]
+    start = perf_counter()
+    report = sweep(parse_grid(args.grid), bots, args.sessions, args.minutes,
+                   processes=args.processes)
+    elapsed = perf_counter() - start
+    print(format_table(report))
+    games = sum(row["sessions"] for row in report)
+    print(f"{games} games of {args.minutes} minutes in {elapsed:.1f}s "
+          f"({games / elapsed * 60:.0f} games per minute)")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,145 +1,20 @@
-from typing import Union, Any
-from collections.abc import Iterable, Callable
+from typing import Any
+from collections.abc import Callable
 from dataclasses import dataclass
 from designer import *
-import random
-
-
-def pm_bool(b: bool) -> int:
-    """
-    Converts a boolean to +-1
-    Returns `1` if b is True, `-1` if b is False
-    
-    Args:
-        b (bool): The boolean to be converted
-
-    Returns:
-        int: Either 1 or -1, depending on b
-    """
-    return b * 2 - 1
-
-
-def int_from_pattern(pattern_char: str) -> int:
-    """
-    Takes in a char from a scale pattern and returns an integer that's more
-        useful.
-        
-    Args:
-        pattern_char (str): The single character to convert
-
-    Returns:
-        int: The converted value
-    """
-    match pattern_char:
-        case 'H':
-            return 1
-        case 'W':
-            return 2
-        case '3':
-            return 3
-        case _:
-            return 0
-
-
-def ensure_octave(pattern: [int]) -> bool:
-    """
-    Ensures that the input scale pattern fits exactly in an octave.
-    
-    Args:
-        pattern (list[int]): The scale pattern to evaluate.
-
-    Returns:
-        bool: Whether it's a valid scale.
-    """
-    return sum(pattern) == 12
-
-
-def get_next_letter(letter: str) -> str:
-    """
-    Gets the next letter in the musical alphabet.
-    
-    Args:
-        letter (str): The letter to increase from.
-
-    Returns:
-        str: The next letter.
-    """
-    num = ord(letter) - ord('A') + 1
-    num = num % 7
-    return chr(num + ord('A'))
-
-
-def cmp(a, b) -> int:
-    """
-    Returns:
-        int: 0 if a and b are the same, -1 if a < b, 1 if a > b
-    """
-    return (a > b) - (a < b)
-
-
-def ensure_version(actual: str, required: str) -> bool:
-    """
-    Tests if the version of a program/module is high enough.
-    
-    Args:
-        actual (str): The actual version that we're testing
-        required (str): The minimum version that we're testing against
-
-    Returns:
-        bool: Whether the program/module is new enough
-    """
-    return (
-            tuple(map(int, (actual.split("."))))
-            >=
-            tuple(map(int, (required.split("."))))
-    )
-
-
-def boulder_speed(score: float, base_speed: int) -> float:
-    """
-    Finds the speed with which to move the boulders down, given the player's
-        current score.
-    
-    Args:
-        score (int): The player's score
-        base_speed (int): The base speed of the boulders, when the score is less
-            than 1
-
-    Returns:
-        int: The speed for the boulders
-    """
-    if score < 1:
-        return base_speed
-    return base_speed * (1 + ((score - 1) / 30) ** .9)
-
-
-@dataclass
-class MatchIter:
-    value: Iterable
-    
-
-class MatchStr(str):
-    def __eq__(self, match_list: Union[Iterable, str]) -> bool:
-        """
-        Checks if the value of the MatchStr is in the list, or if it is equal to
-            the string.
-        
-        Args:
-            match_list (Iterable or str): The list or string to check against
-
-        Returns:
-            bool: Whether the value of the MatchStr is in the list or is equal
-                to the string
-        """
-        if isinstance(match_list, str):
-            return match_list.__eq__(self)
-        else:
-            return self in list(match_list)
+from layout import current_layout
 
 
 GAME_FONT_PATH = "resources/Game Font.ttf"
 GAME_FONT_NAME = "Game Font"
 TEXT_FONT_NAME = "Times New Roman"
+# Every font used, by name and path, with the sizes it's used at in an 800 by
+# 600 window (including the settings menu's, at 70%), to load before the game
+# starts
+FONT_SIZES = {
+    (GAME_FONT_NAME, GAME_FONT_PATH): [28, 30, 48, 60],
+    (TEXT_FONT_NAME, None): [20, 24, 28, 36, 28 * .7, 36 * .7],
+}
 
 
 @dataclass
@@ -174,7 +49,7 @@ class MenuEntry:
                 `do`.  These will come after the arguments specified when the
                 MenuEntry was created.
             **kwargs: Any more keyword arguments that need to be passed into `do`
-
+        
         Returns:
             Whatever `do` returns, if anything
         """
@@ -201,16 +76,17 @@ class Menu:
         Takes care of the actual initialisation of the Menu, i.e. creating the
             display of it.
         """
+        layout = current_layout()
         if self.left:
-            x = self.margin_left
+            x = layout.px(self.margin_left)
             anchor = 'midleft'
         else:
             x = get_width() / 2
             anchor = 'center'
         
         self.menu_label = text(
-            "black", self.header, self.resize(36),
-            x, self.resize(40) + self.margin_top, anchor,
+            "black", self.header, self.font_size(36),
+            x, self.resize(40) + layout.px(self.margin_top), anchor,
             font_name=TEXT_FONT_NAME
         )
         
@@ -220,11 +96,12 @@ class Menu:
         for i, menu_entry in enumerate(self.entries):
             self.menu_text.append(text(
                 "black", f"{i + 1}. {menu_entry.label}",
-                self.resize(28),
-                x, self.resize(100 + 50 * i) + self.margin_top, anchor,
+                self.font_size(28),
+                x, self.resize(100 + 50 * i) + layout.px(self.margin_top),
+                anchor,
                 font_name=self.body_font[0], font_path=self.body_font[1]
             ))
-
+    
     def select(self, key: str, *args, **kwargs) -> bool:
         """
         Called when the user tries to select an option from the list.
@@ -235,7 +112,7 @@ class Menu:
                 function of the MenuEntry chosen, beyond those specified when it
                 was created.
             **kwargs: Any more key word arguments, as described above for *args
-
+        
         Returns:
             bool: Whether the key pressed successfully chose an option
         """
@@ -250,15 +127,40 @@ class Menu:
     
     def resize(self, value: int) -> int:
         """
-        Used to resize a height, width, or location value based on size_percent.
+        Used to resize a height, width, or location value based on size_percent,
+            and on the size of the window.
         
         Args:
-            value (int): The value to be resized
-
+            value (int): The value to be resized, in an 800 by 600 window
+        
         Returns:
             int: The resized value
         """
-        return value * self.size_percent // 100
+        return current_layout().px(value * self.size_percent / 100)
+    
+    def font_size(self, size: int) -> int:
+        """
+        Resizes a font size, as resize() does other sizes.
+        
+        Args:
+            size (int): The font size, in an 800 by 600 window
+        
+        Returns:
+            int: The resized font size
+        """
+        return current_layout().font_size(size * self.size_percent / 100)
+    
+    def set_visible(self, visible: bool):
+        """
+        Shows or hides all of the DesignerObjects of the menu, so that it can
+            be reused instead of being destroyed and made again.
+        
+        Args:
+            visible (bool): Whether the menu should be shown
+        """
+        set_visible(self.menu_label, visible)
+        for text_ in self.menu_text:
+            set_visible(text_, visible)
     
     def destroy(self):
         """ Destroys all of the DesignerObjects of the menu. """
@@ -273,27 +175,159 @@ def ignore_numpad(key: str) -> str:
     
     Args:
         key (str): The key pressed
-
+    
     Returns:
         str: The key pressed, ignoring if it was on the number pad
     """
     return str(key).replace("[", "").replace("]", "")
 
 
-def choice(iterable: Iterable):
+@dataclass
+class WarmScene:
+    scene: Any  # designer's Scene, with everything on it, kept between visits
+    is_stale: Callable[[], bool]  # Whether it has to be made again instead
+    reset: Callable[[], None]  # Gets it ready for another visit
+
+
+WARM_SCENES: dict[str, WarmScene] = {}
+
+
+def keep_warm(name: str, is_stale: Callable[[], bool],
+              reset: Callable[[], None]):
     """
-    Takes in any iterable, converts it to list and runs choice on that.
+    Keeps the scene that's starting, so that push_warm_scene() can go back to
+        it later without making it again.  Called by a scene's starting
+        handler.
     
     Args:
-        iterable (Iterable): Any Iterable from which to get a random element
-        
-    Returns:
-        A random element of iterable
+        name (str): The name of the scene
+        is_stale (Callable[[], bool]): Says whether what the scene was made
+            for, e.g. the settings, has changed, so that it has to be made
+            again
+        reset (Callable[[], None]): Gets the scene's game state ready for
+            another visit
+    """
+    import designer
+    WARM_SCENES[name] = WarmScene(designer.GLOBAL_DIRECTOR.current_scene,
+                                  is_stale, reset)
+
+
+WARM_CHANGE = "warm"  # The kind of scene change push_warm_scene() asks for
+
+
+def push_warm_scene(name: str):
+    """
+    Goes to a scene, as push_scene() does, except that if the scene has been
+        visited before and isn't stale, it's put back as it was left, with
+        only its game state reset, instead of its starting handler making
+        everything on it again.  Like push_scene(), it only asks for the
+        change, which designer makes after the frame.
+    
+    Args:
+        name (str): The name of the scene
+    """
+    import designer
+    warm = WARM_SCENES.get(name)
+    if warm is not None and warm.is_stale():
+        del WARM_SCENES[name]
+        warm = None
+    if warm is None:
+        push_scene(name)
+        return
+    director = designer.GLOBAL_DIRECTOR
+    if "_do_scene_change" not in vars(director):
+        # Designer makes each change with the director's _do_scene_change(),
+        # so it's wrapped to make warm changes too
+        make_change = director._do_scene_change
+        director._do_scene_change = \
+            lambda *change: do_scene_change(make_change, *change)
+    director._scene_changed = (WARM_CHANGE, name, {})
+
+
+def do_scene_change(make_change: Callable[[str, str, dict], None],
+                    change_type: str, scene_name: str, kwargs: dict):
+    """
+    Makes a scene change, as designer's director does after a frame, putting
+        a warm scene back if push_warm_scene() asked for one.
+    
+    Args:
+        make_change (Callable[[str, str, dict], None]): The director's own
+            _do_scene_change(), for every other kind of change
+        change_type (str): "push", "pop", "replace", or WARM_CHANGE
+        scene_name (str): The name of the scene to go to
+        kwargs (dict): Passed on to the scenes' handlers
+    """
+    if change_type != WARM_CHANGE:
+        make_change(change_type, scene_name, kwargs)
+        return
+    import designer
+    import pygame
+    from designer.core.event import Event, handle
+    director = designer.GLOBAL_DIRECTOR
+    warm = WARM_SCENES[scene_name]
+    # As a push does, but with the old scene instead of a new one
+    old_scene = director.current_scene
+    old_scene._handle_event("director.scene.exit",
+                            Event(world=old_scene._game_state,
+                                  scene=old_scene, **kwargs))
+    director._switch_scene()
+    director._scenes.append(warm.scene)
+    director.scene_name = scene_name
+    warm.reset()  # Anything it makes has to go on the scene, so it's after
+    handle("director.scene.enter",
+           event=Event(world=warm.scene._game_state, scene=warm.scene,
+                       **kwargs))
+    pygame.event.get()  # So the key that chose the scene isn't seen again
+    director._scene_changed = True
+
+
+def start_headless(window: bool = False):
     """
-    return random.choice(list(iterable))
+    Sets designer up so that DesignerObjects can be made, moved and destroyed
+        without calling start(), so that tools can run the game's handlers
+        themselves, one frame at a time.
     
+    Args:
+        window (bool): Whether to show a window.  By default, False, in which
+            case nothing is shown, but everything is still drawn.
+    """
+    import os
+    import designer
+    if not window:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    designer.check_initialized()
+    designer.GLOBAL_DIRECTOR.running = True
 
-GUTTER = 200  # How far away from the right to put the score and other info
+
+def render_frame(world: Any):
+    """
+    Draws a frame in the same way as designer's main loop does.  Only works
+        after start_headless().
+    
+    Args:
+        world: The game state, passed on to anything drawing itself
+    """
+    import designer
+    from designer.core.event import Event
+    scene = designer.GLOBAL_DIRECTOR.current_scene
+    scene._handle_event("director.pre_render")
+    scene._handle_event("director.render", Event(world=world))
+    scene._draw()
+    scene._handle_event("director.post_render")
+
+
+def apply_scene_change():
+    """
+    Does the scene change that push_scene(), pop_scene() or change_scene() asked
+        for, as designer's main loop does after each frame, so that the new
+        scene's starting handler runs.  Only works after start_headless().
+    """
+    import designer
+    director = designer.GLOBAL_DIRECTOR
+    if director._scene_changed:
+        director._do_scene_change(*director._scene_changed)
+        director._scene_changed = False
 
 
 def make_scale_keys_text(scale_names: [str]) -> [DesignerObject]:
@@ -302,21 +336,22 @@ def make_scale_keys_text(scale_names: [str]) -> [DesignerObject]:
     
     Args:
         scale_names (list[str]): The list of names of scale type
-
+    
     Returns:
         list[DesignerObject]: A list of DesignerObjects displaying which keys to
             press for which scale type.
     """
-    from scale import SCALE_TYPE_KEYS
+    from theory import SCALE_TYPE_KEYS
     scale_keys_strs = [
         f"{SCALE_TYPE_KEYS[scale_type_name]}: {scale_type_name}"
         for scale_type_name in scale_names
     ]
+    layout = current_layout()
     scale_keys_text = []
     for i, scale_keys_str in enumerate(scale_keys_strs):
         scale_keys_text.append(
-            text('black', scale_keys_str, 20,
-                 get_width() - GUTTER, 80 + 40 * i, anchor="midleft",
-                 font_name=TEXT_FONT_NAME)
+            text('black', scale_keys_str, layout.font_size(20),
+                 get_width() - layout.gutter, layout.px(80 + 40 * i),
+                 anchor="midleft", font_name=TEXT_FONT_NAME)
         )
     return scale_keys_text
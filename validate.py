@@ -0,0 +1,247 @@
+"""
+Checks every exercise the game could ever draw, so that a change to the tables
+    in theory.py can't quietly put a note off the edge of Game Font or spell
+    one with accidentals that the font draws on top of each other.  Every
+    scale type, clef and ledger line setting is tried, with and without key
+    signatures, across a process pool; each scale is written out with
+    sheet_music() just as the game writes it, and each glyph is checked.
+    Each scale's note names, as the terminal shows them, are checked against
+    the pitches it plays, too.
+
+Usage: python validate.py [--processes N]
+    Prints each problem found, and exits with 1 if there were any, so it can
+    be run whenever the theory tables change.
+"""
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import groupby, product
+from time import perf_counter
+from config import Settings
+from helpers import int_from_pattern
+from theory import SCALE_TYPE_INFO, CLEFS, CLEF_SYMBOLS_NAMES, LEDGER_LINES, \
+    TOTAL_NOTES, NOTES_START, FLATS_START, NATURALS_START, SHARPS_START, \
+    KEY_SIGNATURES, SCALE_KEY_SIGNATURES, HALF_STEPS_PER_OCTAVE, Exercise, \
+    Note, sheet_music, note_names, scale_midi_numbers
+
+GLYPH_BLOCK = 0x20  # How many glyphs each block in the font has room for
+GLYPH_BLOCKS = {
+    NOTES_START: "note",
+    FLATS_START: "flat",
+    NATURALS_START: "natural",
+    SHARPS_START: "sharp",
+}
+# How many of each accidental in a row can be told apart; the font has no
+# width for them, so two sharps make a double sharp, but three sharps or two
+# flats look like fewer
+MOST_IN_A_ROW = {FLATS_START: 1, NATURALS_START: 1, SHARPS_START: 2}
+SPACER = 0  # The glyph in each accidental block with no accidental on it
+NOTE_NAME = re.compile(r"[A-G](b{0,2}|#{0,2})")
+
+
+@dataclass(frozen=True)
+class Cell:
+    scale_key: str
+    clef_name: str
+    low_ledgers: int
+    high_ledgers: int
+    
+    @property
+    def settings(self) -> Settings:
+        """
+        Returns:
+            Settings: Settings with just this cell's ledger lines, so that
+                Clef.all_notes can be used with the cell as the world
+        """
+        return Settings(
+            scale_types=[SCALE_TYPE_INFO[self.scale_key].name],
+            clefs=[self.clef_name],
+            max_sharps_key_signature=0,
+            max_flats_key_signature=0,
+            max_high_ledger_positions=self.high_ledgers,
+            max_low_ledger_positions=self.low_ledgers,
+        )
+    
+    def exercises(self) -> [Exercise]:
+        """
+        Returns:
+            list[Exercise]: Every exercise the game could pick in this cell,
+                as in ExerciseSampler.from_world
+        """
+        starts = (SCALE_TYPE_INFO[self.scale_key].possible_starts
+                  & CLEFS[self.clef_name].all_notes(self))
+        return [(self.scale_key, self.clef_name, start)
+                for start in sorted(starts)]
+
+
+@dataclass(frozen=True)
+class Problem:
+    exercise: Exercise
+    key_signatures: bool
+    message: str
+    
+    def __str__(self) -> str:
+        """
+        Returns:
+            str: The problem, e.g. "Major, Treble, Cb4, with key signatures:
+                2 flats in a row (the font draws them as 1)"
+        """
+        scale_key, clef_name, start = self.exercise
+        written = "with" if self.key_signatures else "without"
+        return (f"{SCALE_TYPE_INFO[scale_key].name}, {clef_name}, {start}, "
+                f"{written} key signatures: {self.message}")
+
+
+def glyph_problems(glyphs: str) -> [str]:
+    """
+    Checks a scale written in Game Font.  Past the clef, every glyph must be
+        one of the TOTAL_NOTES positions on the staff in one of the blocks in
+        GLYPH_BLOCKS, or an accidental block's spacer, and no accidental may
+        be repeated more times in a row than MOST_IN_A_ROW allows.
+    
+    Args:
+        glyphs (str): The scale, as from sheet_music()
+    
+    Returns:
+        list[str]: What's wrong with it, if anything
+    """
+    problems = []
+    if glyphs[:1] not in CLEF_SYMBOLS_NAMES:
+        problems.append(f"U+{ord(glyphs[0]):04X} isn't a clef")
+    for glyph, run in groupby(glyphs[1:]):
+        block = ord(glyph) - (ord(glyph) - NOTES_START) % GLYPH_BLOCK
+        position = ord(glyph) - block
+        if block not in GLYPH_BLOCKS or not (
+                1 <= position <= TOTAL_NOTES
+                or position == SPACER and block in MOST_IN_A_ROW):
+            problems.append(f"U+{ord(glyph):04X} is off the staff")
+            continue
+        in_a_row = len(list(run))
+        if in_a_row > MOST_IN_A_ROW.get(block, in_a_row):
+            problems.append(
+                f"{in_a_row} {GLYPH_BLOCKS[block]}s in a row (the font draws "
+                f"them as {MOST_IN_A_ROW[block]})"
+            )
+    return problems
+
+
+def name_problems(names: str, midi_numbers: [int]) -> [str]:
+    """
+    Args:
+        names (str): A scale's note names, as from note_names()
+        midi_numbers (list[int]): The scale's notes, as from
+            scale_midi_numbers()
+    
+    Returns:
+        list[str]: What's wrong with the names, if anything; each must be a
+            note name, spelling the same pitch class as the note it's for
+    """
+    spelt = names.split()
+    if len(spelt) != len(midi_numbers):
+        return [f"{len(spelt)} note names for {len(midi_numbers)} notes"]
+    problems = []
+    for name, midi_number in zip(spelt, midi_numbers):
+        if not NOTE_NAME.fullmatch(name):
+            problems.append(f"{name!r} isn't a note name")
+        elif (Note(f"{name}4").midi_number()
+              - midi_number) % HALF_STEPS_PER_OCTAVE:
+            problems.append(f"{name} is spelt for the wrong pitch (MIDI "
+                            f"note {midi_number})")
+    return problems
+
+
+def check(cell: Cell) -> [Problem]:
+    """
+    Writes out every exercise in a cell, with and without key signatures, and
+        checks them, and their note names.
+    
+    Args:
+        cell (Cell): The scale type, clef and ledger lines to check
+    
+    Returns:
+        list[Problem]: Everything wrong with the cell's exercises
+    """
+    pattern = [int_from_pattern(c)
+               for c in SCALE_TYPE_INFO[cell.scale_key].pattern]
+    clef = CLEFS[cell.clef_name]
+    problems = []
+    for exercise in cell.exercises():
+        start = exercise[2]
+        problems += [Problem(exercise, False, message) for message
+                     in name_problems(note_names(pattern, Note(start)),
+                                      scale_midi_numbers(cell.scale_key,
+                                                         start))]
+        for key_signatures in (False, True):
+            key_signature = KEY_SIGNATURES[0]
+            if key_signatures:
+                sharps_flats = SCALE_KEY_SIGNATURES[cell.scale_key][start[:-1]]
+                if sharps_flats not in KEY_SIGNATURES:
+                    problems.append(Problem(
+                        exercise, key_signatures,
+                        f"no key signature has {abs(sharps_flats)} "
+                        f"{'sharps' if sharps_flats > 0 else 'flats'}"
+                    ))
+                    continue
+                key_signature = KEY_SIGNATURES[sharps_flats]
+            try:
+                glyphs = sheet_music(pattern, Note(start), clef, key_signature)
+            except Exception as e:
+                problems.append(Problem(exercise, key_signatures, str(e)))
+                continue
+            problems += [Problem(exercise, key_signatures, message)
+                         for message in glyph_problems(glyphs)]
+    return problems
+
+
+def cells() -> [Cell]:
+    """
+    Returns:
+        list[Cell]: Every scale type, clef, and number of ledger lines below
+            and above the staff
+    """
+    ledgers = range(LEDGER_LINES + 1)
+    return [Cell(*cell) for cell in product(SCALE_TYPE_INFO, CLEFS,
+                                            ledgers, ledgers)]
+
+
+def validate(processes: int = None) -> tuple[int, list[Problem]]:
+    """
+    Checks every cell, spread across a pool of processes.
+    
+    Args:
+        processes (int): How many processes to use, by default one per CPU
+    
+    Returns:
+        tuple[int, list[Problem]]: How many exercises were checked (counting
+            each cell separately), and every different problem found; fewer
+            ledger lines only ever take exercises away, so a problem is only
+            listed once, however many cells it's in
+    """
+    all_cells = cells()
+    with ProcessPoolExecutor(processes) as pool:
+        results = list(pool.map(check, all_cells, chunksize=16))
+    checked = sum(len(cell.exercises()) for cell in all_cells)
+    problems = list(dict.fromkeys(
+        problem for result in results for problem in result
+    ))
+    return checked, problems
+
+
+def main():
+    """ Runs the checks from the command line. """
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--processes", type=int)
+    args = parser.parse_args()
+    start = perf_counter()
+    checked, problems = validate(args.processes)
+    for problem in problems:
+        print(problem)
+    print(f"{checked} exercises checked, with and without key signatures, "
+          f"in {perf_counter() - start:.1f}s: {len(problems)} problems")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
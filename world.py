@@ -1,16 +1,34 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
 from designer import *
+import os
+import random
 from random import random as rand
 from dataclasses import dataclass, field
 from boulder import Boulder
-from settings import Settings
-from useful import pm_bool, int_from_pattern, MatchStr, MatchIter, \
-    GAME_FONT_PATH, GAME_FONT_NAME, make_scale_keys_text, GUTTER
-from scale import SCALE_TYPE_INFO, SCALE_TYPE_KEYS
+from boulder_store import BoulderStore, SLOT_MASK
+from config import Settings
+from sampler import ExerciseSampler
+from history import SessionRecord, settings_key, player_name, submit
+from snapshot import Snapshot, BoulderState, SNAPSHOT_PATH, sampler_stats, \
+    restore_sampler_stats
+from helpers import pm_bool, int_from_pattern, MatchStr, MatchIter
+from useful import GAME_FONT_PATH, GAME_FONT_NAME, make_scale_keys_text, \
+    keep_warm
+from layout import Layout, current_layout
+from rules import BOULDER_SCALE, BOULDER_BASE_SPEED, FAILED_BOULDER_PENALTY, \
+    BOULDER_MAX_PROB, MAX_BOULDERS, boulder_probability, boulder_speed
+from theory import SCALE_TYPE_INFO, SCALE_TYPE_KEYS, scale_midi_numbers
+from profiling import Capture, profiled
+from governor import Governor, SCORE, SPAWNS, FADES, governed
+import collector
 
-FAILED_BOULDER_PENALTY = -5
-
-BOULDER_MAX_PROB = 2 ** -6
-MAX_BOULDERS = 4
+if TYPE_CHECKING:
+    from audio import ScalePlayer
+    from metrics import Metrics
+    from pack import PackSampler
+    from midi import MidiFileSource, MidiDeviceSource, ScaleMatcher
+    from pitch import WavFileSource, MicrophoneSource
 
 SCALE_KEYS = MatchIter(SCALE_TYPE_INFO)
 
@@ -19,11 +37,32 @@ SCALE_KEYS = MatchIter(SCALE_TYPE_INFO)
 class World:
     text_score: DesignerObject = None
     scale_keys_text: [DesignerObject] = None
-    boulders: dict[int, Boulder] = field(default_factory=dict)
+    boulders: dict[int, Boulder] = field(default_factory=dict)  # By id
+    store: BoulderStore = field(default_factory=BoulderStore)
     score: float = 0.
-    selected: int = 0  # The key of the selected boulder, its x-coordinate
+    selected: int = 0  # The id of the selected boulder, 0 if there isn't one
+    highlighted: int = 0  # The id of the boulder drawn as selected
     paused: bool = False
     settings: Settings = None
+    sampler: ExerciseSampler | PackSampler = None
+    max_boulders: int = MAX_BOULDERS
+    boulder_max_prob: float = BOULDER_MAX_PROB
+    boulder_scale: float = BOULDER_SCALE  # In an 800 by 600 window
+    layout: Layout = field(default_factory=current_layout)
+    player: ScalePlayer = None  # Only used in ear training mode
+    played: int = 0  # The id of the boulder whose scale was played last
+    session: SessionRecord = None  # What gets saved to the score history
+    # Only used when answering on a MIDI keyboard, or by singing or playing
+    # into a microphone, whose notes are matched in the same way
+    midi: MidiFileSource | MidiDeviceSource | WavFileSource \
+        | MicrophoneSource = None
+    matcher: ScaleMatcher = None
+    matching: int = 0  # The id of the boulder that matcher is matching
+    capture: Capture = None  # Only while profiling, from the debug hotkey
+    metrics: Metrics = None  # Only when telemetry is turned on
+    # Puts off work that can wait when frames are running late
+    governor: Governor = field(default_factory=Governor)
+    spawn_due: bool = False  # Whether a boulder is waiting to be made
     
     def __post_init__(self):
         """
@@ -34,60 +73,148 @@ class World:
             Initialises the world with no boulders and a score of 0.
         """
         self.settings = Settings.load()
+        self.boulder_scale *= self.layout.factor
+        self.new_game()
+        if self.settings.ear_training:
+            # Imported here, as only ear training needs the synthesiser
+            from audio import ScalePlayer
+            self.player = ScalePlayer()
         
         self.text_score = text(
-            'black', f"{self.score:.4}", 30,
-            get_width(), 20,
+            'black', f"{self.score:.4}", self.layout.font_size(30),
+            get_width(), self.layout.px(20),
             font_name=GAME_FONT_NAME, font_path=GAME_FONT_PATH)
+        scale_types = self.settings.scale_types
+        if self.settings.exercise_pack:
+            # The pack decides which types of scale come up, not the settings
+            scale_types = [SCALE_TYPE_INFO[key].name
+                           for key in self.sampler.pack.scale_types]
         scale_names = []
         for scale_name in SCALE_TYPE_KEYS:
-            if scale_name in self.settings.scale_types:
+            if scale_name in scale_types:
                 scale_names.append(scale_name)
         self.scale_keys_text = make_scale_keys_text(scale_names)
-        
+    
+    def new_game(self):
+        """
+        Gets everything ready that each game needs its own of: a sampler, so
+            that the exercises come up as in a new world, a session for the
+            score history, and the MIDI keyboard or microphone, which was
+            closed when the last game ended.
+        """
+        if self.settings.exercise_pack:
+            from pack import ExercisePack, PackSampler
+            pack = ExercisePack(self.settings.exercise_pack)
+            self.sampler = PackSampler(pack)
+        else:
+            self.sampler = ExerciseSampler.from_world(self)
+        self.session = SessionRecord(player_name(self.settings),
+                                     settings_key(self.settings))
+        if self.settings.midi_input:
+            from midi import open_source
+            self.midi = open_source(self.settings.midi_input)
+        elif self.settings.audio_input:
+            from pitch import open_source
+            self.midi = open_source(self.settings.audio_input)
+        if self.settings.metrics:
+            from metrics import start
+            self.metrics = start(self.settings.metrics)
+            self.metrics.new_game()
+            self.governor.metrics = self.metrics
+        collector.play(self.metrics)
+    
+    def begin(self):
+        """ Carries on with the suspended game if there is one, or starts. """
+        if os.path.exists(SNAPSHOT_PATH):
+            # Carry on with the game that was suspended, only once
+            self.restore(Snapshot.load(SNAPSHOT_PATH))
+            os.remove(SNAPSHOT_PATH)
+        else:
+            # self.boulders keeps it alive, so it doesn't need its own reference
+            Boulder(self)
+    
+    def is_stale(self) -> bool:
+        """
+        Returns:
+            bool: Whether the settings or the size of the window have changed
+                since the world was made, so that it has to be made again
+                instead of being reset
+        """
+        return (Settings.load() != self.settings
+                or current_layout() != self.layout)
+    
+    def reset(self):
+        """
+        Gets the world ready for another game when its scene is visited again,
+            throwing away what's left of the last game, but keeping the
+            DesignerObjects that every game shows.
+        """
+        for boulder in list(self.boulders.values()):
+            boulder.remove(self)
+        self.score = 0.
+        self.selected = self.highlighted = self.played = self.matching = 0
+        self.matcher = None
+        self.paused = False
+        self.spawn_due = False
+        self.new_game()
+        self.display_score()
+        self.begin()
+    
     def move_boulders_down(self):
         """
-        Loops through all of the boulders and moves them down.
+        Moves all of the boulders down at once in the store, then moves their
+            DesignerObjects to match.  Boulders still above the window have
+            none to move until they fall into it.
         """
-        for boulder in self.boulders.values():
-            boulder.move_down(self)
+        # Boulders take as long to fall, whatever the size of the window
+        speed = boulder_speed(self.score, BOULDER_BASE_SPEED) \
+            * self.layout.factor
+        self.store.move_down(speed)
+        ys = self.store.y
+        for boulder_id, boulder in self.boulders.items():
+            y = float(ys[boulder_id & SLOT_MASK])
+            if boulder.boulder is not None:
+                boulder.follow(y, speed)
+            elif boulder.in_view(self, y):
+                boulder.appear(self)
     
     def display_score(self):
         """
         Displays the score off to the side of the screen.  Run each frame
         """
         self.text_score.text = f"{self.score:.4}"
-        self.text_score.x = get_width() - (GUTTER - self.text_score.width//2)
+        self.text_score.x = get_width() - (self.layout.gutter
+                                           - self.text_score.width//2)
     
-    def sorted_onscreen_boulder_keys(self) -> [int]:
+    def set_selected(self, boulder_id: int):
         """
-        Gets a sorted list of the keys of the boulders that are below the top of
-            the game window.
+        Selects a boulder, fading out the one that was selected before, unless
+            the governor is putting fading off.
         
-        Returns:
-            list[int]: A sorted list of useful boulder keys
-        """
-        keys = sorted(list(self.boulders.keys()))
-        good_keys = []
-        for key in keys:
-            if self.boulders[key].boulder.y > 0:
-                good_keys.append(key)
-        return good_keys
+        Args:
+            boulder_id (int): The id of the boulder to select, or 0 for none
+        """
+        self.selected = boulder_id
+        self.store.select(boulder_id)
+        if self.governor.allows(FADES):
+            self.highlight()
     
-    def key_of_max_y_boulder(self) -> int:
+    def highlight(self):
         """
-        Gets the key of the boulder with the highest y-coordinate (lowest down
-            in the window).
-        
-        Returns:
-            int: The key of said boulder.
-        """
-        boulders = list(self.boulders.values())
-        max_y = boulders[0]
-        for boulder in boulders:
-            if boulder.boulder.y > max_y.boulder.y:
-                max_y = boulder
-        return max_y.boulder.x
+        Draws the selected boulder as selected, and the one that was drawn as
+            selected before as not.
+        """
+        if self.highlighted == self.selected:
+            return
+        # Boulders above the window are drawn as selected or not when they
+        # appear
+        unselected = self.boulders.get(self.highlighted)
+        if unselected is not None and unselected.boulder is not None:
+            unselected.boulder.alpha = .5
+        self.highlighted = self.selected
+        selected = self.boulders.get(self.selected)
+        if selected is not None and selected.boulder is not None:
+            selected.boulder.alpha = 1
     
     def select(self, right: bool):
         """
@@ -95,29 +222,31 @@ class World:
             if `right` is False (ignoring those above the window).
         If all of the boulders are above the window, always select the lowest.
         If there are no boulders, select the non-existent boulder at 0.
-
+        
         Args:
             right (bool): Whether to select the next to the right or to the left
         """
         if not self.boulders:
-            self.selected = 0
+            self.set_selected(0)
             return
         
-        good_sorted_keys = self.sorted_onscreen_boulder_keys()
-        if not good_sorted_keys:
-            self.selected = self.key_of_max_y_boulder()
+        good_sorted_ids = self.store.onscreen_sorted_by_x()
+        if not good_sorted_ids:
+            self.set_selected(self.store.lowest())
             return
         
+        selected_x = 0
+        if self.selected in self.store:
+            selected_x = int(self.store.x[self.store.slot(self.selected)])
         if right:
-            good_sorted_keys = list(reversed(good_sorted_keys))
-        new_selected = good_sorted_keys[-1]
-        for key in good_sorted_keys:
-            self.boulders[key].boulder.alpha = .5
-            if pm_bool(right)*key > self.selected*pm_bool(right):
-                new_selected = key
+            good_sorted_ids = list(reversed(good_sorted_ids))
+        new_selected = good_sorted_ids[-1]
+        for boulder_id in good_sorted_ids:
+            x = int(self.store.x[boulder_id & SLOT_MASK])
+            if pm_bool(right)*x > selected_x*pm_bool(right):
+                new_selected = boulder_id
         
-        self.selected = new_selected
-        self.boulders[self.selected].boulder.alpha = 1
+        self.set_selected(new_selected)
     
     def select_previous(self):
         """
@@ -133,16 +262,70 @@ class World:
         
     def select_lowest(self):
         """ Selects the boulder lowest down in the window. """
-        if not self.boulders:
-            self.selected = 0
+        self.set_selected(self.store.lowest())
+        
+    def play_selected(self):
+        """
+        In ear training mode, plays the selected boulder's scale whenever a
+            different boulder gets selected.
+        """
+        if self.player is None or self.selected == self.played:
             return
-        lowest_boulder = list(self.boulders.values())[0]
-        for boulder in self.boulders.values():
-            if boulder.boulder.y > lowest_boulder.boulder.y:
-                lowest_boulder = boulder
-        self.selected = lowest_boulder.boulder.x
-        lowest_boulder.boulder.alpha = 1
+        self.played = self.selected
+        if self.selected in self.boulders:
+            self.player.play(self.boulders[self.selected].scale.exercise)
+    
+    def guess(self, scale_key: str):
+        """
+        Guesses the type of scale on the selected boulder.  If it's right, the
+            boulder is removed and its points are added to the score;
+            otherwise it's worth half as much.
         
+        Args:
+            scale_key (str): The key for the type of scale guessed
+        """
+        if self.selected == 0:
+            return
+        selected_boulder = self.boulders[self.selected]
+        sb_pattern = selected_boulder.scale.pattern
+        guessed_pattern_str = SCALE_TYPE_INFO[scale_key].pattern
+        guessed_pattern = [int_from_pattern(c) for c in guessed_pattern_str]
+        correct = sb_pattern == guessed_pattern
+        if self.metrics is not None:
+            self.metrics.guess(correct)
+        self.sampler.record(selected_boulder.scale.exercise,
+                            correct, selected_boulder.frames_visible)
+        self.session.record(selected_boulder.scale.exercise[0],
+                            "correct" if correct else "wrong",
+                            selected_boulder.frames_visible)
+        if correct:
+            self.score += selected_boulder.value
+            selected_boulder.remove(self)
+        else:
+            selected_boulder.value *= 0.50
+    
+    def answer_from_midi(self):
+        """
+        Matches the notes played on the MIDI keyboard since the last frame
+            against the selected boulder's scale; playing all of it answers it.
+            Notes played while paused, or with nothing selected, are ignored.
+        """
+        notes = self.midi.poll()
+        if not notes or self.paused or self.selected not in self.boulders:
+            return
+        exercise = self.boulders[self.selected].scale.exercise
+        if self.matching != self.selected:
+            # Start again whenever a different boulder is selected
+            from midi import ScaleMatcher
+            self.matching = self.selected
+            self.matcher = ScaleMatcher(
+                scale_midi_numbers(exercise[0], exercise[2])
+            )
+        for note in notes:
+            if self.matcher.feed(note):
+                self.guess(exercise[0])
+                return
+    
     def update_score(self, amount: float):
         """
         Updates the player's score.
@@ -157,10 +340,16 @@ class World:
         Removes any boulders that have fallen below the bottom of the window and
             decreases the score by FAILED_BOULDER_PENALTY.
         """
-        for boulder in list(self.boulders.values()):
-            if boulder.boulder.y > get_height():
-                boulder.remove(self)
-                self.update_score(FAILED_BOULDER_PENALTY)
+        for boulder_id in self.store.fallen(get_height()):
+            boulder = self.boulders[boulder_id]
+            self.sampler.record(boulder.scale.exercise,
+                                False, boulder.frames_visible)
+            self.session.record(boulder.scale.exercise[0], "landed",
+                                boulder.frames_visible)
+            boulder.remove(self)
+            self.update_score(FAILED_BOULDER_PENALTY)
+            if self.metrics is not None:
+                self.metrics.land()
     
     def pause(self):
         """
@@ -168,9 +357,67 @@ class World:
             directly game-related input.
         """
         for boulder in self.boulders.values():
+            if boulder.boulder is None:
+                continue  # It's hidden or not when it appears
             set_visible(boulder.scale.display, self.paused)
             set_visible(boulder.scale.blur, not self.paused)
         self.paused = not self.paused
+        if self.player is not None:
+            self.player.stop()
+            self.played = 0  # Play it again when the game carries on
+        if self.paused:
+            # Nothing's moving, so a frame can wait for a full collection
+            collector.safe_point()
+    
+    def toggle_profiling(self):
+        """
+        Starts profiling the game's handlers, or, if they're already being
+            profiled, stops and saves the profile.
+        """
+        if self.capture is None:
+            self.capture = Capture()
+            print("Profiling...")
+        else:
+            print(f"Profile saved to {self.capture.save()}")
+            self.capture = None
+    
+    def snapshot(self) -> Snapshot:
+        """
+        Returns:
+            Snapshot: Everything needed to carry on with the game later, as
+                plain data
+        """
+        ids = list(self.boulders)
+        boulders = []
+        for boulder_id in ids:
+            boulder = self.boulders[boulder_id]
+            slot = self.store.slot(boulder_id)
+            boulders.append(BoulderState(
+                int(self.store.x[slot]), float(self.store.y[slot]),
+                boulder.scale.exercise, float(self.store.value[slot]),
+                int(self.store.frames_visible[slot])
+            ))
+        selected = ids.index(self.selected) if self.selected in ids else -1
+        return Snapshot(self.score, random.getstate(), boulders, selected,
+                        self.paused, exercise_stats=sampler_stats(self.sampler))
+    
+    def restore(self, snapshot: Snapshot):
+        """
+        Carries on with a game from a snapshot, making the boulders'
+            DesignerObjects again.  The world should have no boulders yet.
+        
+        Args:
+            snapshot (Snapshot): The game to carry on with
+        """
+        self.score = snapshot.score
+        random.setstate(snapshot.rng_state)
+        restore_sampler_stats(self.sampler, snapshot.exercise_stats)
+        ids = [Boulder(self, state).id for state in snapshot.boulders]
+        if snapshot.selected >= 0:
+            self.set_selected(ids[snapshot.selected])
+        if snapshot.paused:
+            self.pause()
+        self.display_score()
     
 
 def void_setup() -> World:
@@ -180,14 +427,17 @@ def void_setup() -> World:
         similar functions for void_draw and void_keyPressed
     This function is just a handler for all of the things that need to happen
         on startup.
-
+    
     Returns:
         World: The world for the game, which will be passed to all other
             functions called from `when()`.  Will be used by some of the
             functions called by this one.
     """
     world = World()
-    world._ = Boulder(world)  # So it's actually displayed, the GC is too good.
+    world.begin()
+    # Menus come back to this scene with push_warm_scene(), which only resets
+    # the world, unless the settings have changed
+    keep_warm("world", world.is_stale, world.reset)
     return world
 
 
@@ -200,18 +450,30 @@ def void_draw(world: World):
         world (World): The world for the game.  Will be used by some of the
             functions called by this one.
     """
-    if world.paused:
-        return
-    boulder_prob = .1 + .9 / (1 + 2.7**( 2 - world.score/25) )
-    boulder_prob *= BOULDER_MAX_PROB
-    if len(world.boulders) == 0:
-        boulder_prob = BOULDER_MAX_PROB
-    if rand() < boulder_prob and len(world.boulders) < MAX_BOULDERS:
-        # print(boulder_prob)
-        Boulder(world)
-    world.move_boulders_down()
-    world.remove_fallen_boulders()
-    world.display_score()
+    with profiled(world.capture, frame=True), governed(world.governor):
+        if world.metrics is not None:
+            world.metrics.frame(world.store.onscreen_count())
+        if world.midi is not None:
+            world.answer_from_midi()
+        if world.paused:
+            return
+        boulder_prob = boulder_probability(world.score, len(world.boulders),
+                                           world.boulder_max_prob)
+        if rand() < boulder_prob and len(world.boulders) < world.max_boulders:
+            # print(boulder_prob)
+            world.spawn_due = True
+        if world.spawn_due and world.governor.allows(SPAWNS):
+            # When frames are running late, it's made a few frames later
+            if len(world.boulders) < world.max_boulders:
+                Boulder(world)
+            world.spawn_due = False
+        world.move_boulders_down()
+        world.remove_fallen_boulders()
+        world.play_selected()
+        if world.governor.allows(FADES):
+            world.highlight()
+        if world.governor.allows(SCORE):
+            world.display_score()
 
 
 def void_keyPressed(world: World, key: str):
@@ -227,32 +489,48 @@ def void_keyPressed(world: World, key: str):
             functions called by this one.
         key (str): The key that was pressed.
     """
-    match MatchStr(str(key)):
-        # if not world.paused:
-        case 'left' if not world.paused:
-            world.select_previous()
-        case 'right' if not world.paused:
-            world.select_next()
-        case SCALE_KEYS.value if not world.paused:
-            if world.selected == 0:
-                return
-            selected_boulder = world.boulders[world.selected]
-            sb_pattern = selected_boulder.scale.pattern
-            guessed_pattern_str = SCALE_TYPE_INFO[key].pattern
-            guessed_pattern = [int_from_pattern(c) for c in guessed_pattern_str]
-            if sb_pattern == guessed_pattern:
-                world.score += selected_boulder.value
-                selected_boulder.remove(world)
-            else:
-                selected_boulder.value *= 0.50
-        # Either way
-        case 'escape':
-            print(world.score)
-            pop_scene()
-        case 'space':
-            world.pause()
-        case _:
-            print(key)
+    with profiled(world.capture):
+        match MatchStr(str(key)):
+            # if not world.paused:
+            case 'left' if not world.paused:
+                world.select_previous()
+            case 'right' if not world.paused:
+                world.select_next()
+            # With a MIDI keyboard, scales are answered by playing them instead
+            case SCALE_KEYS.value if not world.paused and world.midi is None:
+                world.guess(key)
+            # Either way
+            case 'escape':
+                if world.player is not None:
+                    world.player.stop()
+                if world.midi is not None:
+                    world.midi.close()
+                if world.capture is not None:
+                    world.toggle_profiling()
+                print(world.score)
+                print(collector.stop())
+                world.session.finish(world.score)
+                submit(world.session)
+                pop_scene()
+            case 's':
+                # Suspend the game, to carry on with it next time; it's not
+                # over, so it doesn't go in the history yet
+                if world.player is not None:
+                    world.player.stop()
+                if world.midi is not None:
+                    world.midi.close()
+                if world.capture is not None:
+                    world.toggle_profiling()
+                world.snapshot().save(SNAPSHOT_PATH)
+                print(collector.stop())
+                pop_scene()
+            case 'f9':
+                # Debugging: profiles the game until it's pressed again
+                world.toggle_profiling()
+            case 'space':
+                world.pause()
+            case _:
+                print(key)
 
 
 def whens():